@@ -0,0 +1,27 @@
+"""Likes tweets_id index
+
+Revision ID: 1d6b8e0a4c57
+Revises: e5a0c3f7d912
+Create Date: 2026-10-16 13:20:44.905118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1d6b8e0a4c57"
+down_revision: Union[str, None] = "e5a0c3f7d912"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_likes_tweets_id_id", "likes", ["tweets_id", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_likes_tweets_id_id", table_name="likes")
@@ -0,0 +1,30 @@
+"""Tweets feed keyset index
+
+Revision ID: 3f1a9c2b7d44
+Revises: 61c7e2db0e92
+Create Date: 2026-10-16 10:12:41.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1a9c2b7d44"
+down_revision: Union[str, None] = "61c7e2db0e92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_tweets_user_id_created_at_id",
+        "tweets",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tweets_user_id_created_at_id", table_name="tweets")
@@ -0,0 +1,48 @@
+"""Index audit
+
+Revision ID: 5c93f2a1e6b8
+Revises: 1d6b8e0a4c57
+Create Date: 2026-10-16 14:02:31.550874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c93f2a1e6b8"
+down_revision: Union[str, None] = "1d6b8e0a4c57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Индексы по id дублируют первичные ключи и только замедляют запись
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_index("ix_tweets_id", table_name="tweets")
+    op.drop_index("ix_images_id", table_name="images")
+    op.drop_index("ix_likes_id", table_name="likes")
+
+    # Аутентификация по api-key выполняется на каждый запрос
+    op.create_index(op.f("ix_users_api_key"), "users", ["api_key"], unique=False)
+    # Поиск изображений твита при удалении
+    op.create_index(
+        op.f("ix_images_tweet_id"), "images", ["tweet_id"], unique=False
+    )
+    # Проверка лайка пользователя
+    op.create_index(
+        "ix_likes_user_id_tweets_id", "likes", ["user_id", "tweets_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_likes_user_id_tweets_id", table_name="likes")
+    op.drop_index(op.f("ix_images_tweet_id"), table_name="images")
+    op.drop_index(op.f("ix_users_api_key"), table_name="users")
+
+    op.create_index("ix_likes_id", "likes", ["id"], unique=False)
+    op.create_index("ix_images_id", "images", ["id"], unique=False)
+    op.create_index("ix_tweets_id", "tweets", ["id"], unique=False)
+    op.create_index("ix_users_id", "users", ["id"], unique=False)
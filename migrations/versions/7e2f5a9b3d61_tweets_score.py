@@ -0,0 +1,44 @@
+"""Tweets score
+
+Revision ID: 7e2f5a9b3d61
+Revises: 5c93f2a1e6b8
+Create Date: 2026-10-16 15:10:26.037219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7e2f5a9b3d61"
+down_revision: Union[str, None] = "5c93f2a1e6b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Значения SCORE_LIKE_WEIGHT и SCORE_DECAY_SECONDS по умолчанию на момент миграции
+SCORE_LIKE_WEIGHT = 1.0
+SCORE_DECAY_SECONDS = 45000
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tweets",
+        sa.Column("score", sa.Float(), server_default="0", nullable=False),
+    )
+
+    op.execute(
+        f"""
+        UPDATE tweets
+        SET score = {SCORE_LIKE_WEIGHT} * ln(1 + greatest(like_count, 0))
+                    + extract(epoch FROM created_at) / {SCORE_DECAY_SECONDS}
+        """
+    )
+
+    op.create_index("ix_tweets_score_id", "tweets", ["score", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tweets_score_id", table_name="tweets")
+    op.drop_column("tweets", "score")
@@ -0,0 +1,75 @@
+"""Timelines
+
+Revision ID: 8b2e4d6f1a03
+Revises: 3f1a9c2b7d44
+Create Date: 2026-10-16 11:03:17.482190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b2e4d6f1a03"
+down_revision: Union[str, None] = "3f1a9c2b7d44"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "timelines",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["tweet_id"],
+            ["tweets.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["author_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "tweet_id"),
+    )
+    op.create_index(
+        op.f("ix_timelines_tweet_id"), "timelines", ["tweet_id"], unique=False
+    )
+    op.create_index(
+        "ix_timelines_user_id_created_at_tweet_id",
+        "timelines",
+        ["user_id", "created_at", "tweet_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_timelines_user_id_author_id",
+        "timelines",
+        ["user_id", "author_id"],
+        unique=False,
+    )
+
+    # Заполнение лент по уже существующим подпискам
+    op.execute(
+        """
+        INSERT INTO timelines (user_id, tweet_id, author_id, created_at)
+        SELECT uu.followers_id, t.id, t.user_id, t.created_at
+        FROM user_to_user uu
+        JOIN tweets t ON t.user_id = uu.following_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_timelines_user_id_author_id", table_name="timelines")
+    op.drop_index(
+        "ix_timelines_user_id_created_at_tweet_id", table_name="timelines"
+    )
+    op.drop_index(op.f("ix_timelines_tweet_id"), table_name="timelines")
+    op.drop_table("timelines")
@@ -0,0 +1,46 @@
+"""Images created_at
+
+Revision ID: a6c4e8d2f7b1
+Revises: f2a7c9e1d5b3
+Create Date: 2026-10-16 18:32:07.614903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a6c4e8d2f7b1"
+down_revision: Union[str, None] = "f2a7c9e1d5b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "images",
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("timezone('utc', now())"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_images_created_at_unattached",
+        "images",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("tweet_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_images_created_at_unattached",
+        table_name="images",
+        postgresql_where=sa.text("tweet_id IS NULL"),
+    )
+    op.drop_column("images", "created_at")
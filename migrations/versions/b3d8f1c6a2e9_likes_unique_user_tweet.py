@@ -0,0 +1,55 @@
+"""Likes unique user tweet
+
+Revision ID: b3d8f1c6a2e9
+Revises: 7e2f5a9b3d61
+Create Date: 2026-10-16 16:21:47.318904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3d8f1c6a2e9"
+down_revision: Union[str, None] = "7e2f5a9b3d61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Значения SCORE_LIKE_WEIGHT и SCORE_DECAY_SECONDS по умолчанию на момент миграции
+SCORE_LIKE_WEIGHT = 1.0
+SCORE_DECAY_SECONDS = 45000
+
+
+def upgrade() -> None:
+    # Удаление дубликатов лайков (остается самый ранний лайк пользователя)
+    op.execute(
+        "DELETE FROM likes AS a USING likes AS b "
+        "WHERE a.user_id = b.user_id AND a.tweets_id = b.tweets_id AND a.id > b.id"
+    )
+
+    # Пересчет счетчиков и рейтинга твитов, у которых были дубликаты
+    like_count = "(SELECT count(*) FROM likes WHERE likes.tweets_id = tweets.id)"
+    op.execute(
+        f"""
+        UPDATE tweets
+        SET like_count = {like_count},
+            score = {SCORE_LIKE_WEIGHT} * ln(1 + {like_count})
+                    + extract(epoch FROM created_at) / {SCORE_DECAY_SECONDS}
+        WHERE like_count != {like_count}
+        """
+    )
+
+    op.drop_index("ix_likes_user_id_tweets_id", table_name="likes")
+    op.create_index(
+        "ix_likes_user_id_tweets_id", "likes", ["user_id", "tweets_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_likes_user_id_tweets_id", table_name="likes")
+    op.create_index(
+        "ix_likes_user_id_tweets_id", "likes", ["user_id", "tweets_id"],
+        unique=False,
+    )
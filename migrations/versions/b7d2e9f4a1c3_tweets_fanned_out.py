@@ -0,0 +1,58 @@
+"""Tweets fanned_out
+
+Revision ID: b7d2e9f4a1c3
+Revises: e8f3a1c7b2d6
+Create Date: 2026-10-16 23:52:41.306718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d2e9f4a1c3"
+down_revision: Union[str, None] = "e8f3a1c7b2d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CELEBRITY_FOLLOWERS_THRESHOLD = 10000
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tweets",
+        sa.Column(
+            "fanned_out", sa.Boolean(), server_default=sa.true(), nullable=False
+        ),
+    )
+    # Не разложены по лентам твиты "знаменитостей" (порог - значение
+    # CELEBRITY_FOLLOWERS_THRESHOLD по умолчанию на момент миграции), которых нет ни в одной
+    # ленте. Твиты обычных авторов без записей в лентах (старше окна заполнения, опубликованные
+    # до подписки) остаются разложенными и не подмешиваются в ленты при чтении
+    op.execute(
+        f"""
+        UPDATE tweets SET fanned_out = false
+        FROM users
+        WHERE users.id = tweets.user_id
+          AND users.followers_count > {CELEBRITY_FOLLOWERS_THRESHOLD}
+          AND NOT EXISTS (SELECT 1 FROM timelines WHERE timelines.tweet_id = tweets.id)
+        """
+    )
+    op.create_index(
+        "ix_tweets_pulled_user_id_created_at_id",
+        "tweets",
+        ["user_id", "created_at", "id"],
+        unique=False,
+        postgresql_where=sa.text("NOT fanned_out"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_tweets_pulled_user_id_created_at_id",
+        table_name="tweets",
+        postgresql_where=sa.text("NOT fanned_out"),
+    )
+    op.drop_column("tweets", "fanned_out")
@@ -0,0 +1,32 @@
+"""User to user followers index
+
+Revision ID: c47d19e5b8a2
+Revises: 8b2e4d6f1a03
+Create Date: 2026-10-16 11:48:55.301742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c47d19e5b8a2"
+down_revision: Union[str, None] = "8b2e4d6f1a03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_user_to_user_following_id_followers_id",
+        "user_to_user",
+        ["following_id", "followers_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_user_to_user_following_id_followers_id", table_name="user_to_user"
+    )
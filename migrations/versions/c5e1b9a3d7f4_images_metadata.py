@@ -0,0 +1,34 @@
+"""Images metadata
+
+Revision ID: c5e1b9a3d7f4
+Revises: a6c4e8d2f7b1
+Create Date: 2026-10-16 19:05:41.273518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5e1b9a3d7f4"
+down_revision: Union[str, None] = "a6c4e8d2f7b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("images", sa.Column("mime_type", sa.String(length=32), nullable=True))
+    op.add_column("images", sa.Column("size", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("width", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("height", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("blurhash", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("images", "blurhash")
+    op.drop_column("images", "height")
+    op.drop_column("images", "width")
+    op.drop_column("images", "size")
+    op.drop_column("images", "mime_type")
@@ -0,0 +1,33 @@
+"""Tweets user_id score index
+
+Revision ID: d4a8c2f6e1b9
+Revises: b7d2e9f4a1c3
+Create Date: 2026-10-17 00:08:12.715304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a8c2f6e1b9"
+down_revision: Union[str, None] = "b7d2e9f4a1c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Лента "top" читается по подпискам, а не по глобальному рейтингу
+    op.create_index(
+        "ix_tweets_user_id_score_id",
+        "tweets",
+        ["user_id", "score", "id"],
+        unique=False,
+    )
+    op.drop_index("ix_tweets_score_id", table_name="tweets")
+
+
+def downgrade() -> None:
+    op.create_index("ix_tweets_score_id", "tweets", ["score", "id"], unique=False)
+    op.drop_index("ix_tweets_user_id_score_id", table_name="tweets")
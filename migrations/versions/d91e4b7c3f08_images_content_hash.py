@@ -0,0 +1,32 @@
+"""Images content hash
+
+Revision ID: d91e4b7c3f08
+Revises: b3d8f1c6a2e9
+Create Date: 2026-10-16 17:04:12.684215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d91e4b7c3f08"
+down_revision: Union[str, None] = "b3d8f1c6a2e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "images", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_images_content_hash"), "images", ["content_hash"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_images_content_hash"), table_name="images")
+    op.drop_column("images", "content_hash")
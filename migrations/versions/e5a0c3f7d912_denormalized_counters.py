@@ -0,0 +1,71 @@
+"""Denormalized counters
+
+Revision ID: e5a0c3f7d912
+Revises: c47d19e5b8a2
+Create Date: 2026-10-16 12:37:09.664120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a0c3f7d912"
+down_revision: Union[str, None] = "c47d19e5b8a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tweets",
+        sa.Column("like_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "users",
+        sa.Column(
+            "followers_count", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    op.add_column(
+        "users",
+        sa.Column(
+            "following_count", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+
+    op.execute(
+        """
+        UPDATE tweets t SET like_count = c.cnt
+        FROM (SELECT tweets_id, count(*) AS cnt FROM likes GROUP BY tweets_id) c
+        WHERE t.id = c.tweets_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE users u SET followers_count = c.cnt
+        FROM (
+            SELECT following_id, count(*) AS cnt FROM user_to_user
+            GROUP BY following_id
+        ) c
+        WHERE u.id = c.following_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE users u SET following_count = c.cnt
+        FROM (
+            SELECT followers_id, count(*) AS cnt FROM user_to_user
+            GROUP BY followers_id
+        ) c
+        WHERE u.id = c.followers_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "following_count")
+    op.drop_column("users", "followers_count")
+    op.drop_column("tweets", "like_count")
@@ -0,0 +1,35 @@
+"""Images user_id
+
+Revision ID: e8f3a1c7b2d6
+Revises: c5e1b9a3d7f4
+Create Date: 2026-10-16 19:41:16.508237
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8f3a1c7b2d6"
+down_revision: Union[str, None] = "c5e1b9a3d7f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("images", sa.Column("user_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "images_user_id_fkey", "images", "users", ["user_id"], ["id"]
+    )
+    # Владелец изображений, уже прикрепленных к твитам - автор твита
+    op.execute(
+        "UPDATE images SET user_id = tweets.user_id "
+        "FROM tweets WHERE tweets.id = images.tweet_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("images_user_id_fkey", "images", type_="foreignkey")
+    op.drop_column("images", "user_id")
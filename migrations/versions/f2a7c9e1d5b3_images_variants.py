@@ -0,0 +1,26 @@
+"""Images variants
+
+Revision ID: f2a7c9e1d5b3
+Revises: d91e4b7c3f08
+Create Date: 2026-10-16 17:48:55.102377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a7c9e1d5b3"
+down_revision: Union[str, None] = "d91e4b7c3f08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("images", sa.Column("variants", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("images", "variants")
@@ -16,6 +16,84 @@ ALLOWED_EXTENSIONS = {
     "jpeg",
     "gif",
 }
+# Максимальный размер загружаемого изображения и размер блока потоковой записи (байт)
+MEDIA_MAX_SIZE = int(os.environ.get("MEDIA_MAX_SIZE", 10 * 1024 * 1024))
+MEDIA_CHUNK_SIZE = int(os.environ.get("MEDIA_CHUNK_SIZE", 64 * 1024))
+# Максимальное количество файлов в одном запросе пакетной загрузки
+# (при изменении лимитов - обновить client_max_body_size в nginx/nginx.conf)
+MEDIA_BATCH_MAX_FILES = int(os.environ.get("MEDIA_BATCH_MAX_FILES", 10))
+# Начало файла, в котором ищутся размеры изображения (в JPEG им может предшествовать EXIF)
+MEDIA_HEADER_SIZE = int(os.environ.get("MEDIA_HEADER_SIZE", 128 * 1024))
+# Уменьшенные копии изображений (WebP): "название:максимальная сторона" через запятую
+IMAGE_VARIANTS = {
+    name: int(size)
+    for name, size in (
+        variant.split(":")
+        for variant in os.environ.get("IMAGE_VARIANTS", "small:320,medium:1080").split(",")
+    )
+}
+IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+# Размытая заглушка (blurhash): количество компонент и размер уменьшенной копии для расчета
+BLURHASH_X_COMPONENTS = int(os.environ.get("BLURHASH_X_COMPONENTS", 4))
+BLURHASH_Y_COMPONENTS = int(os.environ.get("BLURHASH_Y_COMPONENTS", 3))
+BLURHASH_SAMPLE_SIZE = int(os.environ.get("BLURHASH_SAMPLE_SIZE", 32))
+# Хранилище изображений: local (STATIC_FOLDER, раздается nginx) | s3 (S3-совместимое хранилище)
+MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "local")
+MEDIA_TMP_FOLDER = os.path.join(IMAGES_FOLDER, "tmp")
+S3_BUCKET = os.environ.get("S3_BUCKET", "media")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_REGION = os.environ.get("S3_REGION")
+S3_ACCESS_KEY = os.environ.get("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.environ.get("S3_SECRET_KEY")
+# Адрес, по которому клиенты получают файлы бакета (CDN / публичный endpoint)
+S3_PUBLIC_URL = os.environ.get("S3_PUBLIC_URL", "")
+# Размер части при multipart-загрузке (не меньше 5 MiB - ограничение S3)
+S3_MULTIPART_CHUNK_SIZE = int(os.environ.get("S3_MULTIPART_CHUNK_SIZE", 8 * 1024 * 1024))
+# Фоновое удаление файлов: количество повторов и начальная задержка между ними (сек)
+MEDIA_DELETE_RETRIES = int(os.environ.get("MEDIA_DELETE_RETRIES", 3))
+MEDIA_DELETE_RETRY_DELAY = float(os.environ.get("MEDIA_DELETE_RETRY_DELAY", 0.5))
+MEDIA_DELETE_STOP_TIMEOUT = float(os.environ.get("MEDIA_DELETE_STOP_TIMEOUT", 10))
+# Очистка загруженных, но не прикрепленных к твитам изображений старше MEDIA_ORPHAN_TTL (сек)
+MEDIA_ORPHAN_TTL = int(os.environ.get("MEDIA_ORPHAN_TTL", 24 * 60 * 60))
+MEDIA_GC_INTERVAL = float(os.environ.get("MEDIA_GC_INTERVAL", 60 * 60))
+MEDIA_GC_BATCH_SIZE = int(os.environ.get("MEDIA_GC_BATCH_SIZE", 1000))
+
+FEED_PAGE_SIZE = int(os.environ.get("FEED_PAGE_SIZE", 20))
+FEED_PAGE_MAX_SIZE = int(os.environ.get("FEED_PAGE_MAX_SIZE", 100))
+# Сборка ленты: "orm" - ORM + Pydantic, "sql" - JSON собирается в PostgreSQL
+FEED_ENGINE = os.environ.get("FEED_ENGINE", "orm")
+LIKERS_PREVIEW_SIZE = int(os.environ.get("LIKERS_PREVIEW_SIZE", 3))
+
+# Рейтинг твитов для режима ленты "top"
+SCORE_LIKE_WEIGHT = float(os.environ.get("SCORE_LIKE_WEIGHT", 1.0))
+SCORE_DECAY_SECONDS = float(os.environ.get("SCORE_DECAY_SECONDS", 45000))
+SCORE_AFFINITY_WEIGHT = float(os.environ.get("SCORE_AFFINITY_WEIGHT", 0.5))
+
+TIMELINE_BACKFILL_SIZE = int(os.environ.get("TIMELINE_BACKFILL_SIZE", 800))
+TIMELINE_BATCH_SIZE = int(os.environ.get("TIMELINE_BATCH_SIZE", 1000))
+CELEBRITY_FOLLOWERS_THRESHOLD = int(
+    os.environ.get("CELEBRITY_FOLLOWERS_THRESHOLD", 10000)
+)
+FOLLOW_BATCH_MAX_SIZE = int(os.environ.get("FOLLOW_BATCH_MAX_SIZE", 500))
+# Максимальное количество id в запросах состояния (лайки / подписки текущего пользователя)
+STATE_BATCH_MAX_SIZE = int(os.environ.get("STATE_BATCH_MAX_SIZE", 500))
+
+# Индекс графа подписок в памяти для рекомендаций "на кого подписаться"
+SUGGESTIONS_SIZE = int(os.environ.get("SUGGESTIONS_SIZE", 10))
+FOLLOW_GRAPH_TTL = float(os.environ.get("FOLLOW_GRAPH_TTL", 600))
+FOLLOW_GRAPH_COMPACT_THRESHOLD = int(
+    os.environ.get("FOLLOW_GRAPH_COMPACT_THRESHOLD", 10000)
+)
+
+# Отложенная запись лайков: подтверждение после записи в журнал, запись в БД пачками
+LIKE_BUFFER_ENABLED = os.environ.get("LIKE_BUFFER_ENABLED", "false").lower() == "true"
+LIKE_BUFFER_PATH = os.environ.get("LIKE_BUFFER_PATH", "like_buffer.jsonl")
+LIKE_BUFFER_FLUSH_SIZE = int(os.environ.get("LIKE_BUFFER_FLUSH_SIZE", 1000))
+LIKE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("LIKE_BUFFER_FLUSH_INTERVAL", 1.0))
+
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 60))
 
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
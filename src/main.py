@@ -1,10 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Depends
+from src.config import LIKE_BUFFER_ENABLED, MEDIA_DELETE_STOP_TIMEOUT
+from src.services.services import LikeService, SuggestionService
+from src.utils.file_deletion import file_deletion
+from src.utils.image_variants import shutdown_executor
+from src.utils.like_buffer import like_buffer
+from src.utils.media_gc import media_gc_loop
 from src.utils.user import get_current_user
 from src.urls import register_routers
 from src.utils.exeptions import CustomApiException, custom_api_exception_handler
 
 
-app = FastAPI(title="Twitter", debug=True, dependencies=[Depends(get_current_user)])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск и остановка фоновых задач приложения
+    """
+    if LIKE_BUFFER_ENABLED:
+        await like_buffer.start(apply=LikeService.flush_buffer)
+
+    media_gc = asyncio.create_task(media_gc_loop())
+
+    yield
+
+    media_gc.cancel()
+
+    with suppress(asyncio.CancelledError):
+        await media_gc
+
+    await SuggestionService.stop()
+
+    if LIKE_BUFFER_ENABLED:
+        await like_buffer.stop()
+
+    await file_deletion.stop(timeout=MEDIA_DELETE_STOP_TIMEOUT)
+
+    shutdown_executor()
+
+
+app = FastAPI(
+    title="Twitter", debug=True, dependencies=[Depends(get_current_user)],
+    lifespan=lifespan,
+)
 
 register_routers(app)
 
@@ -1,9 +1,11 @@
 import datetime
-from sqlalchemy import ForeignKey, String, Table, Column, Integer
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import JSON, ForeignKey, String, Table, Column, Integer, Index, \
+    text, true
+from sqlalchemy.orm import Mapped, backref, mapped_column, relationship
 from typing import List
 
 from src.database import Base
+from src.utils.score import tweet_score
 
 user_to_user = Table(
     "user_to_user",
@@ -16,6 +18,9 @@ user_to_user = Table(
            Integer,
            ForeignKey("users.id"),
            primary_key=True),
+    # Выборка подписчиков пользователя (PK покрывает только выборку подписок)
+    Index("ix_user_to_user_following_id_followers_id",
+          "following_id", "followers_id"),
 )
 
 
@@ -26,11 +31,33 @@ class Image(Base):
 
     __tablename__ = "images"
 
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True,
-                                    index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id"),
-                                          nullable=True)
+                                          nullable=True, index=True)
+    # Загрузивший пользователь: прикрепить изображение можно только к своему твиту
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
     path_media: Mapped[str]
+    # sha256 содержимого: файл хранится один раз и удаляется вместе с последней ссылкой
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True,
+                                              index=True)
+    # Уменьшенные копии: {название варианта: путь относительно static}
+    variants: Mapped[dict] = mapped_column(JSON, nullable=True)
+    # Данные для разметки ленты без загрузки изображения
+    mime_type: Mapped[str] = mapped_column(String(32), nullable=True)
+    size: Mapped[int] = mapped_column(nullable=True)
+    width: Mapped[int] = mapped_column(nullable=True)
+    height: Mapped[int] = mapped_column(nullable=True)
+    blurhash: Mapped[str] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        default=datetime.datetime.utcnow,
+        server_default=text("timezone('utc', now())"),
+    )
+
+    __table_args__ = (
+        # Поиск загруженных, но не прикрепленных к твитам изображений для очистки
+        Index("ix_images_created_at_unattached", "created_at",
+              postgresql_where=text("tweet_id IS NULL")),
+    )
 
     __mapper_args__ = {"confirm_deleted_rows": False}
 
@@ -42,14 +69,27 @@ class Like(Base):
 
     __tablename__ = "likes"
 
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True,
-                                    index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     tweets_id: Mapped[int] = mapped_column(ForeignKey("tweets.id"))
 
+    __table_args__ = (
+        # Последние лайки твита (превью в ленте, постраничный вывод)
+        Index("ix_likes_tweets_id_id", "tweets_id", "id"),
+        # Проверка лайка пользователя; повторный лайк не создает дубликат
+        Index("ix_likes_user_id_tweets_id", "user_id", "tweets_id", unique=True),
+    )
+
     __mapper_args__ = {"confirm_deleted_rows": False}
 
 
+def default_tweet_score(context) -> float:
+    """
+    Рейтинг нового твита (без лайков), рассчитывается от даты создания
+    """
+    return tweet_score(0, context.get_current_parameters()["created_at"])
+
+
 class Tweet(Base):
     """
     Модель для хранения твитов
@@ -57,13 +97,18 @@ class Tweet(Base):
 
     __tablename__ = "tweets"
 
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True,
-                                    index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     tweet_data: Mapped[str] = mapped_column(String(280))
     created_at: Mapped[datetime.datetime] = mapped_column(
-        default=datetime.datetime.utcnow, nullable=True
+        default=datetime.datetime.utcnow
     )
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    like_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    score: Mapped[float] = mapped_column(default=default_tweet_score,
+                                         server_default="0")
+    # Твит разложен по лентам подписчиков при публикации; False - автор был "знаменитостью",
+    # твит подмешивается в ленты при чтении (независимо от текущего числа подписчиков автора)
+    fanned_out: Mapped[bool] = mapped_column(default=True, server_default=true())
     images: Mapped[List["Image"]] = relationship(
         backref="tweet", cascade="all, delete-orphan"
     )
@@ -71,9 +116,41 @@ class Tweet(Base):
         backref="tweet", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # Лента читается диапазоном по (created_at, id) в рамках автора
+        Index("ix_tweets_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Лента в режиме "top": лучшие твиты каждой подписки по убыванию рейтинга
+        Index("ix_tweets_user_id_score_id", "user_id", "score", "id"),
+        # Твиты, подмешиваемые в ленту при чтении
+        Index("ix_tweets_pulled_user_id_created_at_id", "user_id", "created_at", "id",
+              postgresql_where=text("NOT fanned_out")),
+    )
+
     __mapper_args__ = {"confirm_deleted_rows": False}
 
 
+class Timeline(Base):
+    """
+    Модель для хранения домашней ленты пользователя (fan-out on write).
+    При публикации твит раскладывается по лентам подписчиков автора
+    """
+
+    __tablename__ = "timelines"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"),
+                                         primary_key=True)
+    tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id"),
+                                          primary_key=True, index=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    created_at: Mapped[datetime.datetime]
+
+    __table_args__ = (
+        Index("ix_timelines_user_id_created_at_tweet_id",
+              "user_id", "created_at", "tweet_id"),
+        Index("ix_timelines_user_id_author_id", "user_id", "author_id"),
+    )
+
+
 class User(Base):
     """
     Модель для хранения данных о пользователях
@@ -81,12 +158,13 @@ class User(Base):
 
     __tablename__ = "users"
 
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True,
-                                    index=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     username: Mapped[str] = mapped_column(
         String(60), nullable=False, unique=True, index=True
     )
-    api_key: Mapped[str] = mapped_column()
+    api_key: Mapped[str] = mapped_column(index=True)
+    followers_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    following_count: Mapped[int] = mapped_column(default=0, server_default="0")
     tweets: Mapped[List["Tweet"]] = relationship(
         backref="user", cascade="all, delete-orphan"
     )
@@ -95,13 +173,14 @@ class User(Base):
         cascade="all, delete-orphan",
     )
 
+    # Граф подписок загружается только явно (selectinload), а не с каждым пользователем
     following = relationship(
         "User",
         secondary=user_to_user,
         primaryjoin=id == user_to_user.c.followers_id,
         secondaryjoin=id == user_to_user.c.following_id,
-        backref="followers",
-        lazy="selectin",
+        backref=backref("followers", lazy="raise"),
+        lazy="raise",
     )
 
     __mapper_args__ = {"confirm_deleted_rows": False}
@@ -1,16 +1,26 @@
-from typing import Annotated
+from typing import Annotated, List, Literal, Optional
 from http import HTTPStatus
-from fastapi import APIRouter, Depends, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Query, Response, \
+    UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from src.models.models import User
+from src.config import FEED_ENGINE, FEED_PAGE_SIZE, FEED_PAGE_MAX_SIZE, \
+    LIKE_BUFFER_ENABLED, MEDIA_BATCH_MAX_FILES, SUGGESTIONS_SIZE
 from src.database import get_async_session
 from src.schemas.schemas import UserOutSchema, ImageResponseSchema, \
-    TweetResponseSchema, TweetInSchema, TweetListSchema
+    ImageBatchResponseSchema, TweetResponseSchema, TweetInSchema, TweetListSchema, \
+    LikeListSchema, UserListSchema, FollowBatchInSchema, FollowBatchOutSchema, \
+    SuggestionListSchema, MetricsSchema, TweetStateInSchema, TweetStateListSchema, \
+    UserStateInSchema, UserStateListSchema
 from src.services.services import FollowerService, ImageService, LikeService, \
-    TweetsService, UserService
+    SuggestionService, TimelineService, TweetsService, UserService
+from src.utils.cache import auth_cache
 from src.utils.exeptions import CustomApiException
+from src.utils.file_deletion import file_deletion
+from src.utils.follow_graph import follow_graph
+from src.utils.like_buffer import like_buffer
+from src.utils.principal import Principal
 from src.utils.user import get_current_user
 
 from src.schemas.base_response import (
@@ -33,6 +43,10 @@ user_router = APIRouter(
     prefix="/api/users", tags=["users"]
 )
 
+metrics_router = APIRouter(
+    prefix="/api/metrics", tags=["metrics"]
+)
+
 
 @image_router.post(
     "",
@@ -40,16 +54,19 @@ user_router = APIRouter(
     responses={
         401: {"model": UnauthorizedResponseSchema},
         400: {"model": BadResponseSchema},
+        413: {"model": ErrorResponseSchema},
         422: {"model": ValidationResponseSchema},
     },
     status_code=201,
 )
 async def add_image(
         file: UploadFile,
+        background_tasks: BackgroundTasks,
+        current_user: Annotated[Principal, Depends(get_current_user)],
         session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Загрузка изображения к твиту
+    Загрузка изображения к твиту (уменьшенные копии создаются в фоне)
     """
     if not file:
         logger.error("Изображение не передано в запросе")
@@ -59,11 +76,53 @@ async def add_image(
             detail="The image was not attached to the request",
         )
 
-    image_id = await ImageService.save_image(image=file, session=session)
+    image_id = await ImageService.save_image(
+        image=file, user_id=current_user.id, session=session
+    )
+
+    background_tasks.add_task(ImageService.create_variants, image_id=image_id)
 
     return {"media_id": image_id}
 
 
+@image_router.post(
+    "/batch",
+    response_model=ImageBatchResponseSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        413: {"model": ErrorResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=201,
+)
+async def add_images(
+        background_tasks: BackgroundTasks,
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        files: List[UploadFile] = File(...),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Пакетная загрузка изображений к твиту одним запросом (уменьшенные копии создаются в фоне)
+    """
+    if len(files) > MEDIA_BATCH_MAX_FILES:
+        logger.error(f"Превышено количество файлов в запросе: {len(files)}")
+
+        raise CustomApiException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,  # 422
+            detail=f"The number of files should not exceed "
+                   f"{MEDIA_BATCH_MAX_FILES}. Current value: {len(files)}",
+        )
+
+    image_ids = await ImageService.save_images(
+        images=files, user_id=current_user.id, session=session
+    )
+
+    for image_id in image_ids:
+        background_tasks.add_task(ImageService.create_variants, image_id=image_id)
+
+    return {"media_ids": image_ids}
+
+
 @tweet_router.get(
     "",
     response_model=TweetListSchema,
@@ -71,16 +130,34 @@ async def add_image(
     status_code=200,
 )
 async def get_tweets(
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        limit: int = Query(default=FEED_PAGE_SIZE, ge=1, le=FEED_PAGE_MAX_SIZE),
+        cursor: Optional[str] = None,
+        mode: Literal["latest", "top"] = "latest",
+        engine: Literal["orm", "sql"] = FEED_ENGINE,
         session: AsyncSession = Depends(get_async_session),
 ):
     """
     Вывод ленты твитов (выводятся твиты людей,
-     на которых подписан пользователь)
+     на которых подписан пользователь).
+    Для получения следующей страницы передается курсор next_cursor из предыдущего ответа.
+    Параметр mode выбирает порядок: latest (по дате, по умолчанию) или top (по рейтингу).
+    Параметр engine выбирает способ сборки ответа: orm (по умолчанию) или sql (JSON из PostgreSQL)
     """
-    tweets = await TweetsService.get_tweets(user=current_user, session=session)
+    if engine == "sql":
+        content = await TweetsService.get_tweets_json(
+            user=current_user, session=session, limit=limit, cursor=cursor,
+            mode=mode
+        )
+
+        return Response(content=content, media_type="application/json")
 
-    return {"tweets": tweets}
+    tweets, next_cursor = await TweetsService.get_tweets(
+        user=current_user, session=session, limit=limit, cursor=cursor,
+        mode=mode
+    )
+
+    return {"tweets": tweets, "next_cursor": next_cursor}
 
 
 @tweet_router.post(
@@ -94,17 +171,17 @@ async def get_tweets(
 )
 async def create_tweet(
         tweet: TweetInSchema,
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
         session: AsyncSession = Depends(get_async_session),
 ):
     """
     Добавление твита
     """
-    tweet = await TweetsService.create_tweet(
+    tweet_id = await TweetsService.create_tweet(
         tweet=tweet, current_user=current_user, session=session
     )
 
-    return {"tweet_id": tweet.id}
+    return {"tweet_id": tweet_id}
 
 
 @tweet_router.delete(
@@ -120,7 +197,7 @@ async def create_tweet(
 )
 async def delete_tweet(
         tweet_id: int,
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
         session: AsyncSession = Depends(get_async_session),
 ):
     """
@@ -133,6 +210,61 @@ async def delete_tweet(
     return {"result": True}
 
 
+@tweet_router.post(
+    "/state",
+    response_model=TweetStateListSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def get_tweets_state(
+        data: TweetStateInSchema,
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Состояние лайков текущего пользователя по списку твитов (liked_by_me)
+    """
+    liked = await LikeService.get_liked_by_user(
+        tweet_ids=data.tweet_ids, user_id=current_user.id, session=session
+    )
+
+    return {
+        "tweets": [
+            {"id": tweet_id, "liked_by_me": tweet_id in liked}
+            for tweet_id in dict.fromkeys(data.tweet_ids)
+        ]
+    }
+
+
+@tweet_router.get(
+    "/{tweet_id}/likes",
+    response_model=LikeListSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        404: {"model": ErrorResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def get_likes(
+        tweet_id: int,
+        limit: int = Query(default=FEED_PAGE_SIZE, ge=1, le=FEED_PAGE_MAX_SIZE),
+        cursor: Optional[str] = None,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Вывод полного списка лайков твита (постранично, от последних к первым)
+    """
+    likes, next_cursor = await LikeService.get_likes(
+        tweet_id=tweet_id, session=session, limit=limit, cursor=cursor
+    )
+
+    return {"likes": likes, "next_cursor": next_cursor}
+
+
 @tweet_router.post(
     "/{tweet_id}/likes",
     response_model=ResponseSchema,
@@ -146,12 +278,18 @@ async def delete_tweet(
 )
 async def create_like(
         tweet_id: int,
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
         session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Лайк твита
+    Лайк твита (при LIKE_BUFFER_ENABLED лайк подтверждается после записи в буфер,
+    проверки существования твита и повторного лайка выполняются при записи в БД)
     """
+    if LIKE_BUFFER_ENABLED:
+        await like_buffer.add("like", user_id=current_user.id, tweet_id=tweet_id)
+
+        return {"result": True}
+
     await LikeService.like(tweet_id=tweet_id, user_id=current_user.id,
                            session=session)
 
@@ -171,12 +309,17 @@ async def create_like(
 )
 async def delete_like(
         tweet_id: int,
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
         session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Удаление лайка
+    Удаление лайка (при LIKE_BUFFER_ENABLED - после записи в буфер)
     """
+    if LIKE_BUFFER_ENABLED:
+        await like_buffer.add("dislike", user_id=current_user.id, tweet_id=tweet_id)
+
+        return {"result": True}
+
     await LikeService.dislike(
         tweet_id=tweet_id, user_id=current_user.id, session=session
     )
@@ -187,14 +330,152 @@ async def delete_like(
 @user_router.get(
     "/me",
     response_model=UserOutSchema,
+    response_model_exclude_none=True,
     responses={401: {"model": UnauthorizedResponseSchema}},
     status_code=200,
 )
-async def get_me(current_user: Annotated[User, Depends(get_current_user)]):
+async def get_me(
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        expand: List[Literal["following", "followers"]] = Query(default=[]),
+        session: AsyncSession = Depends(get_async_session),
+):
     """
-    Вывод данных о текущем пользователе: id, username, подписки, подписчики
+    Вывод данных о текущем пользователе: id, username, количество подписок и подписчиков.
+    Списки подписок и подписчиков выводятся по запросу: expand=following&expand=followers
     """
-    return {"user": current_user}
+    user = await UserService.get_user_for_id(
+        user_id=current_user.id, session=session, expand=expand
+    )
+
+    return {"user": user}
+
+
+@user_router.get(
+    "/me/suggestions",
+    response_model=SuggestionListSchema,
+    responses={401: {"model": UnauthorizedResponseSchema}},
+    status_code=200,
+)
+async def get_suggestions(
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        limit: int = Query(default=SUGGESTIONS_SIZE, ge=1, le=FEED_PAGE_MAX_SIZE),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Рекомендации "на кого подписаться": пользователи, на которых подписаны подписки
+    текущего пользователя, по убыванию количества общих связей
+    """
+    users = await SuggestionService.get_suggestions(
+        current_user=current_user, session=session, limit=limit
+    )
+
+    return {"users": users}
+
+
+@user_router.post(
+    "/state",
+    response_model=UserStateListSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def get_users_state(
+        data: UserStateInSchema,
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Состояние подписок текущего пользователя по списку пользователей:
+    following - текущий пользователь подписан, followed_by - пользователь подписан на текущего
+    """
+    state = await FollowerService.get_follow_state(
+        current_user=current_user, user_ids=data.user_ids, session=session
+    )
+
+    return {
+        "users": [
+            {"id": user_id, "following": following, "followed_by": followed_by}
+            for user_id, (following, followed_by) in state.items()
+        ]
+    }
+
+
+@user_router.post(
+    "/follow:batch",
+    response_model=FollowBatchOutSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def create_followers(
+        data: FollowBatchInSchema,
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        background_tasks: BackgroundTasks,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Массовая подписка на пользователей (не более FOLLOW_BATCH_MAX_SIZE за запрос).
+    Возвращает статус по каждому id: followed, already_following, not_found, self
+    """
+    statuses = await FollowerService.follow_batch(
+        current_user=current_user, user_ids=data.user_ids, session=session
+    )
+
+    for user_id, status in statuses.items():
+        if status == "followed":
+            background_tasks.add_task(
+                TimelineService.backfill, follower_id=current_user.id,
+                following_id=user_id
+            )
+
+    return {
+        "results": [
+            {"user_id": user_id, "status": status}
+            for user_id, status in statuses.items()
+        ]
+    }
+
+
+@user_router.post(
+    "/unfollow:batch",
+    response_model=FollowBatchOutSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def delete_followers(
+        data: FollowBatchInSchema,
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        background_tasks: BackgroundTasks,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Массовая отписка от пользователей (не более FOLLOW_BATCH_MAX_SIZE за запрос).
+    Возвращает статус по каждому id: unfollowed, not_following, not_found, self
+    """
+    statuses = await FollowerService.unfollow_batch(
+        current_user=current_user, user_ids=data.user_ids, session=session
+    )
+
+    for user_id, status in statuses.items():
+        if status == "unfollowed":
+            background_tasks.add_task(
+                TimelineService.cleanup, follower_id=current_user.id,
+                following_id=user_id
+            )
+
+    return {
+        "results": [
+            {"user_id": user_id, "status": status}
+            for user_id, status in statuses.items()
+        ]
+    }
 
 
 @user_router.post(
@@ -210,7 +491,8 @@ async def get_me(current_user: Annotated[User, Depends(get_current_user)]):
 )
 async def create_follower(
         user_id: int,
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        background_tasks: BackgroundTasks,
         session: AsyncSession = Depends(get_async_session),
 ):
     """
@@ -220,6 +502,11 @@ async def create_follower(
         current_user=current_user, following_user_id=user_id, session=session
     )
 
+    background_tasks.add_task(
+        TimelineService.backfill, follower_id=current_user.id,
+        following_id=user_id
+    )
+
     return {"result": True}
 
 
@@ -236,7 +523,8 @@ async def create_follower(
 )
 async def delete_follower(
         user_id: int,
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_user: Annotated[Principal, Depends(get_current_user)],
+        background_tasks: BackgroundTasks,
         session: AsyncSession = Depends(get_async_session),
 ):
     """
@@ -246,12 +534,18 @@ async def delete_follower(
         current_user=current_user, followed_user_id=user_id, session=session
     )
 
+    background_tasks.add_task(
+        TimelineService.cleanup, follower_id=current_user.id,
+        following_id=user_id
+    )
+
     return {"result": True}
 
 
 @user_router.get(
     "/{user_id}",
     response_model=UserOutSchema,
+    response_model_exclude_none=True,
     responses={
         401: {"model": UnauthorizedResponseSchema},
         404: {"model": ErrorResponseSchema},
@@ -260,12 +554,18 @@ async def delete_follower(
     },
     status_code=200,
 )
-async def get_user(user_id: int,
-                   session: AsyncSession = Depends(get_async_session)):
+async def get_user(
+        user_id: int,
+        expand: List[Literal["following", "followers"]] = Query(default=[]),
+        session: AsyncSession = Depends(get_async_session),
+):
     """
-    Вывод данных о пользователе: id, username, подписки, подписчики
+    Вывод данных о пользователе: id, username, количество подписок и подписчиков.
+    Списки подписок и подписчиков выводятся по запросу: expand=following&expand=followers
     """
-    user = await UserService.get_user_for_id(user_id=user_id, session=session)
+    user = await UserService.get_user_for_id(
+        user_id=user_id, session=session, expand=expand
+    )
 
     if user is None:
         raise CustomApiException(
@@ -273,3 +573,75 @@ async def get_user(user_id: int,
         )
 
     return {"user": user}
+
+
+@user_router.get(
+    "/{user_id}/followers",
+    response_model=UserListSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        404: {"model": ErrorResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def get_followers(
+        user_id: int,
+        limit: int = Query(default=FEED_PAGE_SIZE, ge=1, le=FEED_PAGE_MAX_SIZE),
+        cursor: Optional[str] = None,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Вывод подписчиков пользователя (постранично)
+    """
+    users, next_cursor = await UserService.get_follow_page(
+        user_id=user_id, relation="followers", session=session, limit=limit,
+        cursor=cursor
+    )
+
+    return {"users": users, "next_cursor": next_cursor}
+
+
+@user_router.get(
+    "/{user_id}/following",
+    response_model=UserListSchema,
+    responses={
+        401: {"model": UnauthorizedResponseSchema},
+        404: {"model": ErrorResponseSchema},
+        422: {"model": ValidationResponseSchema},
+    },
+    status_code=200,
+)
+async def get_following(
+        user_id: int,
+        limit: int = Query(default=FEED_PAGE_SIZE, ge=1, le=FEED_PAGE_MAX_SIZE),
+        cursor: Optional[str] = None,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Вывод подписок пользователя (постранично)
+    """
+    users, next_cursor = await UserService.get_follow_page(
+        user_id=user_id, relation="following", session=session, limit=limit,
+        cursor=cursor
+    )
+
+    return {"users": users, "next_cursor": next_cursor}
+
+
+@metrics_router.get(
+    "",
+    response_model=MetricsSchema,
+    responses={401: {"model": UnauthorizedResponseSchema}},
+    status_code=200,
+)
+async def get_metrics():
+    """
+    Метрики процесса: глубина буфера лайков, кэш аутентификации, индекс графа подписок
+    """
+    return {
+        "like_buffer": like_buffer.stats(),
+        "auth_cache": auth_cache.stats(),
+        "follow_graph": follow_graph.stats(),
+        "file_deletion": file_deletion.stats(),
+    }
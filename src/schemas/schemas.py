@@ -1,11 +1,14 @@
 from http import HTTPStatus
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, model_validator, field_validator
+from pydantic import AliasChoices, BaseModel, ConfigDict, model_validator, field_validator
 from pydantic import Field
+from sqlalchemy import inspect
 
+from src.config import FOLLOW_BATCH_MAX_SIZE, STATE_BATCH_MAX_SIZE
 from src.schemas.base_response import ResponseSchema
 from src.utils.exeptions import CustomApiException
+from src.utils.storage import storage
 
 
 class ImageResponseSchema(ResponseSchema):
@@ -21,6 +24,16 @@ class ImageResponseSchema(ResponseSchema):
     )
 
 
+class ImageBatchResponseSchema(ResponseSchema):
+    """
+    Схема для вывода id изображений после пакетной загрузки (в порядке файлов в запросе)
+    """
+
+    ids: List[int] = Field(alias="media_ids")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
 class ImagePathSchema(BaseModel):
     """
     Схема для вывода ссылки на изображения при отображении твитов
@@ -31,6 +44,37 @@ class ImagePathSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class MediaSchema(BaseModel):
+    """
+    Схема для вывода изображения твита со ссылками на уменьшенные копии и данными для разметки
+    ленты до загрузки (размеры, MIME-тип, размер файла, blurhash-заглушка)
+    """
+
+    url: str = Field(validation_alias="path_media")
+    variants: Dict[str, str] = {}
+    mime_type: Optional[str] = None
+    size: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("url", mode="before")
+    def serialize_url(cls, val: str):
+        """
+        Ссылка на файл в хранилище
+        """
+        return storage.url_for(val)
+
+    @field_validator("variants", mode="before")
+    def serialize_variants(cls, val: Dict[str, str] | None):
+        """
+        Ссылки на копии (копии еще не созданы - пустой словарь)
+        """
+        return {name: storage.url_for(key) for name, key in (val or {}).items()}
+
+
 class LikeSchema(BaseModel):
     """
     Схема для вывода лайков при выводе твитов
@@ -54,6 +98,15 @@ class LikeSchema(BaseModel):
         return user
 
 
+class LikeListSchema(ResponseSchema):
+    """
+    Схема для постраничного вывода лайков твита
+    """
+
+    likes: List[LikeSchema]
+    next_cursor: Optional[str] = None
+
+
 class UserSchema(BaseModel):
     """
     Базовая схема для вывода основных данных о пользователе
@@ -73,11 +126,30 @@ class UserDataSchema(UserSchema):
     Схема для вывода детальной информации о пользователе
     """
 
-    following: Optional[List["UserSchema"]] = []
-    followers: Optional[List["UserSchema"]] = []
+    followers_count: int = 0
+    following_count: int = 0
+    following: Optional[List["UserSchema"]] = None
+    followers: Optional[List["UserSchema"]] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+    @model_validator(mode="before")
+    def skip_unloaded(cls, data):
+        """
+        Списки подписок и подписчиков выводятся, только если были загружены (параметр expand)
+        """
+        if isinstance(data, dict):
+            return data
+
+        unloaded = inspect(data).unloaded
+
+        return {
+            field: getattr(data, field)
+            for field in ("id", "username", "followers_count", "following_count",
+                          "following", "followers")
+            if field not in unloaded
+        }
+
 
 class UserOutSchema(ResponseSchema):
     """
@@ -87,6 +159,115 @@ class UserOutSchema(ResponseSchema):
     user: UserDataSchema
 
 
+class UserListSchema(ResponseSchema):
+    """
+    Схема для постраничного вывода подписчиков / подписок пользователя
+    """
+
+    users: List[UserSchema]
+    next_cursor: Optional[str] = None
+
+
+class SuggestionSchema(UserSchema):
+    """
+    Схема для вывода рекомендованного пользователя
+    """
+
+    mutual_count: int
+
+
+class SuggestionListSchema(ResponseSchema):
+    """
+    Схема для вывода рекомендаций "на кого подписаться"
+    """
+
+    users: List[SuggestionSchema]
+
+
+def check_ids_len(val: List[int], max_size: int) -> List[int]:
+    """
+    Проверка количества id в запросе с переопределением вывода ошибки в случае превышения
+    """
+    if isinstance(val, list) and len(val) > max_size:
+        raise CustomApiException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,  # 422
+            detail=f"The number of ids should not exceed "
+                   f"{max_size}. Current value: {len(val)}",
+        )
+
+    return val
+
+
+class FollowBatchInSchema(BaseModel):
+    """
+    Схема для входных данных при массовой подписке / отписке
+    """
+
+    user_ids: List[int]
+
+    @field_validator("user_ids", mode="before")
+    @classmethod
+    def check_len_user_ids(cls, val: List[int]) -> List[int]:
+        """
+        Проверка количества id пользователей
+        """
+        return check_ids_len(val, FOLLOW_BATCH_MAX_SIZE)
+
+
+class UserStateInSchema(BaseModel):
+    """
+    Схема для входных данных при запросе состояния подписок
+    """
+
+    user_ids: List[int]
+
+    @field_validator("user_ids", mode="before")
+    @classmethod
+    def check_len_user_ids(cls, val: List[int]) -> List[int]:
+        """
+        Проверка количества id пользователей
+        """
+        return check_ids_len(val, STATE_BATCH_MAX_SIZE)
+
+
+class UserStateSchema(BaseModel):
+    """
+    Схема для вывода состояния подписок текущего пользователя по одному пользователю
+    """
+
+    id: int
+    following: bool
+    followed_by: bool
+
+
+class UserStateListSchema(ResponseSchema):
+    """
+    Схема для вывода состояния подписок текущего пользователя
+    """
+
+    users: List[UserStateSchema]
+
+
+class FollowResultSchema(BaseModel):
+    """
+    Схема для вывода результата подписки / отписки по одному пользователю
+    """
+
+    user_id: int
+    status: Literal[
+        "followed", "already_following", "unfollowed", "not_following",
+        "not_found", "self"
+    ]
+
+
+class FollowBatchOutSchema(ResponseSchema):
+    """
+    Схема для вывода результатов массовой подписки / отписки
+    """
+
+    results: List[FollowResultSchema]
+
+
 class TweetInSchema(BaseModel):
     """
     Схема для входных данных при добавлении нового твита
@@ -117,6 +298,39 @@ class TweetInSchema(BaseModel):
     )
 
 
+class TweetStateInSchema(BaseModel):
+    """
+    Схема для входных данных при запросе состояния лайков
+    """
+
+    tweet_ids: List[int]
+
+    @field_validator("tweet_ids", mode="before")
+    @classmethod
+    def check_len_tweet_ids(cls, val: List[int]) -> List[int]:
+        """
+        Проверка количества id твитов
+        """
+        return check_ids_len(val, STATE_BATCH_MAX_SIZE)
+
+
+class TweetStateSchema(BaseModel):
+    """
+    Схема для вывода состояния лайка текущего пользователя по одному твиту
+    """
+
+    id: int
+    liked_by_me: bool
+
+
+class TweetStateListSchema(ResponseSchema):
+    """
+    Схема для вывода состояния лайков текущего пользователя
+    """
+
+    tweets: List[TweetStateSchema]
+
+
 class TweetResponseSchema(ResponseSchema):
     """
     Схема для вывода id твита после публикации
@@ -138,8 +352,12 @@ class TweetOutSchema(BaseModel):
     id: int
     tweet_data: str = Field(alias="content")
     user: UserSchema = Field(alias="author")
+    like_count: int = 0
     likes: List[LikeSchema]
     images: List[str] = Field(alias="attachments")
+    media: List[MediaSchema] = Field(
+        validation_alias=AliasChoices("images", "media"), default=[]
+    )
 
     @field_validator("images", mode="before")
     def serialize_images(cls, val: List[ImagePathSchema]):
@@ -147,7 +365,7 @@ class TweetOutSchema(BaseModel):
         Возвращаем список строк с ссылками на изображение
         """
         if isinstance(val, list):
-            return [v.path_media for v in val]
+            return [storage.url_for(v.path_media) for v in val]
 
         return val
 
@@ -163,3 +381,15 @@ class TweetListSchema(ResponseSchema):
     """
 
     tweets: List[TweetOutSchema]
+    next_cursor: Optional[str] = None
+
+
+class MetricsSchema(ResponseSchema):
+    """
+    Схема для вывода метрик процесса
+    """
+
+    like_buffer: Dict[str, int]
+    auth_cache: Dict[str, int]
+    follow_graph: Dict[str, int]
+    file_deletion: Dict[str, int]
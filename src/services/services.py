@@ -1,18 +1,45 @@
+import asyncio
+import heapq
+import os
+
+from array import array
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
 from http import HTTPStatus
-from itertools import chain
-from typing import List
+from itertools import chain, islice
+from typing import AsyncIterator, Dict, List, Literal, Sequence, Set, Tuple
 
+import aiofiles.os
 from fastapi import UploadFile
-from sqlalchemy import select, update
+from sqlalchemy import ARRAY, CTE, BigInteger, Column, Integer, Select, Text, and_, cast, delete, \
+    func, insert, Row, literal, literal_column, select, true, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from src.config import CELEBRITY_FOLLOWERS_THRESHOLD, FOLLOW_GRAPH_TTL, \
+    LIKERS_PREVIEW_SIZE, MEDIA_GC_BATCH_SIZE, MEDIA_ORPHAN_TTL, \
+    SCORE_AFFINITY_WEIGHT, TIMELINE_BACKFILL_SIZE, TIMELINE_BATCH_SIZE
 from src.database import async_session_maker
-from src.models.models import User, Image, Like, Tweet
+from src.models.models import User, Image, Like, Timeline, Tweet, user_to_user
 from src.schemas.schemas import TweetInSchema
+from src.utils.cursor import decode_cursor, encode_cursor
 from src.utils.exeptions import CustomApiException
-from src.utils.image import delete_images, save_image
+from src.utils.follow_graph import follow_graph
+from src.utils.image import content_lock_id, delete_images, receive_image, \
+    store_image
+from src.utils.image_variants import generate_variants
+from src.utils.like_buffer import LikeEvent, like_buffer
+from src.utils.principal import Principal
+from src.utils.score import tweet_score, tweet_score_expression
+from src.utils.storage import storage
+
+# SQLSTATE нарушения внешнего ключа (например, лайк несуществующего твита)
+FOREIGN_KEY_VIOLATION = "23503"
 
 
 class FollowerService:
@@ -22,11 +49,12 @@ class FollowerService:
 
     @classmethod
     async def create_follower(
-            cls, current_user: User, following_user_id: int,
+            cls, current_user: Principal, following_user_id: int,
             session: AsyncSession
     ) -> None:
         """
-        Создание подписки на пользователя по id
+        Создание подписки на пользователя по id.
+        Проверка пользователя, добавление подписки и обновление счетчиков - один запрос
         :param current_user: объект текущего пользователя
         :param following_user_id: id пользователя для подписки
         :param session: объект асинхронной сессии
@@ -47,11 +75,22 @@ class FollowerService:
                 detail="Invalid data. You can't subscribe to yourself",
             )
 
-        following_user = await UserService.get_user_for_id(
-            user_id=following_user_id, session=session
+        target = select(User.id).where(User.id == following_user_id).cte("target")
+        inserted = (
+            pg_insert(user_to_user)
+            .from_select(["followers_id", "following_id"],
+                         select(literal(current_user.id), target.c.id))
+            .on_conflict_do_nothing()
+            .returning(user_to_user.c.following_id)
+            .cte("inserted")
+        )
+
+        found, created = await cls._execute_follow_statement(
+            target=target, changed=inserted, follower_id=current_user.id,
+            delta=1, session=session
         )
 
-        if not following_user:
+        if not found:
             logger.error(
                 f"Не найден пользователь для подписки (id: {following_user_id})"
             )
@@ -61,9 +100,7 @@ class FollowerService:
                 detail="The subscription user was not found",
             )
 
-        if await cls.check_follower(
-                current_user=current_user, following_user_id=following_user.id
-        ):
+        if not created:
             logger.warning(f"Подписка уже оформлена")
 
             raise CustomApiException(
@@ -71,36 +108,19 @@ class FollowerService:
                 detail="The user is already subscribed",
             )
 
-        current_user_db = await UserService.get_user_for_id(
-            user_id=current_user.id, session=session
-        )
-
-        current_user_db.following.append(following_user)
         await session.commit()
+        follow_graph.follow(current_user.id, following_user_id)
 
         logger.info(f"Подписка оформлена")
 
-    @classmethod
-    async def check_follower(cls, current_user: User,
-                             following_user_id: int) -> bool:
-        """
-        Проверка наличия подписки
-        :param current_user: объект текущего пользователя
-        :param following_user_id: id пользователя для подписки
-        :return: True - если текущий пользователь уже подписан | False - иначе
-        """
-
-        return following_user_id in [
-            following.id for following in current_user.following
-        ]
-
     @classmethod
     async def delete_follower(
-            cls, current_user: User, followed_user_id: int,
+            cls, current_user: Principal, followed_user_id: int,
             session: AsyncSession
     ) -> None:
         """
-        Удаление подписки на пользователя
+        Удаление подписки на пользователя.
+        Проверка пользователя, удаление подписки и обновление счетчиков - один запрос
         :param current_user: объект текущего пользователя
         :param followed_user_id: id пользователя, от которого нужно отписаться
         :param session: объект асинхронной сессии
@@ -121,13 +141,23 @@ class FollowerService:
                 detail="Invalid data. You can't unsubscribe from yourself",
             )
 
-        followed_user = await UserService.get_user_for_id(
-            user_id=followed_user_id, session=session
+        target = select(User.id).where(User.id == followed_user_id).cte("target")
+        deleted = (
+            delete(user_to_user)
+            .where(user_to_user.c.followers_id == current_user.id,
+                   user_to_user.c.following_id == followed_user_id)
+            .returning(user_to_user.c.following_id)
+            .cte("deleted")
+        )
+
+        found, removed = await cls._execute_follow_statement(
+            target=target, changed=deleted, follower_id=current_user.id,
+            delta=-1, session=session
         )
 
-        if not followed_user:
+        if not found:
             logger.error(
-                f"Не найден пользователь для отмены подписки (id: {followed_user})"
+                f"Не найден пользователь для отмены подписки (id: {followed_user_id})"
             )
 
             raise CustomApiException(
@@ -135,9 +165,7 @@ class FollowerService:
                 detail="The user to cancel the subscription was not found",
             )
 
-        if not await cls.check_follower(
-                current_user=current_user, following_user_id=followed_user.id
-        ):
+        if not removed:
             logger.warning(f"Подписка не обнаружена")
 
             raise CustomApiException(
@@ -145,14 +173,319 @@ class FollowerService:
                 detail="The user is not among the subscribers",
             )
 
-        current_user_db = await UserService.get_user_for_id(
-            user_id=current_user.id, session=session
+        await session.commit()
+        follow_graph.unfollow(current_user.id, followed_user_id)
+
+        logger.info(f"Подписка удалена")
+
+    @classmethod
+    async def follow_batch(
+            cls, current_user: Principal, user_ids: List[int],
+            session: AsyncSession
+    ) -> Dict[int, str]:
+        """
+        Массовая подписка на пользователей.
+        Проверка пользователей, добавление подписок и обновление счетчиков - один запрос
+        :param current_user: объект текущего пользователя
+        :param user_ids: id пользователей для подписки
+        :param session: объект асинхронной сессии
+        :return: статус подписки по каждому id
+            (followed / already_following / not_found / self)
+        """
+        logger.debug(
+            f"Запрос массовой подписки пользователя id: {current_user.id} "
+            f"на {len(user_ids)} пользователей"
+        )
+
+        ids = [i for i in dict.fromkeys(user_ids) if i != current_user.id]
+
+        target = select(User.id).where(User.id.in_(ids)).cte("target")
+        inserted = (
+            pg_insert(user_to_user)
+            .from_select(["followers_id", "following_id"],
+                         select(literal(current_user.id), target.c.id))
+            .on_conflict_do_nothing()
+            .returning(user_to_user.c.following_id)
+            .cte("inserted")
         )
 
-        current_user_db.following.remove(followed_user)
+        changed = await cls._execute_batch_statement(
+            target=target, changed=inserted, follower_id=current_user.id,
+            delta=1, session=session
+        ) if ids else {}
+
         await session.commit()
 
-        logger.info(f"Подписка удалена")
+        statuses = {
+            i: "self" if i == current_user.id
+            else "not_found" if i not in changed
+            else "followed" if changed[i]
+            else "already_following"
+            for i in user_ids
+        }
+
+        for i, changed_edge in changed.items():
+            if changed_edge:
+                follow_graph.follow(current_user.id, i)
+
+        logger.info(
+            f"Оформлено подписок: {list(statuses.values()).count('followed')}"
+        )
+
+        return statuses
+
+    @classmethod
+    async def unfollow_batch(
+            cls, current_user: Principal, user_ids: List[int],
+            session: AsyncSession
+    ) -> Dict[int, str]:
+        """
+        Массовая отписка от пользователей.
+        Проверка пользователей, удаление подписок и обновление счетчиков - один запрос
+        :param current_user: объект текущего пользователя
+        :param user_ids: id пользователей, от которых нужно отписаться
+        :param session: объект асинхронной сессии
+        :return: статус отписки по каждому id
+            (unfollowed / not_following / not_found / self)
+        """
+        logger.debug(
+            f"Запрос массовой отписки пользователя id: {current_user.id} "
+            f"от {len(user_ids)} пользователей"
+        )
+
+        ids = [i for i in dict.fromkeys(user_ids) if i != current_user.id]
+
+        target = select(User.id).where(User.id.in_(ids)).cte("target")
+        deleted = (
+            delete(user_to_user)
+            .where(user_to_user.c.followers_id == current_user.id,
+                   user_to_user.c.following_id.in_(ids))
+            .returning(user_to_user.c.following_id)
+            .cte("deleted")
+        )
+
+        changed = await cls._execute_batch_statement(
+            target=target, changed=deleted, follower_id=current_user.id,
+            delta=-1, session=session
+        ) if ids else {}
+
+        await session.commit()
+
+        statuses = {
+            i: "self" if i == current_user.id
+            else "not_found" if i not in changed
+            else "unfollowed" if changed[i]
+            else "not_following"
+            for i in user_ids
+        }
+
+        for i, changed_edge in changed.items():
+            if changed_edge:
+                follow_graph.unfollow(current_user.id, i)
+
+        logger.info(
+            f"Удалено подписок: {list(statuses.values()).count('unfollowed')}"
+        )
+
+        return statuses
+
+    @classmethod
+    async def get_follow_state(
+            cls, current_user: Principal, user_ids: List[int],
+            session: AsyncSession
+    ) -> Dict[int, Tuple[bool, bool]]:
+        """
+        Состояние подписок текущего пользователя по списку пользователей (один запрос по индексам)
+        :param current_user: объект текущего пользователя
+        :param user_ids: id пользователей
+        :param session: объект асинхронной сессии
+        :return: словарь {id пользователя: (подписан ли текущий пользователь, подписан ли на него)}
+        """
+        logger.debug(f"Состояние подписок пользователя id: {current_user.id}")
+
+        state = {user_id: (False, False) for user_id in user_ids}
+
+        if not user_ids:
+            return state
+
+        query = union_all(
+            select(user_to_user.c.following_id, literal(True), literal(False))
+            .where(user_to_user.c.followers_id == current_user.id,
+                   user_to_user.c.following_id.in_(user_ids)),
+            select(user_to_user.c.followers_id, literal(False), literal(True))
+            .where(user_to_user.c.following_id == current_user.id,
+                   user_to_user.c.followers_id.in_(user_ids)),
+        )
+        result = await session.execute(query)
+
+        for user_id, following, followed_by in result.all():
+            was_following, was_followed_by = state[user_id]
+            state[user_id] = (was_following or following,
+                              was_followed_by or followed_by)
+
+        return state
+
+    @classmethod
+    async def _execute_follow_statement(
+            cls, target: CTE, changed: CTE, follower_id: int, delta: int,
+            session: AsyncSession
+    ) -> Tuple[int, int]:
+        """
+        Выполнение изменения подписок одним запросом вместе с обновлением счетчиков
+        :param target: CTE с найденными пользователями
+        :param changed: CTE с добавленными / удаленными подписками (колонка following_id)
+        :param follower_id: id подписчика
+        :param delta: изменение счетчиков на каждую подписку (+1 / -1)
+        :param session: объект асинхронной сессии
+        :return: количество найденных пользователей и измененных подписок
+        """
+        query = select(
+            select(func.count()).select_from(target).scalar_subquery(),
+            select(func.count()).select_from(changed).scalar_subquery(),
+        ).add_cte(
+            *UserService.follow_counters_ctes(
+                follower_id=follower_id, changed=changed, delta=delta
+            )
+        )
+        result = await session.execute(query)
+
+        return tuple(result.one())
+
+    @classmethod
+    async def _execute_batch_statement(
+            cls, target: CTE, changed: CTE, follower_id: int, delta: int,
+            session: AsyncSession
+    ) -> Dict[int, bool]:
+        """
+        Выполнение массового изменения подписок одним запросом вместе с обновлением счетчиков
+        :param target: CTE с найденными пользователями
+        :param changed: CTE с добавленными / удаленными подписками (колонка following_id)
+        :param follower_id: id подписчика
+        :param delta: изменение счетчиков на каждую подписку (+1 / -1)
+        :param session: объект асинхронной сессии
+        :return: найденные id пользователей и признак изменения подписки на каждого
+        """
+        query = (
+            select(target.c.id, changed.c.following_id.is_not(None))
+            .select_from(
+                target.outerjoin(changed, changed.c.following_id == target.c.id)
+            )
+            .add_cte(
+                *UserService.follow_counters_ctes(
+                    follower_id=follower_id, changed=changed, delta=delta
+                )
+            )
+        )
+        result = await session.execute(query)
+
+        return dict(result.all())
+
+
+class SuggestionService:
+    """
+    Сервис для рекомендаций "на кого подписаться" по индексу графа подписок в памяти
+    """
+
+    _rebuild: asyncio.Task | None = None
+
+    @classmethod
+    async def load_graph(cls) -> None:
+        """
+        Построение индекса графа подписок из таблицы user_to_user.
+        Если индекс не построен - ожидание построения, если устарел (FOLLOW_GRAPH_TTL) -
+        перестроение в фоне (до его завершения используется текущий индекс)
+        :return: None
+        """
+        if not follow_graph.is_stale(FOLLOW_GRAPH_TTL):
+            return
+
+        if cls._rebuild is None or cls._rebuild.done():
+            cls._rebuild = asyncio.create_task(cls.rebuild_graph())
+
+        if follow_graph.built_at is None:
+            await asyncio.shield(cls._rebuild)
+
+    @classmethod
+    async def stop(cls) -> None:
+        """
+        Остановка фонового перестроения индекса (при остановке приложения)
+        :return: None
+        """
+        if cls._rebuild is not None:
+            cls._rebuild.cancel()
+
+            with suppress(asyncio.CancelledError, Exception):
+                await cls._rebuild
+
+    @classmethod
+    async def rebuild_graph(cls) -> None:
+        """
+        Перестроение индекса графа подписок: снимок таблицы user_to_user читается потоком,
+        массивы собираются вне event loop и подменяются целиком. Подписки, измененные во время
+        чтения снимка, повторяются поверх новых массивов
+        :return: None
+        """
+        logger.debug("Построение индекса графа подписок")
+
+        follow_graph.begin_rebuild()
+
+        followers, following = array("i"), array("i")
+
+        try:
+            async with async_session_maker() as session:
+                query = select(
+                    user_to_user.c.followers_id, user_to_user.c.following_id
+                ).order_by(user_to_user.c.followers_id, user_to_user.c.following_id)
+                result = await session.stream(query)
+
+                async for partition in result.partitions(TIMELINE_BATCH_SIZE):
+                    followers.extend(row[0] for row in partition)
+                    following.extend(row[1] for row in partition)
+
+            offsets, targets = await asyncio.to_thread(
+                follow_graph.build_arrays, zip(followers, following)
+            )
+
+        except BaseException as exc:
+            follow_graph.cancel_rebuild()
+            logger.error(f"Ошибка построения индекса графа подписок: {exc}")
+            raise
+
+        follow_graph.install(offsets, targets)
+
+        logger.info(f"Индекс графа подписок построен: {follow_graph.stats()}")
+
+    @classmethod
+    async def get_suggestions(
+            cls, current_user: Principal, session: AsyncSession, limit: int
+    ) -> List[Dict]:
+        """
+        Рекомендации пользователей для подписки: подписки подписок текущего пользователя,
+        ранжированные по количеству общих связей
+        :param current_user: объект текущего пользователя
+        :param session: объект асинхронной сессии
+        :param limit: количество рекомендаций
+        :return: список пользователей (id, username, mutual_count)
+        """
+        logger.debug(f"Рекомендации для пользователя id: {current_user.id}")
+
+        await cls.load_graph()
+
+        ranked = follow_graph.suggest(user_id=current_user.id, limit=limit)
+
+        if not ranked:
+            return []
+
+        query = select(User.id, User.username).where(
+            User.id.in_(user_id for user_id, _ in ranked)
+        )
+        usernames = dict((await session.execute(query)).all())
+
+        return [
+            {"id": user_id, "username": usernames[user_id], "mutual_count": count}
+            for user_id, count in ranked
+            if user_id in usernames
+        ]
 
 
 class ImageService:
@@ -161,109 +494,786 @@ class ImageService:
     """
 
     @classmethod
-    async def save_image(cls, image: UploadFile, session: AsyncSession) -> int:
+    async def save_image(
+            cls, image: UploadFile, user_id: int, session: AsyncSession
+    ) -> int:
+        """
+        Сохранение изображения (без привязки к твиту)
+        :param image: файл
+        :param user_id: id загрузившего пользователя
+        :param session: объект асинхронной сессии
+        :return: id изображения
+        """
+        logger.debug("Сохранение изображения")
+
+        received = await receive_image(file=image)
+        (image_id,) = await cls.insert_images(
+            received=[received], user_id=user_id, session=session
+        )
+
+        return image_id
+
+    @classmethod
+    async def save_images(
+            cls, images: List[UploadFile], user_id: int, session: AsyncSession
+    ) -> List[int]:
+        """
+        Пакетное сохранение изображений: файлы принимаются и записываются в хранилище
+        параллельно, записи в БД добавляются одним запросом
+        :param images: файлы
+        :param user_id: id загрузившего пользователя
+        :param session: объект асинхронной сессии
+        :return: id изображений в порядке файлов
+        """
+        logger.debug(f"Пакетное сохранение изображений: {len(images)}")
+
+        results = await asyncio.gather(
+            *(receive_image(file=image) for image in images), return_exceptions=True
+        )
+        received = [r for r in results if not isinstance(r, BaseException)]
+        errors = [r for r in results if isinstance(r, BaseException)]
+
+        if errors:
+            # В хранилище ничего не записано - удаляются только временные файлы
+            for _, tmp_path in received:
+                await aiofiles.os.remove(tmp_path)
+            raise errors[0]
+
+        return await cls.insert_images(
+            received=received, user_id=user_id, session=session
+        )
+
+    @classmethod
+    async def insert_images(
+            cls, received: List[Tuple[Dict, str]], user_id: int,
+            session: AsyncSession
+    ) -> List[int]:
+        """
+        Добавление записей изображений одним запросом и перенос файлов в хранилище.
+        Файлы записываются под блокировкой ключей до фиксации записей: фоновое удаление
+        проверяет ссылки под той же блокировкой и не удалит уже сохраненный файл, на который
+        ссылается новая запись
+        :param received: данные изображений и пути к временным файлам (receive_image)
+        :param user_id: id загрузившего пользователя
+        :param session: объект асинхронной сессии
+        :return: id изображений в порядке переданных данных
+        """
+        rows = [{**values, "user_id": user_id} for values, _ in received]
+        # Одинаковые файлы в одном запросе записываются один раз
+        files = {values["path_media"]: tmp_path for values, tmp_path in received}
+
+        try:
+            await cls.lock_paths(paths=list(files), session=session)
+
+            query = insert(Image).returning(Image.id, sort_by_parameter_order=True)
+            image_ids = (await session.execute(query, rows)).scalars().all()
+
+            await asyncio.gather(
+                *(store_image(key=key, tmp_path=tmp_path) for key, tmp_path in files.items())
+            )
+            await session.commit()
+
+        except BaseException:
+            await session.rollback()
+            # Записанные файлы остались без записей в БД (удаляются, если на них нет других ссылок)
+            delete_images(images=[Image(**row) for row in rows],
+                          keep=cls.referenced_paths)
+            raise
+
+        finally:
+            for _, tmp_path in received:
+                if os.path.exists(tmp_path):
+                    await aiofiles.os.remove(tmp_path)
+
+        return list(image_ids)
+
+    @classmethod
+    async def create_variants(cls, image_id: int) -> None:
+        """
+        Фоновое создание уменьшенных копий изображения и blurhash после загрузки
+        (размеры уточняются с учетом поворота из EXIF)
+        :param image_id: id изображения
+        :return: None
+        """
+        async with async_session_maker() as session:
+            image = await session.get(Image, image_id)
+
+            if image is None:
+                logger.warning(f"Изображение №{image_id} не найдено")
+                return
+
+            try:
+                result = await generate_variants(path_media=image.path_media)
+
+            except Exception as exc:
+                logger.error(
+                    f"Не удалось создать копии изображения №{image_id}: {exc}"
+                )
+                return
+
+            image.variants = result["variants"]
+            image.width = result["width"]
+            image.height = result["height"]
+            image.blurhash = result["blurhash"]
+            await session.commit()
+
+            logger.info(
+                f"Копии изображения №{image_id} созданы: {list(result['variants'])}"
+            )
+
+    @classmethod
+    async def get_images(cls, tweet_id: int, session: AsyncSession) -> List[
+        Image]:
+        """
+        Получить изображения твита.
+        Используется при удалении твита для удаления всех его изображений из файловой системы.
+        :param tweet_id: id твита
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        logger.debug(f"Поиск изображений твита")
+
+        query = select(Image).filter(Image.tweet_id == tweet_id)
+        images = await session.execute(query)
+
+        return list(chain(*images.all()))
+
+    @classmethod
+    async def lock_paths(cls, paths: List[str], session: AsyncSession) -> None:
+        """
+        Блокировка файлов изображений до конца транзакции (pg_advisory_xact_lock).
+        Блокировки берутся в порядке идентификаторов - без взаимных блокировок между запросами
+        :param paths: ключи файлов в хранилище
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        lock_ids = sorted({content_lock_id(key=path) for path in paths})
+        locks = func.unnest(literal(lock_ids, ARRAY(BigInteger))).table_valued(
+            "id"
+        ).render_derived(name="locks")
+
+        await session.execute(select(func.pg_advisory_xact_lock(locks.c.id)))
+
+    @classmethod
+    @asynccontextmanager
+    async def referenced_paths(cls, paths: List[str]) -> AsyncIterator[Set[str]]:
+        """
+        Пути файлов, на которые ссылаются записи изображений (проверка перед удалением файлов:
+        одинаковые изображения хранятся в одном файле). До выхода из контекста файлы
+        заблокированы - новые записи, ссылающиеся на них, ждут удаления файлов
+        :param paths: ключи оригиналов в хранилище
+        :return: ключи, которые еще используются
+        """
+        async with async_session_maker() as session:
+            await cls.lock_paths(paths=paths, session=session)
+
+            query = select(Image.path_media).where(
+                Image.path_media.in_(paths)
+            ).distinct()
+            referenced = await session.execute(query)
+
+            yield set(referenced.scalars().all())
+
+            await session.commit()
+
+    @classmethod
+    async def collect_garbage(cls, session: AsyncSession) -> int:
+        """
+        Удаление изображений, не прикрепленных к твитам дольше MEDIA_ORPHAN_TTL секунд
+        (пачками по MEDIA_GC_BATCH_SIZE записей, файлы удаляются в фоне)
+        :param session: объект асинхронной сессии
+        :return: количество удаленных изображений
+        """
+        logger.debug("Очистка неприкрепленных изображений")
+
+        cutoff = datetime.utcnow() - timedelta(seconds=MEDIA_ORPHAN_TTL)
+        total = 0
+
+        while True:
+            batch = (
+                select(Image.id)
+                .where(Image.tweet_id.is_(None), Image.created_at < cutoff)
+                .limit(MEDIA_GC_BATCH_SIZE)
+            )
+            query = (
+                delete(Image)
+                # Изображение могло быть прикреплено к твиту после выборки пачки
+                .where(Image.id.in_(batch), Image.tweet_id.is_(None))
+                .returning(Image)
+            )
+            images = (await session.execute(query)).scalars().all()
+            await session.commit()
+
+            delete_images(images=images, keep=cls.referenced_paths)
+            total += len(images)
+
+            if len(images) < MEDIA_GC_BATCH_SIZE:
+                break
+
+        logger.info(f"Удалено неприкрепленных изображений: {total}")
+
+        return total
+
+
+class TimelineService:
+    """
+    Сервис для ведения домашних лент пользователей.
+    Твиты обычных пользователей раскладываются по лентам подписчиков при публикации (push),
+    твиты пользователей с числом подписчиков больше CELEBRITY_FOLLOWERS_THRESHOLD
+    подмешиваются в ленту при чтении (pull). Способ доставки фиксируется в твите (fanned_out)
+    и не меняется, если число подписчиков автора потом переходит порог
+    """
+
+    @classmethod
+    async def read(
+            cls, user_id: int, session: AsyncSession, limit: int,
+            cursor: str | None = None
+    ) -> Tuple[List[int], str | None]:
+        """
+        Чтение страницы ленты: слияние материализованной ленты с последними не разложенными
+        по лентам твитами подписок пользователя (k-way merge по (created_at, id))
+        :param user_id: id пользователя
+        :param session: объект асинхронной сессии
+        :param limit: количество твитов на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :return: список id твитов по убыванию даты и курсор следующей страницы
+        """
+        key = decode_cursor(cursor, datetime, int) if cursor else None
+
+        timeline_query = (
+            select(Timeline.created_at, Timeline.tweet_id)
+            .where(Timeline.user_id == user_id)
+            .order_by(Timeline.created_at.desc(), Timeline.tweet_id.desc())
+            .limit(limit + 1)
+        )
+
+        followees = select(user_to_user.c.following_id).where(
+            user_to_user.c.followers_id == user_id
+        )
+        pulled_query = (
+            select(Tweet.created_at, Tweet.id)
+            .where(Tweet.user_id.in_(followees), ~Tweet.fanned_out)
+            .order_by(Tweet.created_at.desc(), Tweet.id.desc())
+            .limit(limit + 1)
+        )
+
+        if key:
+            timeline_query = timeline_query.where(
+                tuple_(Timeline.created_at, Timeline.tweet_id) < tuple_(*key)
+            )
+            pulled_query = pulled_query.where(
+                tuple_(Tweet.created_at, Tweet.id) < tuple_(*key)
+            )
+
+        streams = [
+            [tuple(row) for row in await session.execute(timeline_query)],
+            [tuple(row) for row in await session.execute(pulled_query)],
+        ]
+
+        # Потоки не пересекаются: в ленты попадают только разложенные твиты
+        page = list(islice(heapq.merge(*streams, reverse=True), limit + 1))
+
+        next_cursor = None
+
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(*page[-1])
+
+        return [tweet_id for _, tweet_id in page], next_cursor
+
+    @classmethod
+    def fan_out_cte(cls, inserted: CTE) -> CTE:
+        """
+        Раскладка нового твита по лентам подписчиков автора (CTE для запроса создания твита).
+        Твиты "знаменитостей" (fanned_out = False) не раскладываются - подмешиваются в ленту
+        при чтении
+        :param inserted: CTE добавленного твита (id, user_id, created_at, fanned_out)
+        :return: CTE вставленных записей лент (user_id)
+        """
+        return (
+            insert(Timeline)
+            .from_select(
+                ["user_id", "tweet_id", "author_id", "created_at"],
+                select(user_to_user.c.followers_id, inserted.c.id,
+                       inserted.c.user_id, inserted.c.created_at)
+                .join(inserted, inserted.c.user_id == user_to_user.c.following_id)
+                .where(inserted.c.fanned_out)
+            )
+            .returning(Timeline.user_id)
+            .cte("fanned_out")
+        )
+
+    @classmethod
+    async def remove_tweet(cls, tweet_id: int, session: AsyncSession) -> None:
+        """
+        Удаление твита из лент всех пользователей (в транзакции удаления твита)
+        :param tweet_id: id твита
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        logger.debug(f"Удаление твита №{tweet_id} из лент")
+
+        query = delete(Timeline).where(Timeline.tweet_id == tweet_id)
+        await session.execute(query)
+
+    @classmethod
+    def top_query(
+            cls, user_id: int, limit: int, key: Tuple[float, int] | None = None
+    ) -> Select:
+        """
+        Запрос страницы ленты в режиме "top". Рейтинг твита в ленте - предрассчитанный рейтинг
+        с надбавкой за близость к автору (количество лайков пользователя твитам этого автора).
+        Надбавка одинакова для всех твитов автора, поэтому лучшие твиты каждой подписки читаются
+        по индексу (user_id, score, id) и сливаются по итоговому рейтингу
+        :param user_id: id пользователя
+        :param limit: количество твитов на странице
+        :param key: ключ последнего твита предыдущей страницы (рейтинг в ленте, id)
+        :return: запрос с колонками id, rank (не более limit + 1 строк)
+        """
+        # Близость считается отдельно для каждой подписки (автора-кандидата страницы), а не
+        # по всей истории лайков пользователя: планировщик выбирает между лайками пользователя
+        # и твитами автора
+        liked = aliased(Tweet)
+        affinity = (
+            select(func.count().label("likes"))
+            .select_from(liked)
+            .join(Like, and_(Like.tweets_id == liked.id, Like.user_id == user_id))
+            .where(liked.user_id == user_to_user.c.following_id)
+            .lateral("affinity")
+        )
+        followees = (
+            select(
+                user_to_user.c.following_id.label("author_id"),
+                (SCORE_AFFINITY_WEIGHT * func.ln(1 + affinity.c.likes)).label("bonus"),
+            )
+            .join(affinity, true())
+            .where(user_to_user.c.followers_id == user_id)
+            .subquery("followees")
+        )
+
+        rank = Tweet.score + followees.c.bonus
+        author_tweets = (
+            select(Tweet.id, rank.label("rank"))
+            .where(Tweet.user_id == followees.c.author_id)
+            .order_by(Tweet.score.desc(), Tweet.id.desc())
+            .limit(limit + 1)
+        )
+
+        if key:
+            author_tweets = author_tweets.where(
+                # Условие для индекса (с запасом на погрешность вычитания надбавки)
+                Tweet.score <= key[0] - followees.c.bonus + 1e-6,
+                tuple_(rank, Tweet.id) < tuple_(*key),
+            )
+
+        author_tweets = author_tweets.lateral("author_tweets")
+
+        return (
+            select(author_tweets.c.id, author_tweets.c.rank)
+            .select_from(followees)
+            .join(author_tweets, true())
+            .order_by(author_tweets.c.rank.desc(), author_tweets.c.id.desc())
+            .limit(limit + 1)
+        )
+
+    @classmethod
+    async def read_top(
+            cls, user_id: int, session: AsyncSession, limit: int,
+            cursor: str | None = None
+    ) -> Tuple[List[int], str | None]:
+        """
+        Чтение страницы ленты в режиме "top": твиты подписок по убыванию рейтинга с учетом
+        близости к автору (keyset-пагинация по итоговому рейтингу и id)
+        :param user_id: id пользователя
+        :param session: объект асинхронной сессии
+        :param limit: количество твитов на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :return: список id твитов и курсор следующей страницы
+        """
+        key = decode_cursor(cursor, float, int) if cursor else None
+
+        query = cls.top_query(user_id=user_id, limit=limit, key=key)
+        page = (await session.execute(query)).all()
+        next_cursor = None
+
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1].rank, page[-1].id)
+
+        return [row.id for row in page], next_cursor
+
+    @classmethod
+    def author_tweets_query(
+            cls, author_id: int, limit: int,
+            key: Tuple[datetime, int] | None = None
+    ) -> Select:
+        """
+        Запрос последних разложенных по лентам твитов автора (заполнение ленты после подписки)
+        :param author_id: id автора
+        :param limit: количество твитов
+        :param key: ключ последнего твита предыдущей пачки (created_at, id)
+        :return: объект запроса (id, created_at)
+        """
+        query = (
+            select(Tweet.id, Tweet.created_at)
+            .where(Tweet.user_id == author_id, Tweet.fanned_out)
+            .order_by(Tweet.created_at.desc(), Tweet.id.desc())
+            .limit(limit)
+        )
+
+        if key:
+            query = query.where(tuple_(Tweet.created_at, Tweet.id) < tuple_(*key))
+
+        return query
+
+    @classmethod
+    async def backfill(cls, follower_id: int, following_id: int) -> None:
+        """
+        Фоновое заполнение ленты последними разложенными по лентам твитами пользователя после
+        оформления подписки (остальные подмешиваются при чтении).
+        Выполняется пачками по TIMELINE_BATCH_SIZE, не более TIMELINE_BACKFILL_SIZE твитов.
+        :param follower_id: id подписчика
+        :param following_id: id пользователя, на которого оформлена подписка
+        :return: None
+        """
+        logger.debug(
+            f"Заполнение ленты пользователя id: {follower_id} твитами id: {following_id}"
+        )
+
+        edge_exists = (
+            select(user_to_user)
+            .where(user_to_user.c.followers_id == follower_id,
+                   user_to_user.c.following_id == following_id)
+            .exists()
+        )
+        key = None
+        total = 0
+
+        async with async_session_maker() as session:
+            while total < TIMELINE_BACKFILL_SIZE:
+                batch_size = min(TIMELINE_BATCH_SIZE,
+                                 TIMELINE_BACKFILL_SIZE - total)
+
+                query = cls.author_tweets_query(
+                    author_id=following_id, limit=batch_size, key=key
+                )
+                rows = (await session.execute(query)).all()
+
+                if not rows:
+                    break
+
+                # Подписка могла быть отменена, пока задача ждала выполнения
+                query = (
+                    pg_insert(Timeline)
+                    .from_select(
+                        ["user_id", "tweet_id", "author_id", "created_at"],
+                        select(
+                            literal(follower_id), Tweet.id, Tweet.user_id,
+                            Tweet.created_at
+                        ).where(Tweet.id.in_(row.id for row in rows),
+                                edge_exists),
+                    )
+                    .on_conflict_do_nothing()
+                )
+                await session.execute(query)
+                await session.commit()
+
+                total += len(rows)
+                key = (rows[-1].created_at, rows[-1].id)
+
+                if len(rows) < batch_size:
+                    break
+
+        logger.info(f"В ленту добавлено твитов: {total}")
+
+    @classmethod
+    async def cleanup(cls, follower_id: int, following_id: int) -> None:
         """
-        Сохранение изображения (без привязки к твиту)
-        :param image: файл
-        :param session: объект асинхронной сессии
-        :return: id изображения
+        Фоновое удаление твитов пользователя из ленты после отмены подписки.
+        Удаление выполняется пачками по TIMELINE_BATCH_SIZE записей.
+        :param follower_id: id бывшего подписчика
+        :param following_id: id пользователя, от которого отменена подписка
+        :return: None
         """
-        logger.debug("Сохранение изображения")
+        logger.debug(
+            f"Очистка ленты пользователя id: {follower_id} от твитов id: {following_id}"
+        )
 
-        path = await save_image(file=image)
-        image_obj = Image(path_media=path)
-        session.add(image_obj)
-        await session.commit()
+        edge_exists = (
+            select(user_to_user)
+            .where(user_to_user.c.followers_id == follower_id,
+                   user_to_user.c.following_id == following_id)
+            .exists()
+        )
+
+        async with async_session_maker() as session:
+            while True:
+                batch = (
+                    select(Timeline.tweet_id)
+                    .where(Timeline.user_id == follower_id,
+                           Timeline.author_id == following_id)
+                    .limit(TIMELINE_BATCH_SIZE)
+                )
+                # Пользователь мог снова подписаться, пока задача ждала выполнения:
+                # записи новой подписки (заполнение ленты, раскладка) не удаляются
+                query = delete(Timeline).where(
+                    Timeline.user_id == follower_id,
+                    Timeline.tweet_id.in_(batch.scalar_subquery()),
+                    ~edge_exists,
+                )
+
+                result = await session.execute(query)
+                await session.commit()
 
-        return image_obj.id
+                if result.rowcount < TIMELINE_BATCH_SIZE:
+                    break
 
     @classmethod
-    async def update_images(
-            cls, tweet_media_ids: List[int], tweet_id: int,
-            session: AsyncSession
-    ) -> None:
+    async def rebuild(cls, session: AsyncSession) -> None:
         """
-        Обновление изображений (привязка к твиту)
-        :param tweet_media_ids: список с id изображений
-        :param tweet_id: id твита для привязки изображений
+        Полное заполнение лент по текущим подпискам (демонстрационные данные, восстановление)
         :param session: объект асинхронной сессии
         :return: None
         """
-        logger.debug(
-            f"Обновление изображений по id: {tweet_media_ids}, tweet_id: {tweet_id}"
-        )
+        logger.debug("Перестроение лент пользователей")
 
         query = (
-            update(Image).where(Image.id.in_(tweet_media_ids)).values(
-                tweet_id=tweet_id)
+            pg_insert(Timeline)
+            .from_select(
+                ["user_id", "tweet_id", "author_id", "created_at"],
+                select(
+                    user_to_user.c.followers_id, Tweet.id, Tweet.user_id,
+                    Tweet.created_at
+                )
+                .join(Tweet, Tweet.user_id == user_to_user.c.following_id)
+                .where(Tweet.fanned_out),
+            )
+            .on_conflict_do_nothing()
         )
         await session.execute(query)
 
+
+class TweetsService:
+    """
+    Сервис для добавления, удаления и вывода твитов
+    """
+
     @classmethod
-    async def get_images(cls, tweet_id: int, session: AsyncSession) -> List[
-        Image]:
+    async def get_feed_page(
+            cls, user: Principal, session: AsyncSession, limit: int,
+            cursor: str | None = None, mode: str = "latest"
+    ) -> Tuple[List[int], str | None]:
         """
-        Получить изображения твита.
-        Используется при удалении твита для удаления всех его изображений из файловой системы.
-        :param tweet_id: id твита
+        Выбор страницы ленты в зависимости от режима
+        :param user: объект текущего пользователя
         :param session: объект асинхронной сессии
-        :return: None
+        :param limit: количество твитов на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :param mode: "latest" - по дате | "top" - по рейтингу
+        :return: список id твитов и курсор следующей страницы
         """
-        logger.debug(f"Поиск изображений твита")
-
-        query = select(Image).filter(Image.tweet_id == tweet_id)
-        images = await session.execute(query)
+        read = TimelineService.read_top if mode == "top" else TimelineService.read
 
-        return list(chain(*images.all()))
+        return await read(user_id=user.id, session=session, limit=limit,
+                          cursor=cursor)
 
     @classmethod
-    async def delete_images(cls, tweet_id: int, session: AsyncSession) -> None:
+    async def get_tweets(
+            cls, user: Principal, session: AsyncSession, limit: int,
+            cursor: str | None = None, mode: str = "latest"
+    ) -> Tuple[List[Tweet], str | None]:
         """
-        Удаление изображений твита
-        :param tweet_id: id твита
+        Вывод твитов подписанных пользователей: последних (keyset-пагинация по (created_at, id))
+        или лучших по рейтингу (keyset-пагинация по (score, id))
+        :param user: объект текущего пользователя
         :param session: объект асинхронной сессии
-        :return: None
+        :param limit: количество твитов на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :param mode: "latest" - по дате | "top" - по рейтингу
+        :return: список с твитами и курсор следующей страницы
         """
-        logger.debug("Удаление изображений твита")
+        logger.debug(f"Вывод твитов (mode: {mode}, limit: {limit}, cursor: {cursor})")
 
-        images = await cls.get_images(tweet_id=tweet_id, session=session)
+        tweet_ids, next_cursor = await cls.get_feed_page(
+            user=user, session=session, limit=limit, cursor=cursor, mode=mode
+        )
 
-        if images:
-            await delete_images(images=images)
-        else:
-            logger.warning("Изображения не найдены")
+        query = (
+            select(Tweet)
+            .where(Tweet.id.in_(tweet_ids))
+            .options(
+                joinedload(Tweet.user),
+                selectinload(Tweet.images),
+            )
+        )
 
+        result = await session.execute(query)
+        tweets = {tweet.id: tweet for tweet in result.scalars().all()}
 
-class TweetsService:
-    """
-    Сервис для добавления, удаления и вывода твитов
-    """
+        likers = await LikeService.get_likers_preview(
+            tweet_ids=tweet_ids, viewer_id=user.id, session=session
+        )
+
+        for tweet in tweets.values():
+            # В ленту отдается ограниченная выборка лайков (полный список - отдельным запросом).
+            # Коллекция заполняется без отметки об изменении, сессия используется только на чтение
+            set_committed_value(tweet, "likes", likers.get(tweet.id, []))
+
+        return [tweets[tweet_id] for tweet_id in tweet_ids if tweet_id in tweets], \
+            next_cursor
+
+    @classmethod
+    def media_urls_expressions(cls) -> Tuple:
+        """
+        Ссылки на изображение и его копии при сборке JSON в PostgreSQL (ключ хранилища с
+        префиксом ссылки, как в MediaSchema)
+        :return: выражения ссылки на оригинал и JSON-объекта ссылок на копии
+        """
+        if not storage.url_prefix:
+            return Image.path_media, Image.variants
+
+        prefix = literal(storage.url_prefix, Text)
+        variants = func.json_each_text(Image.variants).table_valued("key", "value")
+        variants_json = (
+            select(func.json_object_agg(variants.c.key, prefix + variants.c.value))
+            .select_from(variants)
+            .scalar_subquery()
+        )
+
+        return prefix + Image.path_media, variants_json
 
     @classmethod
-    async def get_tweets(cls, user: User, session: AsyncSession):
+    async def get_tweets_json(
+            cls, user: Principal, session: AsyncSession, limit: int,
+            cursor: str | None = None, mode: str = "latest"
+    ) -> bytes:
         """
-        Вывод последних твитов подписанных пользователей
+        Вывод ленты, собранной на стороне PostgreSQL (json_build_object / json_agg).
+        Ответ совпадает с TweetListSchema, но без построения ORM-объектов и валидации Pydantic
         :param user: объект текущего пользователя
         :param session: объект асинхронной сессии
-        :return: список с твитами
+        :param limit: количество твитов на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :param mode: "latest" - по дате | "top" - по рейтингу
+        :return: готовое тело ответа
         """
-        logger.debug("Вывод твитов")
+        logger.debug(
+            f"Вывод твитов через SQL (mode: {mode}, limit: {limit}, cursor: {cursor})"
+        )
+
+        tweet_ids, next_cursor = await cls.get_feed_page(
+            user=user, session=session, limit=limit, cursor=cursor, mode=mode
+        )
+
+        empty = literal_column("'[]'::json")
+        author = aliased(User)
+        liker = aliased(User)
+
+        candidates = union_all(
+            *(
+                LikeService.likers_preview_query(
+                    tweet_ids=tweet_ids, viewer_id=user.id,
+                    followees_only=followees_only
+                ).add_columns(literal(priority).label("priority"))
+                for priority, followees_only in enumerate((True, False))
+            )
+        ).subquery("candidates")
+        unique_likers = (
+            select(candidates.c.tweet_id, candidates.c.like_id,
+                   candidates.c.user_id,
+                   func.min(candidates.c.priority).label("priority"))
+            .group_by(candidates.c.tweet_id, candidates.c.like_id,
+                      candidates.c.user_id)
+            .subquery("unique_likers")
+        )
+        ranked_likers = select(
+            unique_likers,
+            func.row_number().over(
+                partition_by=unique_likers.c.tweet_id,
+                order_by=(unique_likers.c.priority,
+                          unique_likers.c.like_id.desc()),
+            ).label("rank"),
+        ).cte("ranked_likers")
+
+        likes_json = (
+            select(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object("user_id", liker.id,
+                                               "name", liker.username),
+                        ranked_likers.c.rank,
+                    )
+                )
+            )
+            .select_from(ranked_likers)
+            .join(liker, liker.id == ranked_likers.c.user_id)
+            .where(ranked_likers.c.tweet_id == Tweet.id,
+                   ranked_likers.c.rank <= LIKERS_PREVIEW_SIZE)
+            .scalar_subquery()
+        )
+        image_url, variants_json = cls.media_urls_expressions()
+        images_json = (
+            select(func.json_agg(aggregate_order_by(image_url, Image.id)))
+            .where(Image.tweet_id == Tweet.id)
+            .scalar_subquery()
+        )
+        media_json = (
+            select(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object(
+                            "url", image_url,
+                            "variants", func.coalesce(
+                                variants_json, literal_column("'{}'::json")
+                            ),
+                            "mime_type", Image.mime_type,
+                            "size", Image.size,
+                            "width", Image.width,
+                            "height", Image.height,
+                            "blurhash", Image.blurhash,
+                        ),
+                        Image.id,
+                    )
+                )
+            )
+            .where(Image.tweet_id == Tweet.id)
+            .scalar_subquery()
+        )
+        tweet_json = func.json_build_object(
+            "id", Tweet.id,
+            "content", Tweet.tweet_data,
+            "author", func.json_build_object("id", author.id,
+                                             "name", author.username),
+            "like_count", Tweet.like_count,
+            "likes", func.coalesce(likes_json, empty),
+            "attachments", func.coalesce(images_json, empty),
+            "media", func.coalesce(media_json, empty),
+        )
+        position = func.array_position(literal(tweet_ids, ARRAY(Integer)),
+                                       Tweet.id)
 
         query = (
-            select(Tweet)
-            .filter(Tweet.user_id.in_(user.id for user in user.following))
-            .options(
-                joinedload(Tweet.user),
-                joinedload(Tweet.likes).subqueryload(Like.user),
-                joinedload(Tweet.images),
+            select(
+                cast(
+                    func.json_build_object(
+                        "result", true(),
+                        "tweets", func.coalesce(
+                            func.json_agg(aggregate_order_by(tweet_json, position)),
+                            empty,
+                        ),
+                        "next_cursor", cast(literal(next_cursor), Text),
+                    ),
+                    Text,
+                )
             )
-            .order_by(Tweet.created_at.desc())
+            .select_from(Tweet)
+            .join(author, author.id == Tweet.user_id)
+            .where(Tweet.id.in_(tweet_ids))
         )
 
         result = await session.execute(query)
-        tweets = result.unique().scalars().all()
 
-        return tweets
+        return result.scalar_one().encode()
 
     @classmethod
     async def get_tweet(cls, tweet_id: int,
@@ -283,38 +1293,70 @@ class TweetsService:
 
     @classmethod
     async def create_tweet(
-            cls, tweet: TweetInSchema, current_user: User,
+            cls, tweet: TweetInSchema, current_user: Principal,
             session: AsyncSession
-    ) -> Tweet:
+    ) -> int:
         """
-        Создание нового твита
+        Создание нового твита.
+        Добавление твита, привязка изображений и раскладка по лентам подписчиков - один запрос.
+        Привязываются только не прикрепленные к другим твитам изображения текущего пользователя
         :param tweet: данные для нового твита
         :param current_user: объект текущего пользователя
         :param session: объект асинхронной сессии
-        :return: объект нового твита
+        :return: id нового твита
         """
         logger.debug("Добавление нового твита")
 
-        new_tweet = Tweet(tweet_data=tweet.tweet_data, user_id=current_user.id)
+        media_ids = list(dict.fromkeys(tweet.tweet_media_ids or []))
+        created_at = datetime.utcnow()
+        # Твиты "знаменитостей" не раскладываются по лентам
+        fanned_out = select(
+            User.followers_count <= CELEBRITY_FOLLOWERS_THRESHOLD
+        ).where(User.id == current_user.id).scalar_subquery()
+
+        inserted = (
+            insert(Tweet)
+            .values(tweet_data=tweet.tweet_data, user_id=current_user.id,
+                    created_at=created_at, like_count=0,
+                    score=tweet_score(0, created_at), fanned_out=fanned_out)
+            .returning(Tweet.id, Tweet.user_id, Tweet.created_at, Tweet.fanned_out)
+            .cte("inserted")
+        )
+        attached = (
+            update(Image)
+            .where(Image.id.in_(media_ids),
+                   Image.user_id == current_user.id,
+                   Image.tweet_id.is_(None))
+            .values(tweet_id=select(inserted.c.id).scalar_subquery())
+            .returning(Image.id)
+            .cte("attached")
+        )
+        fanned_out = TimelineService.fan_out_cte(inserted=inserted)
 
-        session.add(new_tweet)
-        await session.flush()
+        query = select(
+            inserted.c.id,
+            select(func.count()).select_from(attached).scalar_subquery(),
+            select(func.count()).select_from(fanned_out).scalar_subquery(),
+        )
+        tweet_id, attached_count, fanned_out_count = (await session.execute(query)).one()
 
-        tweet_media_ids = tweet.tweet_media_ids
+        await session.commit()
 
-        if tweet_media_ids and tweet_media_ids != []:
-            await ImageService.update_images(
-                tweet_media_ids=tweet_media_ids, tweet_id=new_tweet.id,
-                session=session
+        if attached_count < len(media_ids):
+            logger.warning(
+                f"К твиту №{tweet_id} прикреплено изображений: {attached_count} "
+                f"из {len(media_ids)} (чужие или уже прикрепленные пропущены)"
             )
 
-        await session.commit()
+        logger.info(
+            f"Твит №{tweet_id} добавлен, разложен по лентам: {fanned_out_count}"
+        )
 
-        return new_tweet
+        return tweet_id
 
     @classmethod
     async def delete_tweet(
-            cls, user: User, tweet_id: int, session: AsyncSession
+            cls, user: Principal, tweet_id: int, session: AsyncSession
     ) -> None:
         """
         Удаление твита
@@ -344,11 +1386,17 @@ class TweetsService:
                 )
 
             else:
-                await ImageService.delete_images(tweet_id=tweet.id,
-                                                 session=session)
+                images = await ImageService.get_images(tweet_id=tweet.id,
+                                                       session=session)
+                await TimelineService.remove_tweet(tweet_id=tweet.id,
+                                                   session=session)
                 await session.delete(tweet)
                 await session.commit()
 
+                # Файлы удаляются в фоне после фиксации удаления записей
+                delete_images(images=images,
+                              keep=ImageService.referenced_paths)
+
 
 class LikeService:
     """
@@ -359,7 +1407,8 @@ class LikeService:
     async def like(cls, tweet_id: int, user_id: int,
                    session: AsyncSession) -> None:
         """
-        Лайк твита
+        Лайк твита.
+        Добавление лайка (идемпотентно по уникальному индексу) и обновление счетчика - один запрос
         :param tweet_id: id твита для лайка
         :param user_id: id пользователя
         :param session: объект асинхронной сессии
@@ -367,19 +1416,35 @@ class LikeService:
         """
         logger.debug(f"Лайк твита №{tweet_id}")
 
-        tweet = await TweetsService.get_tweet(tweet_id=tweet_id,
-                                              session=session)
+        inserted = (
+            pg_insert(Like)
+            .values(user_id=user_id, tweets_id=tweet_id)
+            .on_conflict_do_nothing(index_elements=[Like.user_id, Like.tweets_id])
+            .returning(Like.tweets_id)
+            .cte("inserted")
+        )
+        query = (
+            select(func.count())
+            .select_from(inserted)
+            .add_cte(cls.like_counter_cte(changed=inserted, delta=1))
+        )
+
+        try:
+            created = (await session.execute(query)).scalar_one()
+
+        except IntegrityError as exc:
+            await session.rollback()
+
+            if getattr(exc.orig, "pgcode", None) != FOREIGN_KEY_VIOLATION:
+                raise
 
-        if not tweet:
             logger.error("Твит не найден")
 
             raise CustomApiException(
                 status_code=HTTPStatus.NOT_FOUND, detail="Tweet not found"
             )
 
-        if await cls.check_like_tweet(
-                tweet_id=tweet_id, user_id=user_id, session=session
-        ):
+        if not created:
             logger.warning("Пользователь уже ставил лайк твиту")
 
             raise CustomApiException(
@@ -387,41 +1452,214 @@ class LikeService:
                 detail="The user has already liked this tweet",
             )
 
-        like_record = Like(user_id=user_id, tweets_id=tweet.id)
-
-        session.add(like_record)
         await session.commit()
 
     @classmethod
-    async def check_like_tweet(
-            cls, tweet_id: int, user_id: int, session: AsyncSession
-    ) -> Like | None:
+    async def apply_events(cls, events: List[LikeEvent],
+                           session: AsyncSession) -> None:
         """
-        Проверка лайка (метод возвращает запись о лайке, проверяя тем самым, ставил ли пользователь лайк
-        указанному твиту)
-        :param tweet_id: id твита
+        Запись пачки событий из буфера лайков одним запросом: многострочные вставка и удаление
+        лайков и обновление счетчиков по фактически измененным записям.
+        Для каждой пары (пользователь, твит) применяется последнее событие
+        :param events: события буфера лайков в порядке поступления
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        latest = {(user_id, tweet_id): op for op, user_id, tweet_id in events}
+
+        def pairs(op: str, name: str):
+            user_ids = [user_id for (user_id, _), o in latest.items() if o == op]
+            tweet_ids = [tweet_id for (_, tweet_id), o in latest.items() if o == op]
+
+            return func.unnest(
+                cast(user_ids, ARRAY(Integer)), cast(tweet_ids, ARRAY(Integer))
+            ).table_valued("user_id", "tweet_id").render_derived(name=name)
+
+        liked, disliked = pairs("like", "liked"), pairs("dislike", "disliked")
+
+        inserted = (
+            pg_insert(Like)
+            .from_select(
+                ["user_id", "tweets_id"],
+                # Лайки удаленных твитов пропускаются
+                select(liked.c.user_id, liked.c.tweet_id)
+                .join(Tweet, Tweet.id == liked.c.tweet_id),
+            )
+            .on_conflict_do_nothing(index_elements=[Like.user_id, Like.tweets_id])
+            .returning(Like.tweets_id)
+            .cte("inserted")
+        )
+        deleted = (
+            delete(Like)
+            .where(tuple_(Like.user_id, Like.tweets_id).in_(
+                select(disliked.c.user_id, disliked.c.tweet_id)
+            ))
+            .returning(Like.tweets_id)
+            .cte("deleted")
+        )
+        changes = union_all(
+            select(inserted.c.tweets_id, literal(1).label("delta")),
+            select(deleted.c.tweets_id, literal(-1).label("delta")),
+        ).subquery("changes")
+        deltas = (
+            select(changes.c.tweets_id, func.sum(changes.c.delta).label("delta"))
+            .group_by(changes.c.tweets_id)
+            .subquery("deltas")
+        )
+        counter = (
+            update(Tweet)
+            .where(Tweet.id == deltas.c.tweets_id)
+            .values(
+                like_count=Tweet.like_count + deltas.c.delta,
+                score=tweet_score_expression(Tweet.like_count + deltas.c.delta,
+                                             Tweet.created_at),
+            )
+            .returning(Tweet.id)
+            .cte("like_counter")
+        )
+
+        query = select(func.count()).select_from(counter)
+        updated = (await session.execute(query)).scalar_one()
+
+        logger.debug(
+            f"Записано событий лайков: {len(latest)}, обновлено твитов: {updated}"
+        )
+
+    @classmethod
+    async def flush_buffer(cls, events: List[LikeEvent]) -> None:
+        """
+        Запись пачки событий из буфера лайков в БД (в отдельной транзакции)
+        :param events: события буфера лайков в порядке поступления
+        :return: None
+        """
+        async with async_session_maker() as session:
+            await cls.apply_events(events=events, session=session)
+            await session.commit()
+
+    @classmethod
+    async def get_liked_by_user(
+            cls, tweet_ids: List[int], user_id: int, session: AsyncSession
+    ) -> Set[int]:
+        """
+        Твиты из переданного списка, которые лайкнул пользователь (с учетом событий буфера лайков,
+        еще не записанных в БД)
+        :param tweet_ids: id твитов
         :param user_id: id пользователя
         :param session: объект асинхронной сессии
+        :return: множество id лайкнутых твитов
         """
-        logger.debug("Поиск записи о лайке")
+        logger.debug(f"Состояние лайков пользователя id: {user_id}")
+
+        if not tweet_ids:
+            return set()
+
+        query = select(Like.tweets_id).where(Like.user_id == user_id,
+                                             Like.tweets_id.in_(tweet_ids))
+        liked = set((await session.execute(query)).scalars().all())
 
-        query = select(Like).where(Like.user_id == user_id,
-                                   Like.tweets_id == tweet_id)
-        like = await session.execute(query)
+        requested = set(tweet_ids)
 
-        return like.scalar_one_or_none()
+        for op, event_user_id, tweet_id in like_buffer.pending():
+            if event_user_id == user_id and tweet_id in requested:
+                if op == "like":
+                    liked.add(tweet_id)
+                else:
+                    liked.discard(tweet_id)
+
+        return liked
 
     @classmethod
-    async def dislike(cls, tweet_id: int, user_id: int,
-                      session: AsyncSession) -> None:
+    def likers_preview_query(
+            cls, tweet_ids: List[int], viewer_id: int, followees_only: bool
+    ) -> Select:
+        """
+        Запрос последних LIKERS_PREVIEW_SIZE лайков каждого из твитов (LATERAL ... LIMIT по индексу)
+        :param tweet_ids: id твитов страницы ленты
+        :param viewer_id: id текущего пользователя
+        :param followees_only: только лайки пользователей, на которых подписан текущий пользователь
+        :return: запрос с колонками tweet_id, like_id, user_id
+        """
+        page = select(Tweet.id).where(Tweet.id.in_(tweet_ids)).subquery("page")
+        liked = aliased(Like)
+
+        likers = (
+            select(liked.id, liked.user_id)
+            .where(liked.tweets_id == page.c.id)
+            .order_by(liked.id.desc())
+            .limit(LIKERS_PREVIEW_SIZE)
+        )
+
+        if followees_only:
+            likers = likers.join(
+                user_to_user,
+                and_(user_to_user.c.following_id == liked.user_id,
+                     user_to_user.c.followers_id == viewer_id),
+            )
+
+        likers = likers.lateral("likers")
+
+        return (
+            select(page.c.id.label("tweet_id"), likers.c.id.label("like_id"),
+                   likers.c.user_id)
+            .select_from(page)
+            .join(likers, true())
+        )
+
+    @classmethod
+    async def get_likers_preview(
+            cls, tweet_ids: List[int], viewer_id: int, session: AsyncSession
+    ) -> Dict[int, List[Like]]:
+        """
+        Выборка лайков для превью в ленте: не более LIKERS_PREVIEW_SIZE на твит,
+        сначала лайки пользователей, на которых подписан текущий пользователь, затем последние
+        :param tweet_ids: id твитов страницы ленты
+        :param viewer_id: id текущего пользователя
+        :param session: объект асинхронной сессии
+        :return: словарь {id твита: список лайков}
+        """
+        logger.debug(f"Выборка превью лайков для твитов: {tweet_ids}")
+
+        preview = {tweet_id: [] for tweet_id in tweet_ids}
+
+        if not tweet_ids or not LIKERS_PREVIEW_SIZE:
+            return preview
+
+        for followees_only in (True, False):
+            candidates = cls.likers_preview_query(
+                tweet_ids=tweet_ids, viewer_id=viewer_id,
+                followees_only=followees_only
+            ).subquery()
+
+            query = (
+                select(Like)
+                .join(candidates, candidates.c.like_id == Like.id)
+                .options(joinedload(Like.user))
+                .order_by(Like.id.desc())
+            )
+            result = await session.execute(query)
+
+            for like in result.scalars().all():
+                tweet_likes = preview[like.tweets_id]
+
+                if len(tweet_likes) < LIKERS_PREVIEW_SIZE and like not in tweet_likes:
+                    tweet_likes.append(like)
+
+        return preview
+
+    @classmethod
+    async def get_likes(
+            cls, tweet_id: int, session: AsyncSession, limit: int,
+            cursor: str | None = None
+    ) -> Tuple[List[Like], str | None]:
         """
-        Удаление лайка
+        Постраничный вывод лайков твита (keyset-пагинация по id лайка)
         :param tweet_id: id твита
-        :param user_id: id пользователя
         :param session: объект асинхронной сессии
-        :return: None
+        :param limit: количество лайков на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :return: список лайков и курсор следующей страницы
         """
-        logger.debug(f"Дизлайк твита №{tweet_id}")
+        logger.debug(f"Вывод лайков твита №{tweet_id}")
 
         tweet = await TweetsService.get_tweet(tweet_id=tweet_id,
                                               session=session)
@@ -433,11 +1671,84 @@ class LikeService:
                 status_code=HTTPStatus.NOT_FOUND, detail="Tweet not found"
             )
 
-        like_record = await cls.check_like_tweet(
-            tweet_id=tweet_id, user_id=user_id, session=session
+        query = (
+            select(Like)
+            .where(Like.tweets_id == tweet_id)
+            .options(joinedload(Like.user))
+            .order_by(Like.id.desc())
+            .limit(limit + 1)
+        )
+
+        if cursor:
+            (like_id,) = decode_cursor(cursor, int)
+            query = query.where(Like.id < like_id)
+
+        result = await session.execute(query)
+        likes = list(result.scalars().all())
+
+        next_cursor = None
+
+        if len(likes) > limit:
+            likes = likes[:limit]
+            next_cursor = encode_cursor(likes[-1].id)
+
+        return likes, next_cursor
+
+    @classmethod
+    def like_counter_cte(cls, changed: CTE, delta: int) -> CTE:
+        """
+        Изменение счетчика лайков и рейтинга твита в том же запросе, что и добавление / удаление лайка
+        :param changed: CTE с добавленными / удаленными лайками (колонка tweets_id)
+        :param delta: изменение счетчика на каждый лайк (+1 / -1)
+        :return: CTE для добавления в запрос
+        """
+        return (
+            update(Tweet)
+            .where(Tweet.id.in_(select(changed.c.tweets_id)))
+            .values(
+                like_count=Tweet.like_count + delta,
+                score=tweet_score_expression(Tweet.like_count + delta,
+                                             Tweet.created_at),
+            )
+            .returning(Tweet.id)
+            .cte("like_counter")
+        )
+
+    @classmethod
+    async def dislike(cls, tweet_id: int, user_id: int,
+                      session: AsyncSession) -> None:
+        """
+        Удаление лайка.
+        Проверка твита, удаление лайка и обновление счетчика - один запрос
+        :param tweet_id: id твита
+        :param user_id: id пользователя
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        logger.debug(f"Дизлайк твита №{tweet_id}")
+
+        target = select(Tweet.id).where(Tweet.id == tweet_id).cte("target")
+        deleted = (
+            delete(Like)
+            .where(Like.user_id == user_id, Like.tweets_id == tweet_id)
+            .returning(Like.tweets_id)
+            .cte("deleted")
         )
+        query = select(
+            select(func.count()).select_from(target).scalar_subquery(),
+            select(func.count()).select_from(deleted).scalar_subquery(),
+        ).add_cte(cls.like_counter_cte(changed=deleted, delta=-1))
+
+        found, removed = (await session.execute(query)).one()
+
+        if not found:
+            logger.error("Твит не найден")
+
+            raise CustomApiException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Tweet not found"
+            )
 
-        if like_record is None:
+        if not removed:
             logger.warning("Запись о лайке не найдена")
 
             raise CustomApiException(
@@ -445,8 +1756,6 @@ class LikeService:
                 detail="The user has not yet liked this tweet",
             )
 
-        await session.delete(like_record)
-
         await session.commit()
 
 
@@ -456,49 +1765,126 @@ class UserService:
     """
 
     @classmethod
-    async def get_user_for_key(cls, token: str,
-                               session: AsyncSession) -> User | None:
+    async def get_principal_for_key(cls, token: str,
+                                    session: AsyncSession) -> Principal | None:
         """
-        Возврат объекта пользователя по токену
+        Возврат пользователя запроса (id и username) по токену
         :param token: api-ключ пользователя
         :param session: объект асинхронной сессии
-        :return: объект пользователя / False
+        :return: объект пользователя запроса / None
         """
         logger.debug(f"Поиск пользователя по api-key: {token}")
 
-        query = (
-            select(User)
-            .where(User.api_key == token)
-            .options(selectinload(User.following),
-                     selectinload(User.followers))
-        )
-
+        query = select(User.id, User.username).where(User.api_key == token)
         result = await session.execute(query)
+        row = result.one_or_none()
 
-        return result.scalar_one_or_none()
+        return Principal(*row) if row else None
 
     @classmethod
-    async def get_user_for_id(cls, user_id: int,
-                              session: AsyncSession) -> User | None:
+    async def get_user_for_id(
+            cls, user_id: int, session: AsyncSession,
+            expand: Sequence[str] = ()
+    ) -> User | None:
         """
         Возврат объекта пользователя по id
         :param user_id: id пользователя
         :param session: объект асинхронной сессии
+        :param expand: списки, которые нужно загрузить вместе с пользователем (following / followers)
         :return: объект пользователя / False
         """
         logger.debug(f"Поиск пользователя по id: {user_id}")
 
-        query = (
-            select(User)
-            .where(User.id == user_id)
-            .options(selectinload(User.following),
-                     selectinload(User.followers))
+        query = select(User).where(User.id == user_id).options(
+            *(selectinload(getattr(User, relation)) for relation in expand)
         )
 
         result = await session.execute(query)
 
         return result.scalar_one_or_none()
 
+    @classmethod
+    async def get_follow_page(
+            cls, user_id: int, relation: Literal["followers", "following"],
+            session: AsyncSession, limit: int, cursor: str | None = None
+    ) -> Tuple[List[Row], str | None]:
+        """
+        Постраничный вывод подписчиков / подписок пользователя (keyset-пагинация по id пользователя)
+        :param user_id: id пользователя
+        :param relation: followers - подписчики, following - подписки
+        :param session: объект асинхронной сессии
+        :param limit: количество пользователей на странице
+        :param cursor: курсор, полученный с предыдущей страницей
+        :return: список пользователей (id, username) и курсор следующей страницы
+        """
+        logger.debug(f"Вывод {relation} пользователя id: {user_id}")
+
+        if relation == "followers":
+            owner, other = user_to_user.c.following_id, user_to_user.c.followers_id
+        else:
+            owner, other = user_to_user.c.followers_id, user_to_user.c.following_id
+
+        query = (
+            select(User.id, User.username)
+            .join(user_to_user, other == User.id)
+            .where(owner == user_id)
+            .order_by(other)
+            .limit(limit + 1)
+        )
+
+        if cursor:
+            (last_id,) = decode_cursor(cursor, int)
+            query = query.where(other > last_id)
+
+        result = await session.execute(query)
+        users = list(result.all())
+
+        # Пустая страница - проверяем, существует ли пользователь
+        if not users and await session.get(User, user_id) is None:
+            logger.error("Пользователь не найден")
+
+            raise CustomApiException(
+                status_code=HTTPStatus.NOT_FOUND, detail="User not found"
+            )
+
+        next_cursor = None
+
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor(users[-1].id)
+
+        return users, next_cursor
+
+    @classmethod
+    def follow_counters_ctes(
+            cls, follower_id: int, changed: CTE, delta: int
+    ) -> List[CTE]:
+        """
+        Обновление счетчиков подписок и подписчиков в том же запросе, что и изменение подписок
+        :param follower_id: id подписчика
+        :param changed: CTE с добавленными / удаленными подписками (колонка following_id)
+        :param delta: изменение счетчиков на каждую подписку (+1 / -1)
+        :return: список CTE для добавления в запрос
+        """
+        changed_count = select(func.count()).select_from(changed).scalar_subquery()
+
+        following_counter = (
+            update(User)
+            .where(User.id == follower_id, select(changed).exists())
+            .values(following_count=User.following_count + delta * changed_count)
+            .returning(User.id)
+            .cte("following_counter")
+        )
+        followers_counter = (
+            update(User)
+            .where(User.id.in_(select(changed.c.following_id)))
+            .values(followers_count=User.followers_count + delta)
+            .returning(User.id)
+            .cte("followers_counter")
+        )
+
+        return [following_counter, followers_counter]
+
     @classmethod
     async def check_user_for_id(cls, current_user_id: int,
                                 user_id: int) -> bool:
@@ -526,3 +1912,64 @@ class UserService:
             result = await session.execute(query)
 
             return result.scalars().all()
+
+
+class CounterService:
+    """
+    Сервис для сверки денормализованных счетчиков с исходными таблицами
+    """
+
+    @classmethod
+    async def reconcile(cls, session: AsyncSession) -> None:
+        """
+        Исправление расхождений счетчиков лайков, подписок и подписчиков.
+        Обновляются только строки, в которых значение счетчика отличается от фактического.
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        logger.debug("Сверка счетчиков")
+
+        # Строки блокируются до подсчета, а подсчет выполняется следующим запросом (новый снимок
+        # в READ COMMITTED) для каждой строки: лайк / подписка, зафиксированные между снимком
+        # и обновлением строки, иначе были бы перезаписаны устаревшим значением
+        await cls.lock_rows(Tweet.id, session=session)
+
+        like_count = (
+            select(func.count(Like.id)).where(Like.tweets_id == Tweet.id).scalar_subquery()
+        )
+        result = await session.execute(
+            update(Tweet)
+            .where(Tweet.like_count != like_count)
+            .values(
+                like_count=like_count,
+                score=tweet_score_expression(like_count, Tweet.created_at),
+            )
+        )
+        logger.info(f"Исправлено счетчиков лайков: {result.rowcount}")
+
+        await cls.lock_rows(User.id, session=session)
+
+        for column, counter in (
+                (user_to_user.c.following_id, User.followers_count),
+                (user_to_user.c.followers_id, User.following_count),
+        ):
+            count = (
+                select(func.count()).select_from(user_to_user).where(column == User.id)
+                .scalar_subquery()
+            )
+            result = await session.execute(
+                update(User).where(counter != count).values({counter: count})
+            )
+            logger.info(f"Исправлено счетчиков {counter.key}: {result.rowcount}")
+
+    @classmethod
+    async def lock_rows(cls, key: Column, session: AsyncSession) -> None:
+        """
+        Блокировка всех строк таблицы до конца транзакции (SELECT ... FOR UPDATE).
+        Строки блокируются в порядке ключа - без взаимных блокировок с другими сверками
+        :param key: колонка первичного ключа таблицы
+        :param session: объект асинхронной сессии
+        :return: None
+        """
+        locked = select(key).order_by(key).with_for_update().subquery()
+        await session.execute(select(func.count()).select_from(locked))
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 
-from src.routes.routes import user_router, image_router, tweet_router
+from src.routes.routes import user_router, image_router, tweet_router, \
+    metrics_router
 
 
 def register_routers(app: FastAPI) -> FastAPI:
@@ -11,5 +12,6 @@ def register_routers(app: FastAPI) -> FastAPI:
     app.include_router(user_router)
     app.include_router(image_router)
     app.include_router(tweet_router)
+    app.include_router(metrics_router)
 
     return app
@@ -0,0 +1,110 @@
+import math
+from typing import List, Sequence, Tuple
+
+BASE83_CHARS = (
+    "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+)
+
+
+def encode_base83(value: int, length: int) -> str:
+    """
+    Запись числа в base83 фиксированной длины
+    """
+    return "".join(
+        BASE83_CHARS[value // 83 ** (length - i) % 83] for i in range(1, length + 1)
+    )
+
+
+def srgb_to_linear(value: int) -> float:
+    """
+    Перевод компоненты цвета sRGB (0-255) в линейное пространство
+    """
+    v = value / 255
+
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value: float) -> int:
+    """
+    Перевод компоненты цвета из линейного пространства в sRGB (0-255)
+    """
+    v = max(0.0, min(1.0, value))
+
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def sign_pow(value: float, exp: float) -> float:
+    """
+    Возведение в степень с сохранением знака
+    """
+    return math.copysign(abs(value) ** exp, value)
+
+
+def encode(
+        pixels: Sequence[Tuple[int, int, int]], width: int, height: int,
+        x_components: int = 4, y_components: int = 3,
+) -> str:
+    """
+    Кодирование изображения в blurhash (компактная строка для размытой заглушки на клиенте).
+    Рассчитано на уменьшенное изображение (десятки пикселей по стороне)
+    :param pixels: пиксели RGB построчно
+    :param width: ширина изображения
+    :param height: высота изображения
+    :param x_components: количество компонент по горизонтали (1-9)
+    :param y_components: количество компонент по вертикали (1-9)
+    :return: строка blurhash
+    """
+    linear = [tuple(srgb_to_linear(c) for c in pixel) for pixel in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)]
+             for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)]
+             for j in range(y_components)]
+
+    factors: List[Tuple[float, float, float]] = []
+
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = (1 if i == 0 and j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+
+            for y in range(height):
+                row = y * width
+
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+
+            factors.append((r * norm, g * norm, b * norm))
+
+    dc, ac = factors[0], factors[1:]
+
+    result = encode_base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = max(0, min(82, math.floor(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += encode_base83(quantised_max, 1)
+    else:
+        max_value = 1.0
+        result += encode_base83(0, 1)
+
+    result += encode_base83(
+        (linear_to_srgb(dc[0]) << 16) + (linear_to_srgb(dc[1]) << 8) + linear_to_srgb(dc[2]),
+        4,
+    )
+
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, math.floor(sign_pow(v / max_value, 0.5) * 9 + 9.5)))
+            for v in factor
+        )
+        result += encode_base83(r * 19 * 19 + g * 19 + b, 2)
+
+    return result
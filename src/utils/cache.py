@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, Hashable
+
+from src.config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+
+
+class TTLCache:
+    """
+    LRU-кэш ограниченного размера с временем жизни записей.
+    Рассчитан на использование внутри одного event loop (без блокировок)
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Получение значения по ключу (устаревшая запись удаляется)
+        :param key: ключ
+        :return: значение / None
+        """
+        item = self._data.get(key)
+
+        if item is None or item[1] < monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+
+        return item[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохранение значения (при переполнении вытесняется самая давно использованная запись)
+        :param key: ключ
+        :param value: значение
+        :return: None
+        """
+        if self.maxsize <= 0:
+            return
+
+        self._data[key] = (value, monotonic() + self.ttl)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удаление записи по ключу
+        :param key: ключ
+        :return: None
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Очистка кэша
+        """
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика использования кэша
+        :return: словарь с количеством попаданий, промахов и записей
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+# Кэш аутентификации: api-key -> пользователь
+auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
@@ -0,0 +1,66 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Tuple, Type
+
+from loguru import logger
+
+from src.utils.exeptions import CustomApiException
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Кодирование значений ключа пагинации в непрозрачную строку-курсор
+    :param values: значения ключа (datetime / int / str)
+    :return: курсор
+    """
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Type) -> Tuple:
+    """
+    Декодирование курсора в значения ключа пагинации
+    :param cursor: курсор, полученный от клиента
+    :param types: ожидаемые типы значений ключа
+    :return: кортеж со значениями ключа
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+
+        key = tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for t, v in zip(types, values)
+        )
+
+        # Значения, которые не передать в запрос (колонки timestamp без зоны, integer)
+        for value in key:
+            if isinstance(value, datetime) and value.tzinfo is not None:
+                raise ValueError
+            if isinstance(value, int) and not INT32_MIN <= value <= INT32_MAX:
+                raise ValueError
+            if isinstance(value, float) and not math.isfinite(value):
+                raise ValueError
+
+        return key
+
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, OverflowError):
+        logger.error(f"Невалидный курсор: {cursor}")
+
+        raise CustomApiException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,  # 422
+            detail="Invalid pagination cursor",
+        )
@@ -3,6 +3,7 @@ import asyncio
 
 from src.database import async_session_maker, engine, Base
 from src.models.models import User, Tweet, Like, Image
+from src.services.services import CounterService, TimelineService
 
 users = [
     {
@@ -107,6 +108,10 @@ async def migration_data():
 
         await session.commit()
 
+        await CounterService.reconcile(session=session)
+        await TimelineService.rebuild(session=session)
+        await session.commit()
+
         logger.debug("Данные добавлены")
 
 
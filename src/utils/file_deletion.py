@@ -0,0 +1,125 @@
+import asyncio
+from typing import AsyncContextManager, Callable, Dict, List, Set
+
+from loguru import logger
+
+from src.config import MEDIA_DELETE_RETRIES, MEDIA_DELETE_RETRY_DELAY
+from src.utils.storage import storage
+
+# Проверка ссылок перед удалением: контекстный менеджер по ключам оригиналов возвращает те,
+# что еще используются, и до выхода из контекста не дает добавить новые ссылки на них
+ReferenceGuard = Callable[[List[str]], AsyncContextManager[Set[str]]]
+
+
+class FileDeletionWorker:
+    """
+    Фоновое удаление файлов изображений из хранилища (с повторами при ошибках).
+    Файлы передаются группами: оригинал и его уменьшенные копии (ключи хранилища).
+    Задача запускается при первой постановке файлов в очередь
+    """
+
+    def __init__(self, retries: int, retry_delay: float) -> None:
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.deleted = 0
+        self.failed = 0
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    def enqueue(self, groups: List[List[str]], keep: ReferenceGuard | None = None) -> None:
+        """
+        Постановка файлов в очередь на удаление
+        :param groups: группы ключей (оригинал и его копии)
+        :param keep: проверка, что на оригинал снова появились ссылки (группа не удаляется),
+            файлы удаляются внутри ее контекста
+        :return: None
+        """
+        if not groups:
+            return
+
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        self._queue.put_nowait((groups, keep))
+
+    async def join(self) -> None:
+        """
+        Ожидание удаления всех файлов из очереди
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, timeout: float) -> None:
+        """
+        Остановка: ожидание очереди не дольше timeout секунд
+        """
+        if self._worker is None:
+            return
+
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не удалены файлы: {self._queue.qsize()} групп")
+
+        self._worker.cancel()
+        self._worker = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика удаления
+        :return: словарь с размером очереди и количеством удаленных / неудаленных файлов
+        """
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "deleted": self.deleted,
+            "failed": self.failed,
+        }
+
+    async def _run(self) -> None:
+        """
+        Обработка очереди
+        """
+        while True:
+            groups, keep = await self._queue.get()
+
+            try:
+                if keep is not None:
+                    async with keep([group[0] for group in groups]) as referenced:
+                        groups = [group for group in groups if group[0] not in referenced]
+                        await self._delete([key for group in groups for key in group])
+
+                else:
+                    await self._delete([key for group in groups for key in group])
+
+            except Exception as exc:
+                logger.error(f"Ошибка удаления файлов изображений: {exc}")
+
+            finally:
+                self._queue.task_done()
+
+    async def _delete(self, keys: List[str]) -> None:
+        """
+        Удаление файлов из хранилища с повторами
+        """
+        remaining = keys
+
+        for attempt in range(self.retries + 1):
+            failed = await storage.delete_batch(keys=remaining)
+            self.deleted += len(remaining) - len(failed)
+            remaining = failed
+
+            if not remaining or attempt == self.retries:
+                break
+
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+        if remaining:
+            self.failed += len(remaining)
+            logger.error(f"Не удалось удалить файлы: {remaining}")
+
+
+# Очередь удаления файлов изображений
+file_deletion = FileDeletionWorker(
+    retries=MEDIA_DELETE_RETRIES, retry_delay=MEDIA_DELETE_RETRY_DELAY
+)
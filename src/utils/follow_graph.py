@@ -0,0 +1,229 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from time import monotonic
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from src.config import FOLLOW_GRAPH_COMPACT_THRESHOLD
+
+
+class FollowGraph:
+    """
+    Компактный индекс графа подписок в памяти (CSR: массив смещений по id подписчика
+    и массив id подписок, по 4 байта на элемент).
+    Изменения после построения хранятся в дельта-наборах и сливаются с массивами при compact().
+    Рассчитан на использование внутри одного event loop (без блокировок); массивы для
+    перестроения собираются вне event loop (build_arrays) и подменяются целиком (install)
+    """
+
+    def __init__(self, compact_threshold: int) -> None:
+        self.compact_threshold = compact_threshold
+        self.built_at: float | None = None
+        self._offsets = array("i", [0])
+        self._targets = array("i")
+        self._added: Dict[int, Set[int]] = {}
+        self._removed: Dict[int, Set[int]] = {}
+        self._delta_size = 0
+        # Изменения с начала перестроения (повторяются поверх новых массивов)
+        self._journal: List[Tuple[bool, int, int]] | None = None
+
+    def build(self, edges: Iterable[Tuple[int, int]]) -> None:
+        """
+        Построение индекса из списка подписок
+        :param edges: пары (id подписчика, id подписки), отсортированные по id подписчика
+        :return: None
+        """
+        self.begin_rebuild()
+        self.install(*self.build_arrays(edges))
+
+    def begin_rebuild(self) -> None:
+        """
+        Начало перестроения: изменения записываются в журнал, пока читается снимок подписок.
+        Вызывается до начала чтения снимка
+        :return: None
+        """
+        self._journal = []
+
+    def cancel_rebuild(self) -> None:
+        """
+        Отмена перестроения (ошибка чтения снимка): журнал изменений больше не ведется
+        :return: None
+        """
+        self._journal = None
+
+    def install(self, offsets: array, targets: array) -> None:
+        """
+        Подмена массивов индекса построенными по снимку и повтор изменений, записанных
+        с начала перестроения (изменения, уже попавшие в снимок, повторяются без эффекта)
+        :param offsets: массив смещений (build_arrays)
+        :param targets: массив подписок (build_arrays)
+        :return: None
+        """
+        journal, self._journal = self._journal or [], None
+
+        self._set_arrays(offsets, targets)
+        self.built_at = monotonic()
+
+        for followed, follower_id, following_id in journal:
+            if followed:
+                self.follow(follower_id, following_id)
+            else:
+                self.unfollow(follower_id, following_id)
+
+    def is_stale(self, ttl: float) -> bool:
+        """
+        Проверка, что индекс не построен или построен более ttl секунд назад
+        :param ttl: время жизни индекса в секундах
+        :return: True - индекс нужно перестроить | False - иначе
+        """
+        return self.built_at is None or monotonic() - self.built_at > ttl
+
+    def following(self, user_id: int) -> Iterator[int]:
+        """
+        Подписки пользователя (с учетом изменений после построения индекса)
+        :param user_id: id пользователя
+        :return: итератор по id подписок
+        """
+        start, end = self._bounds(user_id)
+        removed = self._removed.get(user_id, ())
+
+        for i in range(start, end):
+            if self._targets[i] not in removed:
+                yield self._targets[i]
+
+        yield from self._added.get(user_id, ())
+
+    def follow(self, follower_id: int, following_id: int) -> None:
+        """
+        Добавление подписки в индекс
+        :param follower_id: id подписчика
+        :param following_id: id пользователя, на которого оформлена подписка
+        :return: None
+        """
+        if self._has_base_edge(follower_id, following_id):
+            self._removed.get(follower_id, set()).discard(following_id)
+        else:
+            self._added.setdefault(follower_id, set()).add(following_id)
+
+        self._track_delta(True, follower_id, following_id)
+
+    def unfollow(self, follower_id: int, following_id: int) -> None:
+        """
+        Удаление подписки из индекса
+        :param follower_id: id подписчика
+        :param following_id: id пользователя, от которого отменена подписка
+        :return: None
+        """
+        if self._has_base_edge(follower_id, following_id):
+            self._removed.setdefault(follower_id, set()).add(following_id)
+        else:
+            self._added.get(follower_id, set()).discard(following_id)
+
+        self._track_delta(False, follower_id, following_id)
+
+    def suggest(self, user_id: int, limit: int) -> List[Tuple[int, int]]:
+        """
+        Рекомендации "на кого подписаться": подписки подписок пользователя,
+        ранжированные по количеству общих связей
+        :param user_id: id пользователя
+        :param limit: количество рекомендаций
+        :return: список пар (id пользователя, количество общих связей)
+        """
+        following = set(self.following(user_id))
+        counts: Dict[int, int] = {}
+
+        for followee_id in following:
+            for candidate_id in self.following(followee_id):
+                if candidate_id != user_id and candidate_id not in following:
+                    counts[candidate_id] = counts.get(candidate_id, 0) + 1
+
+        return heapq.nlargest(
+            limit, counts.items(), key=lambda item: (item[1], -item[0])
+        )
+
+    def compact(self) -> None:
+        """
+        Слияние изменений с массивами индекса
+        :return: None
+        """
+        nodes = max(len(self._offsets) - 1, max(self._added, default=-1) + 1)
+
+        self._set_arrays(*self.build_arrays(
+            (user_id, following_id)
+            for user_id in range(nodes)
+            for following_id in sorted(self.following(user_id))
+        ))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика индекса
+        :return: словарь с количеством подписок, размером изменений и памятью массивов
+        """
+        return {
+            "edges": len(self._targets),
+            "delta": self._delta_size,
+            "bytes": (self._offsets.itemsize * len(self._offsets)
+                      + self._targets.itemsize * len(self._targets)),
+        }
+
+    @staticmethod
+    def build_arrays(edges: Iterable[Tuple[int, int]]) -> Tuple[array, array]:
+        """
+        Заполнение массивов смещений и подписок (не меняет индекс - можно вызывать в потоке)
+        :param edges: пары (id подписчика, id подписки), отсортированные по id подписчика
+        :return: массивы смещений и подписок
+        """
+        offsets = array("i", [0])
+        targets = array("i")
+
+        for follower_id, following_id in edges:
+            while len(offsets) <= follower_id:
+                offsets.append(len(targets))
+
+            targets.append(following_id)
+
+        offsets.append(len(targets))
+
+        return offsets, targets
+
+    def _set_arrays(self, offsets: array, targets: array) -> None:
+        """
+        Подмена массивов индекса со сбросом дельта-наборов
+        """
+        self._offsets, self._targets = offsets, targets
+        self._added, self._removed = {}, {}
+        self._delta_size = 0
+
+    def _bounds(self, user_id: int) -> Tuple[int, int]:
+        """
+        Границы подписок пользователя в массиве подписок
+        """
+        if user_id + 1 >= len(self._offsets):
+            return 0, 0
+
+        return self._offsets[user_id], self._offsets[user_id + 1]
+
+    def _has_base_edge(self, follower_id: int, following_id: int) -> bool:
+        """
+        Проверка наличия подписки в массивах индекса (подписки отсортированы)
+        """
+        start, end = self._bounds(follower_id)
+        i = bisect_left(self._targets, following_id, start, end)
+
+        return i < end and self._targets[i] == following_id
+
+    def _track_delta(self, followed: bool, follower_id: int, following_id: int) -> None:
+        """
+        Учет изменений (и запись в журнал во время перестроения), слияние при превышении порога
+        """
+        if self._journal is not None:
+            self._journal.append((followed, follower_id, following_id))
+
+        self._delta_size += 1
+
+        if self._delta_size > self.compact_threshold:
+            self.compact()
+
+
+# Индекс графа подписок для рекомендаций
+follow_graph = FollowGraph(compact_threshold=FOLLOW_GRAPH_COMPACT_THRESHOLD)
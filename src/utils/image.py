@@ -1,45 +1,45 @@
+import hashlib
 import os
 import aiofiles
+import aiofiles.os
+import aiofiles.tempfile
 
-from typing import List
+from typing import Any, Dict, List, Tuple
 from http import HTTPStatus
-from contextlib import suppress
-from datetime import datetime
 from fastapi import UploadFile
 from loguru import logger
 
-from src.config import ALLOWED_EXTENSIONS, IMAGES_FOLDER
+from src.config import ALLOWED_EXTENSIONS, MEDIA_CHUNK_SIZE, MEDIA_HEADER_SIZE, \
+    MEDIA_MAX_SIZE, MEDIA_TMP_FOLDER
 from src.models.models import Image
 from src.utils.exeptions import CustomApiException
+from src.utils.file_deletion import ReferenceGuard, file_deletion
+from src.utils.image_header import IMAGE_FORMATS, detect_format, parse_dimensions
+from src.utils.storage import storage
 
 
-def allowed_image(image_name: str) -> None:
+def check_image_format(header: bytes) -> str:
     """
-    Проверка расширения изображения
-    :param image_name: название изображения
-    :return: None
+    Проверка формата изображения по сигнатуре в начале файла (расширение в имени не учитывается)
+    :param header: первые байты файла
+    :return: формат изображения
     """
     logger.debug("Проверка формата изображения")
 
-    if "." in image_name and image_name.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS:
-        logger.info("Формат изображения корректный")
-    else:
-        logger.error("Неразрешенный формат изображения")
+    image_format = detect_format(header=header)
 
-        raise CustomApiException(
-            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
-            detail=f"The image has an unresolved format. You can only download the following formats: "
-            f"{', '.join(ALLOWED_EXTENSIONS)}",
-        )
+    if image_format is not None:
+        logger.info(f"Формат изображения корректный: {image_format}")
 
+        return image_format
 
-def clear_path(path: str) -> str:
-    """
-    Очистка входной строки от "static"
-    :param path: строка - полный путь
-    :return: очищенная строка
-    """
-    return path.split("static")[1][1:]
+    logger.error("Неразрешенный формат изображения")
+
+    raise CustomApiException(
+        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+        detail=f"The image has an unresolved format. You can only download the following formats: "
+        f"{', '.join(ALLOWED_EXTENSIONS)}",
+    )
 
 
 async def create_directory(path: str) -> None:
@@ -47,81 +47,158 @@ async def create_directory(path: str) -> None:
     Создаем папку для сохранения изображений
     """
     logger.debug(f"Создание директории: {path}")
-    os.makedirs(path)
+    await aiofiles.os.makedirs(path, exist_ok=True)
 
 
-async def save_image(file: UploadFile, avatar=False) -> str:
+async def stream_to_temp(file: UploadFile, path: str) -> Tuple[str, str, int, bytes]:
     """
-    Сохранение изображения
-    :param avatar: переключатель для сохранения аватара пользователя или изображения к твиту
-    :param image: файл - изображение
-    :return: путь относительно static для сохранения в БД
+    Потоковая запись загруженного файла во временный файл (по MEDIA_CHUNK_SIZE байт)
+    с подсчетом sha256, проверкой формата по первому блоку и прерыванием записи
+    при превышении MEDIA_MAX_SIZE
+    :param file: загруженный файл
+    :param path: директория для временного файла (на той же файловой системе, что и итоговый файл)
+    :return: путь к временному файлу, sha256 содержимого, размер в байтах,
+        первые MEDIA_HEADER_SIZE байт файла
     """
-    allowed_image(image_name=file.filename)
+    sha256 = hashlib.sha256()
+    size = 0
+    header = b""
+
+    async with aiofiles.tempfile.NamedTemporaryFile(
+            mode="wb", dir=path, suffix=".part", delete=False
+    ) as tmp:
+        try:
+            while chunk := await file.read(MEDIA_CHUNK_SIZE):
+                if not size:
+                    check_image_format(header=chunk)
+
+                size += len(chunk)
 
-    with suppress(OSError):
-        if avatar:
-            logger.debug("Сохранение аватара пользователя")
-            path = os.path.join(IMAGES_FOLDER, "avatars")
+                if size > MEDIA_MAX_SIZE:
+                    logger.error(f"Превышен размер изображения: {MEDIA_MAX_SIZE} байт")
 
-        else:
-            logger.debug("Сохранение изображения к твиту")
-            current_date = datetime.now()
-            path = os.path.join(
-                IMAGES_FOLDER,
-                "tweets",
-                f"{current_date.year}",
-                f"{current_date.month}",
-                f"{current_date.day}",
-            )
+                    raise CustomApiException(
+                        status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,  # 413
+                        detail=f"The image is too large. "
+                               f"Maximum size: {MEDIA_MAX_SIZE} bytes",
+                    )
 
-        if not os.path.isdir(path):
-            await create_directory(path=path)
+                if len(header) < MEDIA_HEADER_SIZE:
+                    header += chunk[:MEDIA_HEADER_SIZE - len(header)]
 
-        contents = file.file.read()
-        full_path = os.path.join(path, f"{file.filename}")
+                sha256.update(chunk)
+                await tmp.write(chunk)
 
-        async with aiofiles.open(full_path, mode="wb") as f:
-            await f.write(contents)
+            # Пустой файл
+            if not size:
+                check_image_format(header=header)
 
-        return clear_path(path=full_path)
+        except BaseException:
+            await tmp.close()
+            await aiofiles.os.remove(tmp.name)
+            raise
 
+    return tmp.name, sha256.hexdigest(), size, header
 
-async def delete_images(images: List[Image]) -> None:
+
+def content_key(sha256: str, extension: str, avatar: bool = False) -> str:
     """
-    Удаление из файловой системы изображений
-    :param images: объекты изображений из БД
-    :return: None
+    Ключ файла в хранилище по хэшу содержимого: images/[avatars/]ab/cd/<sha256>.<ext>
+    :param sha256: sha256 содержимого
+    :param extension: расширение файла
+    :param avatar: изображение - аватар пользователя
+    :return: ключ файла
     """
-    logger.debug(f"Удаление изображений из файловой системы")
+    folder = os.path.join("images", "avatars") if avatar else "images"
 
-    folder = os.path.join(
-        "static", images[0].path_media.rsplit("/", 1)[0].rsplit("\\", 1)[0]
-    )
+    return os.path.join(folder, sha256[:2], sha256[2:4], f"{sha256}.{extension}")
 
-    for img in images:
-        try:
-            os.remove(os.path.join("static", img.path_media))
-            logger.debug(f"Изображение №{img.id} - {img.path_media} удалено")
 
-        except FileNotFoundError:
-            logger.error(f"Директория: {img.path_media} не найдена")
+async def receive_image(file: UploadFile, avatar=False) -> Tuple[Dict[str, Any], str]:
+    """
+    Прием изображения: потоковая запись во временный файл, расчет хэша содержимого и ключа
+    файла в хранилище. В хранилище файл переносится после добавления записи в БД (store_image)
+    :param avatar: переключатель для сохранения аватара пользователя или изображения к твиту
+    :param file: файл - изображение
+    :return: данные для записи изображения в БД (ключ файла в хранилище, sha256 содержимого,
+        MIME-тип, размер в байтах, ширина и высота, если найдены в заголовке файла)
+        и путь к временному файлу
+    """
+    logger.debug("Прием аватара пользователя" if avatar else "Прием изображения к твиту")
+
+    if not os.path.isdir(MEDIA_TMP_FOLDER):
+        await create_directory(path=MEDIA_TMP_FOLDER)
+
+    tmp_path, sha256, size, header = await stream_to_temp(file=file, path=MEDIA_TMP_FOLDER)
 
-    logger.info("Все изображения удалены")
+    image_format = detect_format(header=header)
+    _, mime_type, extension = IMAGE_FORMATS[image_format]
+    width, height = parse_dimensions(image_format=image_format, header=header) or (None, None)
 
-    await check_and_delete_folder(path=folder)
+    return {
+        "path_media": content_key(sha256=sha256, extension=extension, avatar=avatar),
+        "content_hash": sha256,
+        "mime_type": mime_type,
+        "size": size,
+        "width": width,
+        "height": height,
+    }, tmp_path
 
 
-async def check_and_delete_folder(path: str) -> None:
+async def store_image(key: str, tmp_path: str) -> None:
     """
-    Проверка и удаление папки, если пуста (подчистка пустых директорий после удаления твитов с изображениями)
-    :param path: директория с изображениями после удаления твита
+    Перенос принятого изображения в хранилище. Если файл с таким содержимым уже сохранен,
+    повторно он не записывается. Вызывается под блокировкой ключа (content_lock_id)
+    :param key: ключ файла в хранилище
+    :param tmp_path: путь к временному файлу (удаляется)
     :return: None
     """
+    if await storage.exists(key):
+        logger.info(f"Изображение уже сохранено: {key}")
+        await aiofiles.os.remove(tmp_path)
+        return
+
     try:
-        if len(os.listdir(path)) == 0:
-            os.rmdir(path)
-            logger.info(f"Директория: {path} удалена")
+        await storage.put_file(key=key, path=tmp_path)
+
+    except BaseException:
+        if os.path.exists(tmp_path):
+            await aiofiles.os.remove(tmp_path)
+        raise
+
+    logger.debug(f"Изображение сохранено: {key}")
+
+
+def content_lock_id(key: str) -> int:
+    """
+    Идентификатор advisory-блокировки PostgreSQL для файла в хранилище. Запись изображения
+    и проверка ссылок перед удалением файла выполняются под этой блокировкой
+    :param key: ключ файла в хранилище
+    :return: 64-битный идентификатор блокировки
+    """
+    return int.from_bytes(
+        hashlib.sha256(key.encode()).digest()[:8], "big", signed=True
+    )
+
 
-    except FileNotFoundError:
-        logger.error(f"Директория: {path} не найдена")
+def image_files(image: Image) -> List[str]:
+    """
+    Файлы изображения: оригинал и его уменьшенные копии
+    :param image: объект изображения из БД
+    :return: пути относительно static (оригинал первым)
+    """
+    return [image.path_media, *(image.variants or {}).values()]
+
+
+def delete_images(images: List[Image], keep: ReferenceGuard | None = None) -> None:
+    """
+    Постановка файлов изображений в очередь фонового удаления
+    :param images: объекты удаленных из БД изображений
+    :param keep: проверка, что на файл ссылаются другие записи (такой файл не удаляется)
+    :return: None
+    """
+    logger.debug(f"Удаление изображений из файловой системы: {len(images)}")
+
+    file_deletion.enqueue(
+        groups=[image_files(image=img) for img in images], keep=keep
+    )
@@ -0,0 +1,82 @@
+import struct
+from typing import Dict, Tuple
+
+# Формат изображения: (сигнатура в начале файла, MIME-тип, расширение файла в хранилище)
+IMAGE_FORMATS: Dict[str, Tuple[Tuple[bytes, ...], str, str]] = {
+    "png": ((b"\x89PNG\r\n\x1a\n",), "image/png", "png"),
+    "jpeg": ((b"\xff\xd8\xff",), "image/jpeg", "jpg"),
+    "gif": ((b"GIF87a", b"GIF89a"), "image/gif", "gif"),
+}
+
+# Маркеры JPEG SOF (Start Of Frame) - содержат размеры изображения
+JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+
+
+def detect_format(header: bytes) -> str | None:
+    """
+    Определение формата изображения по сигнатуре в начале файла
+    :param header: первые байты файла
+    :return: формат (ключ IMAGE_FORMATS) / None - формат не распознан
+    """
+    for name, (signatures, _, _) in IMAGE_FORMATS.items():
+        if header.startswith(signatures):
+            return name
+
+    return None
+
+
+def parse_dimensions(image_format: str, header: bytes) -> Tuple[int, int] | None:
+    """
+    Ширина и высота изображения из заголовка файла (без декодирования изображения)
+    :param image_format: формат изображения
+    :param header: первые байты файла
+    :return: (ширина, высота) / None - в переданных байтах размеров нет
+    """
+    if image_format == "png" and len(header) >= 24 and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+
+    if image_format == "gif" and len(header) >= 10:
+        return struct.unpack("<HH", header[6:10])
+
+    if image_format == "jpeg":
+        return _parse_jpeg_dimensions(header)
+
+    return None
+
+
+def _parse_jpeg_dimensions(header: bytes) -> Tuple[int, int] | None:
+    """
+    Поиск размеров в сегменте SOF: сегменты до него (EXIF, таблицы) пропускаются по длине
+    """
+    i = 2
+
+    while i + 4 <= len(header):
+        if header[i] != 0xFF:
+            return None
+
+        marker = header[i + 1]
+
+        # Заполняющие байты и маркеры без длины
+        if marker == 0xFF:
+            i += 1
+            continue
+
+        if marker in (0x01, *range(0xD0, 0xD8)):
+            i += 2
+            continue
+
+        length = struct.unpack(">H", header[i + 2:i + 4])[0]
+
+        if marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(header):
+                return None
+
+            height, width = struct.unpack(">HH", header[i + 5:i + 9])
+
+            return width, height
+
+        i += 2 + length
+
+    return None
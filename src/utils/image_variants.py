@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict
+
+import aiofiles.os
+from loguru import logger
+from PIL import Image as PILImage, ImageOps
+
+from src.config import BLURHASH_SAMPLE_SIZE, BLURHASH_X_COMPONENTS, \
+    BLURHASH_Y_COMPONENTS, IMAGE_VARIANT_QUALITY, IMAGE_VARIANTS, IMAGE_WORKERS, \
+    MEDIA_TMP_FOLDER
+from src.utils import blurhash
+from src.utils.storage import storage
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Пул процессов для обработки изображений (создается при первом обращении)
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Остановка пула процессов обработки изображений
+    """
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def variant_path(path_media: str, name: str) -> str:
+    """
+    Ключ уменьшенной копии изображения: <ключ оригинала без расширения>_<name>.webp
+    :param path_media: ключ оригинала в хранилище
+    :param name: название варианта
+    :return: ключ варианта в хранилище
+    """
+    return f"{os.path.splitext(path_media)[0]}_{name}.webp"
+
+
+def render_variants(
+        source: str, variants: Dict[str, int], quality: int, tmp_folder: str
+) -> Dict[str, Any]:
+    """
+    Создание уменьшенных копий изображения в формате WebP во временных файлах, расчет
+    размеров (с учетом поворота из EXIF) и blurhash (выполняется в пуле процессов)
+    :param source: путь к локальной копии оригинала
+    :param variants: словарь {название варианта: максимальная сторона в пикселях}
+    :param quality: качество WebP
+    :param tmp_folder: директория для временных файлов
+    :return: словарь с путями к временным файлам копий {название варианта: путь},
+        шириной, высотой и blurhash
+    """
+    result = {}
+
+    with PILImage.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for name, size in variants.items():
+            variant = image.copy()
+            variant.thumbnail((size, size))
+
+            fd, tmp_path = tempfile.mkstemp(dir=tmp_folder, suffix=".webp")
+
+            with os.fdopen(fd, "wb") as file:
+                variant.save(file, "WEBP", quality=quality)
+
+            result[name] = tmp_path
+
+        sample = image.convert("RGB")
+        sample.thumbnail((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE))
+
+        return {
+            "variants": result,
+            "width": image.width,
+            "height": image.height,
+            "blurhash": blurhash.encode(
+                list(sample.getdata()), sample.width, sample.height,
+                BLURHASH_X_COMPONENTS, BLURHASH_Y_COMPONENTS,
+            ),
+        }
+
+
+async def generate_variants(path_media: str) -> Dict[str, Any]:
+    """
+    Создание уменьшенных копий изображения и blurhash в пуле процессов (без блокировки
+    event loop) и запись копий в хранилище. Уже созданные копии (в том числе для другой
+    записи с тем же содержимым) не пересоздаются
+    :param path_media: ключ оригинала в хранилище
+    :return: словарь с копиями {название варианта: ключ в хранилище}, шириной, высотой
+        и blurhash
+    """
+    logger.debug(f"Создание уменьшенных копий изображения: {path_media}")
+
+    keys = {name: variant_path(path_media, name) for name in IMAGE_VARIANTS}
+    missing = {
+        name: size for name, size in IMAGE_VARIANTS.items()
+        if not await storage.exists(keys[name])
+    }
+
+    await aiofiles.os.makedirs(MEDIA_TMP_FOLDER, exist_ok=True)
+    loop = asyncio.get_running_loop()
+
+    async with storage.local_copy(path_media) as source:
+        result = await loop.run_in_executor(
+            get_executor(), render_variants, source, missing,
+            IMAGE_VARIANT_QUALITY, MEDIA_TMP_FOLDER,
+        )
+
+    rendered, result["variants"] = result["variants"], keys
+
+    try:
+        for name, tmp_path in rendered.items():
+            await storage.put_file(key=keys[name], path=tmp_path)
+
+    finally:
+        for tmp_path in rendered.values():
+            if os.path.exists(tmp_path):
+                await aiofiles.os.remove(tmp_path)
+
+    return result
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from loguru import logger
+
+from src.config import LIKE_BUFFER_FLUSH_INTERVAL, LIKE_BUFFER_FLUSH_SIZE, \
+    LIKE_BUFFER_PATH
+
+# Событие лайка: (операция like / dislike, id пользователя, id твита)
+LikeEvent = Tuple[str, int, int]
+
+
+class LikeBuffer:
+    """
+    Буфер лайков с отложенной записью в БД.
+    Событие подтверждается после записи в журнал на диске (fsync выполняется одним вызовом для всех
+    событий, пришедших за время предыдущей записи), а в БД попадает пачкой из фоновой задачи.
+    После успешной записи пачки журнал перезаписывается оставшимися событиями.
+    Рассчитан на использование внутри одного event loop
+    """
+
+    def __init__(self, path: str, flush_size: int, flush_interval: float) -> None:
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flushed = 0
+        self.failed_flushes = 0
+        self._pending: List[LikeEvent] = []
+        self._flushing: List[LikeEvent] = []
+        self._unsynced: List[LikeEvent] = []
+        self._next_sync: asyncio.Future | None = None
+        self._syncing = False
+        self._file_lock = asyncio.Lock()
+        self._flush_needed = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._apply: Callable[[List[LikeEvent]], Awaitable[None]] | None = None
+
+    async def start(
+            self, apply: Callable[[List[LikeEvent]], Awaitable[None]]
+    ) -> None:
+        """
+        Загрузка неотправленных событий из журнала и запуск фоновой записи в БД
+        :param apply: корутина, записывающая пачку событий в БД
+        :return: None
+        """
+        self._apply = apply
+        self._pending = await asyncio.to_thread(self._read_journal)
+
+        logger.info(f"Буфер лайков запущен, событий в журнале: {len(self._pending)}")
+
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """
+        Остановка фоновой записи с записью оставшихся событий в БД
+        :return: None
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+
+            self._flusher = None
+
+        await self.flush()
+
+    async def add(self, op: str, user_id: int, tweet_id: int) -> None:
+        """
+        Добавление события в буфер (возврат после записи события в журнал)
+        :param op: операция: like / dislike
+        :param user_id: id пользователя
+        :param tweet_id: id твита
+        :return: None
+        """
+        if self._next_sync is None:
+            self._next_sync = asyncio.get_running_loop().create_future()
+
+        waiter = self._next_sync
+        self._unsynced.append((op, user_id, tweet_id))
+
+        if not self._syncing:
+            self._syncing = True
+            asyncio.create_task(self._sync_loop())
+
+        await asyncio.shield(waiter)
+
+    def pending(self) -> List[LikeEvent]:
+        """
+        Подтвержденные события, еще не записанные в БД (в порядке поступления)
+        :return: список событий
+        """
+        return self._flushing + self._pending
+
+    async def flush(self) -> int:
+        """
+        Запись накопленных событий в БД
+        :return: количество записанных событий
+        """
+        async with self._file_lock:
+            events, self._pending = self._pending, []
+
+        self._flush_needed.clear()
+
+        if not events:
+            return 0
+
+        self._flushing = events
+
+        try:
+            await self._apply(events)
+
+        except asyncio.CancelledError:
+            self._pending[:0] = events
+            raise
+
+        except Exception as exc:
+            self.failed_flushes += 1
+            self._pending[:0] = events
+
+            logger.error(f"Ошибка записи буфера лайков в БД: {exc}")
+
+            return 0
+
+        finally:
+            self._flushing = []
+
+        async with self._file_lock:
+            await asyncio.to_thread(self._rewrite_journal, list(self._pending))
+
+        self.flushed += len(events)
+
+        logger.debug(f"Из буфера записано событий лайков: {len(events)}")
+
+        return len(events)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика буфера
+        :return: словарь с глубиной буфера и количеством записанных событий
+        """
+        return {
+            "depth": len(self._flushing) + len(self._pending) + len(self._unsynced),
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+        }
+
+    async def _sync_loop(self) -> None:
+        """
+        Запись событий в журнал: все события, накопленные за время предыдущей записи,
+        записываются одним вызовом с одним fsync
+        """
+        try:
+            while self._unsynced:
+                events, self._unsynced = self._unsynced, []
+                waiter, self._next_sync = self._next_sync, None
+
+                try:
+                    async with self._file_lock:
+                        await asyncio.to_thread(self._append_journal, events)
+                        self._pending.extend(events)
+
+                except Exception as exc:
+                    logger.error(f"Ошибка записи журнала лайков: {exc}")
+                    waiter.set_exception(exc)
+
+                    continue
+
+                waiter.set_result(None)
+
+                if len(self._pending) >= self.flush_size:
+                    self._flush_needed.set()
+
+        finally:
+            self._syncing = False
+
+    async def _flush_loop(self) -> None:
+        """
+        Фоновая запись в БД: по накоплению flush_size событий или раз в flush_interval секунд
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(),
+                                       timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            await self.flush()
+
+    def _append_journal(self, events: List[LikeEvent]) -> None:
+        """
+        Дозапись событий в журнал
+        """
+        with open(self.path, "a") as journal:
+            journal.writelines(json.dumps(event) + "\n" for event in events)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _rewrite_journal(self, events: List[LikeEvent]) -> None:
+        """
+        Замена журнала оставшимися событиями (через временный файл)
+        """
+        tmp_path = f"{self.path}.tmp"
+
+        with open(tmp_path, "w") as journal:
+            journal.writelines(json.dumps(event) + "\n" for event in events)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        os.replace(tmp_path, self.path)
+
+    def _read_journal(self) -> List[LikeEvent]:
+        """
+        Чтение событий из журнала (недописанная при сбое строка пропускается)
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        events = []
+
+        with open(self.path) as journal:
+            for line in journal:
+                try:
+                    op, user_id, tweet_id = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Пропущена строка журнала лайков: {line!r}")
+                    continue
+
+                events.append((op, user_id, tweet_id))
+
+        return events
+
+
+# Буфер лайков (используется при LIKE_BUFFER_ENABLED)
+like_buffer = LikeBuffer(
+    path=LIKE_BUFFER_PATH,
+    flush_size=LIKE_BUFFER_FLUSH_SIZE,
+    flush_interval=LIKE_BUFFER_FLUSH_INTERVAL,
+)
@@ -0,0 +1,44 @@
+from loguru import logger
+import asyncio
+
+from src.config import MEDIA_DELETE_STOP_TIMEOUT, MEDIA_GC_INTERVAL
+from src.database import async_session_maker
+from src.services.services import ImageService
+from src.utils.file_deletion import file_deletion
+
+
+async def collect_media_garbage() -> int:
+    """
+    Функция для удаления изображений, не прикрепленных к твитам (запускается из media_gc_loop
+    или по расписанию, например из cron)
+    """
+    logger.debug("Запуск очистки изображений")
+
+    async with async_session_maker() as session:
+        deleted = await ImageService.collect_garbage(session=session)
+
+    logger.debug("Очистка изображений завершена")
+
+    return deleted
+
+
+async def media_gc_loop() -> None:
+    """
+    Периодическая очистка изображений (раз в MEDIA_GC_INTERVAL секунд)
+    """
+    while True:
+        await asyncio.sleep(MEDIA_GC_INTERVAL)
+
+        try:
+            await collect_media_garbage()
+        except Exception as exc:
+            logger.error(f"Ошибка очистки изображений: {exc}")
+
+
+async def main() -> None:
+    await collect_media_garbage()
+    await file_deletion.stop(timeout=MEDIA_DELETE_STOP_TIMEOUT)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
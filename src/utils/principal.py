@@ -0,0 +1,12 @@
+from typing import NamedTuple
+
+
+class Principal(NamedTuple):
+    """
+    Аутентифицированный пользователь запроса: неизменяемый объект без __dict__ (только id и username).
+    Подписки и подписчики не загружаются - обработчики запрашивают их сами
+    (постранично или через expand=following / expand=followers)
+    """
+
+    id: int
+    username: str
@@ -0,0 +1,22 @@
+from loguru import logger
+import asyncio
+
+from src.database import async_session_maker
+from src.services.services import CounterService
+
+
+async def reconcile_counters():
+    """
+    Функция для периодической сверки счетчиков (запускается по расписанию, например из cron)
+    """
+    logger.debug("Запуск сверки счетчиков")
+
+    async with async_session_maker() as session:
+        await CounterService.reconcile(session=session)
+        await session.commit()
+
+    logger.debug("Сверка счетчиков завершена")
+
+
+if __name__ == "__main__":
+    asyncio.run(reconcile_counters())
@@ -0,0 +1,36 @@
+import math
+
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.sql import ColumnElement
+
+from src.config import SCORE_DECAY_SECONDS, SCORE_LIKE_WEIGHT
+
+
+def tweet_score(like_count: int, created_at: datetime) -> float:
+    """
+    Рейтинг твита для режима ленты "top".
+    Каждые SCORE_DECAY_SECONDS возраста равноценны увеличению лайков в e^SCORE_LIKE_WEIGHT раз,
+    поэтому рейтинг не нужно пересчитывать со временем - только при изменении числа лайков
+    :param like_count: количество лайков
+    :param created_at: дата создания твита (UTC)
+    :return: рейтинг
+    """
+    epoch = created_at.replace(tzinfo=timezone.utc).timestamp()
+
+    return SCORE_LIKE_WEIGHT * math.log1p(max(like_count, 0)) + epoch / SCORE_DECAY_SECONDS
+
+
+def tweet_score_expression(like_count, created_at) -> ColumnElement:
+    """
+    SQL-выражение рейтинга твита (аналог tweet_score для пересчета в UPDATE).
+    Отрицательный счетчик (расхождение до сверки) не должен ломать запрос на логарифме
+    :param like_count: колонка / выражение с количеством лайков
+    :param created_at: колонка с датой создания твита
+    :return: SQL-выражение
+    """
+    return (
+        SCORE_LIKE_WEIGHT * func.ln(1 + func.greatest(like_count, 0))
+        + func.extract("epoch", created_at) / SCORE_DECAY_SECONDS
+    )
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import shutil
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, List
+
+import aiofiles.os
+from loguru import logger
+
+from src.config import MEDIA_STORAGE, S3_ACCESS_KEY, S3_BUCKET, \
+    S3_ENDPOINT_URL, S3_MULTIPART_CHUNK_SIZE, S3_PUBLIC_URL, S3_REGION, \
+    S3_SECRET_KEY, STATIC_FOLDER
+
+
+class MediaStorage(ABC):
+    """
+    Хранилище файлов изображений.
+    Файлы адресуются ключами вида images/ab/cd/<sha256>.<ext> (хранятся в БД в path_media)
+    """
+
+    # Префикс ссылки на файл (ссылка = префикс + ключ)
+    url_prefix: str = ""
+
+    @abstractmethod
+    async def put_stream(self, key: str, stream: BinaryIO) -> None:
+        """
+        Потоковая запись файла в хранилище
+        :param key: ключ файла
+        :param stream: открытый на чтение бинарный поток
+        :return: None
+        """
+
+    async def put_file(self, key: str, path: str) -> None:
+        """
+        Перенос локального (временного) файла в хранилище, локальный файл удаляется
+        :param key: ключ файла
+        :param path: путь к локальному файлу
+        :return: None
+        """
+        with open(path, "rb") as stream:
+            await self.put_stream(key=key, stream=stream)
+
+        await aiofiles.os.remove(path)
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """
+        Проверка наличия файла в хранилище
+        :param key: ключ файла
+        :return: True - файл есть | False - иначе
+        """
+
+    @abstractmethod
+    async def delete_batch(self, keys: List[str]) -> List[str]:
+        """
+        Удаление файлов (отсутствующий файл считается удаленным)
+        :param keys: ключи файлов
+        :return: ключи файлов, которые не удалось удалить
+        """
+
+    @abstractmethod
+    def local_copy(self, key: str) -> AsyncIterator[str]:
+        """
+        Асинхронный контекстный менеджер: путь к локальной копии файла (для обработки Pillow)
+        :param key: ключ файла
+        :return: путь к локальному файлу (действителен внутри контекста)
+        """
+
+    def url_for(self, key: str) -> str:
+        """
+        Ссылка на файл для клиента
+        :param key: ключ файла
+        :return: ссылка
+        """
+        return f"{self.url_prefix}{key}"
+
+
+class LocalStorage(MediaStorage):
+    """
+    Хранилище в локальной директории (nginx/static раздается nginx).
+    Ссылки совпадают с ключами - пути относительно static
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, key: str) -> str:
+        """
+        Путь к файлу в файловой системе
+        """
+        return os.path.join(self.root, key)
+
+    async def put_stream(self, key: str, stream: BinaryIO) -> None:
+        path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        await asyncio.to_thread(self._copy_stream, stream, path)
+
+    async def put_file(self, key: str, path: str) -> None:
+        full_path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        # Временные файлы создаются на той же файловой системе - атомарное переименование
+        await aiofiles.os.replace(path, full_path)
+
+    async def exists(self, key: str) -> bool:
+        return await aiofiles.os.path.isfile(self.path(key))
+
+    async def delete_batch(self, keys: List[str]) -> List[str]:
+        failed = []
+
+        for key in keys:
+            try:
+                await aiofiles.os.remove(self.path(key))
+
+            except FileNotFoundError:
+                logger.warning(f"Файл: {key} не найден")
+
+            except OSError as exc:
+                logger.warning(f"Ошибка удаления файла {key}: {exc}")
+                failed.append(key)
+
+        for folder in {os.path.dirname(self.path(key)) for key in keys}:
+            # Директория не пуста - остается
+            try:
+                await aiofiles.os.rmdir(folder)
+                logger.info(f"Директория: {folder} удалена")
+            except OSError:
+                pass
+
+        return failed
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        yield self.path(key)
+
+    @staticmethod
+    def _copy_stream(stream: BinaryIO, path: str) -> None:
+        """
+        Запись потока во временный файл рядом с итоговым и атомарное переименование
+        """
+        tmp_path = f"{path}.part"
+
+        with open(tmp_path, "wb") as file:
+            shutil.copyfileobj(stream, file)
+
+        os.replace(tmp_path, path)
+
+
+def create_storage() -> MediaStorage:
+    """
+    Хранилище изображений по настройке MEDIA_STORAGE
+    """
+    if MEDIA_STORAGE == "s3":
+        # boto3 нужен только для S3-хранилища
+        from src.utils.storage_s3 import S3Storage
+
+        return S3Storage(
+            bucket=S3_BUCKET,
+            public_url=S3_PUBLIC_URL,
+            endpoint_url=S3_ENDPOINT_URL,
+            region=S3_REGION,
+            access_key=S3_ACCESS_KEY,
+            secret_key=S3_SECRET_KEY,
+            chunk_size=S3_MULTIPART_CHUNK_SIZE,
+        )
+
+    return LocalStorage(root=STATIC_FOLDER)
+
+
+# Хранилище изображений
+storage = create_storage()
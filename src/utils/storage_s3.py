@@ -0,0 +1,105 @@
+import asyncio
+import mimetypes
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, List
+
+import aiofiles.os
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from loguru import logger
+
+from src.config import MEDIA_TMP_FOLDER
+from src.utils.storage import MediaStorage
+
+# Максимальное количество ключей в одном запросе DeleteObjects
+S3_DELETE_BATCH_SIZE = 1000
+
+
+class S3Storage(MediaStorage):
+    """
+    Хранилище в S3-совместимом бакете (AWS S3, MinIO).
+    Вызовы boto3 выполняются в потоках, файлы больше chunk_size загружаются multipart-ом
+    """
+
+    def __init__(
+            self, bucket: str, public_url: str, endpoint_url: str | None = None,
+            region: str | None = None, access_key: str | None = None,
+            secret_key: str | None = None, chunk_size: int = 8 * 1024 * 1024,
+            client=None,
+    ) -> None:
+        self.bucket = bucket
+        self.url_prefix = f"{public_url.rstrip('/')}/" if public_url else ""
+        self.client = client or boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size, multipart_chunksize=chunk_size
+        )
+
+    async def put_stream(self, key: str, stream: BinaryIO) -> None:
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+        await asyncio.to_thread(
+            self.client.upload_fileobj, stream, self.bucket, key,
+            ExtraArgs={"ContentType": content_type},
+            Config=self.transfer_config,
+        )
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+        return True
+
+    async def delete_batch(self, keys: List[str]) -> List[str]:
+        failed = []
+
+        for i in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[i:i + S3_DELETE_BATCH_SIZE]
+
+            try:
+                resp = await asyncio.to_thread(
+                    self.client.delete_objects,
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+
+            except ClientError as exc:
+                logger.warning(f"Ошибка удаления файлов из бакета {self.bucket}: {exc}")
+                failed.extend(batch)
+                continue
+
+            for error in resp.get("Errors", []):
+                logger.warning(f"Ошибка удаления файла {error['Key']}: {error.get('Message')}")
+                failed.append(error["Key"])
+
+        return failed
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        await aiofiles.os.makedirs(MEDIA_TMP_FOLDER, exist_ok=True)
+
+        fd, path = tempfile.mkstemp(dir=MEDIA_TMP_FOLDER, suffix=os.path.splitext(key)[1])
+        os.close(fd)
+
+        try:
+            await asyncio.to_thread(
+                self.client.download_file, self.bucket, key, path,
+                Config=self.transfer_config,
+            )
+            yield path
+
+        finally:
+            await aiofiles.os.remove(path)
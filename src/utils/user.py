@@ -3,15 +3,17 @@ from http import HTTPStatus
 from loguru import logger
 
 from src.database import async_session_maker
-from src.models.models import User
 from src.services.services import UserService
+from src.utils.cache import auth_cache
 from src.utils.exeptions import CustomApiException
+from src.utils.principal import Principal
 from src.utils.token import TOKEN
 
 
-async def get_current_user(token: str = Security(TOKEN)) -> User | None:
+async def get_current_user(token: str = Security(TOKEN)) -> Principal | None:
     """
-    Поиск и возврат пользователя из базы данных по токену из header
+    Поиск и возврат пользователя запроса (id и username) из базы данных по токену из header.
+    Найденный пользователь кэшируется на AUTH_CACHE_TTL секунд
     """
 
     if token is None:
@@ -22,8 +24,13 @@ async def get_current_user(token: str = Security(TOKEN)) -> User | None:
             detail="Valid api-token token is missing",
         )
 
+    current_user = auth_cache.get(token)
+
+    if current_user is not None:
+        return current_user
+
     async with async_session_maker() as session:
-        current_user = await UserService.get_user_for_key(token=token, session=session)
+        current_user = await UserService.get_principal_for_key(token=token, session=session)
 
         if current_user is None:
             raise CustomApiException(
@@ -31,4 +38,7 @@ async def get_current_user(token: str = Security(TOKEN)) -> User | None:
                 detail="Sorry. Wrong api-key token. This user does not exist",
             )
 
+        auth_cache.set(token, current_user)
+
         return current_user
+
@@ -44,8 +44,14 @@ async def users():
     Пользователи для тестирования
     """
     async with async_session_maker() as session:
-        user_1 = User(username="test-user1", api_key="test-user1")
-        user_2 = User(username="test-user2", api_key="test-user2")
+        user_1 = User(
+            username="test-user1", api_key="test-user1",
+            followers_count=1, following_count=1,
+        )
+        user_2 = User(
+            username="test-user2", api_key="test-user2",
+            followers_count=1, following_count=1,
+        )
         user_3 = User(username="test-user3", api_key="test-user3")
 
         user_1.following.append(user_2)
@@ -1,9 +1,14 @@
 import pytest
 
-from typing import Dict
+from typing import Dict, Tuple
 from http import HTTPStatus
 from httpx import AsyncClient
 
+from src.config import FOLLOW_BATCH_MAX_SIZE
+from src.services.services import TimelineService
+from tests.database import async_session_maker
+from src.models.models import Tweet, User
+
 
 @pytest.mark.follower
 @pytest.mark.usefixtures("users")
@@ -58,6 +63,10 @@ class TestFollowers:
         assert resp.status_code == HTTPStatus.CREATED
         assert resp.json() == good_response
 
+        async with async_session_maker() as session:
+            assert (await session.get(User, 1)).following_count == 2
+            assert (await session.get(User, 3)).followers_count == 1
+
     async def test_create_follower_not_found(
         self, client: AsyncClient, headers: Dict, response_not_user: Dict
     ) -> None:
@@ -94,6 +103,10 @@ class TestFollowers:
         assert resp.status_code == HTTPStatus.OK
         assert resp.json() == good_response
 
+        async with async_session_maker() as session:
+            assert (await session.get(User, 1)).following_count == 1
+            assert (await session.get(User, 3)).followers_count == 0
+
     async def test_delete_follower_not_found(
         self, client: AsyncClient, headers: Dict, response_subscription_not_found: Dict
     ) -> None:
@@ -117,3 +130,109 @@ class TestFollowers:
         assert resp
         assert resp.status_code == HTTPStatus.LOCKED
         assert resp.json() == response_among_subscribers
+
+    async def test_follow_batch(self, client: AsyncClient, headers: Dict) -> None:
+        """
+        Тестирование массовой подписки с результатом по каждому id
+        """
+        resp = await client.post(
+            "/api/users/follow:batch", json={"user_ids": [3, 2, 1, 1000, 3]},
+            headers=headers
+        )
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == {
+            "result": True,
+            "results": [
+                {"user_id": 3, "status": "followed"},
+                {"user_id": 2, "status": "already_following"},
+                {"user_id": 1, "status": "self"},
+                {"user_id": 1000, "status": "not_found"},
+            ],
+        }
+
+        async with async_session_maker() as session:
+            assert (await session.get(User, 1)).following_count == 2
+            assert (await session.get(User, 3)).followers_count == 1
+
+    async def test_unfollow_batch(self, client: AsyncClient, headers: Dict) -> None:
+        """
+        Тестирование массовой отписки с результатом по каждому id
+        """
+        resp = await client.post(
+            "/api/users/unfollow:batch", json={"user_ids": [3, 1000]},
+            headers=headers
+        )
+        resp_again = await client.post(
+            "/api/users/unfollow:batch", json={"user_ids": [3]}, headers=headers
+        )
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json()["results"] == [
+            {"user_id": 3, "status": "unfollowed"},
+            {"user_id": 1000, "status": "not_found"},
+        ]
+        assert resp_again.json()["results"] == [
+            {"user_id": 3, "status": "not_following"}
+        ]
+
+        async with async_session_maker() as session:
+            assert (await session.get(User, 1)).following_count == 1
+            assert (await session.get(User, 3)).followers_count == 0
+
+    async def test_follow_batch_too_large(
+        self, client: AsyncClient, headers: Dict
+    ) -> None:
+        """
+        Тестирование вывода ошибки при превышении количества id в запросе
+        """
+        resp = await client.post(
+            "/api/users/follow:batch",
+            json={"user_ids": list(range(FOLLOW_BATCH_MAX_SIZE + 1))},
+            headers=headers
+        )
+
+        assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    @pytest.fixture(scope="class")
+    async def refollow_users(self) -> Tuple[User, User, Tweet]:
+        """
+        Подписчик и автор с твитом для проверки повторной подписки
+        """
+        async with async_session_maker() as session:
+            # Явные id, чтобы не сдвигать id пользователей и твитов в других тестах
+            reader = User(id=10011, username="refollow-reader", api_key="refollow-reader")
+            author = User(id=10012, username="refollow-author", api_key="refollow-author")
+            tweet = Tweet(id=20011, tweet_data="Твит автора", user_id=author.id)
+            session.add_all([reader, author])
+            await session.flush()
+            session.add(tweet)
+            await session.commit()
+
+            return reader, author, tweet
+
+    async def test_refollow_before_cleanup(
+        self, client: AsyncClient, refollow_users: Tuple[User, User, Tweet]
+    ) -> None:
+        """
+        Тестирование повторной подписки до очистки ленты после отписки: запоздавшая очистка
+        не удаляет из ленты твиты автора
+        """
+        reader, author, tweet = refollow_users
+        headers = {"api-key": reader.api_key}
+
+        for method in ("post", "delete", "post"):
+            resp = await client.request(
+                method, f"/api/users/{author.id}/follow", headers=headers
+            )
+            assert resp.status_code in (HTTPStatus.CREATED, HTTPStatus.OK)
+
+        # Очистка после отписки выполняется уже после повторной подписки
+        await TimelineService.cleanup(follower_id=reader.id, following_id=author.id)
+
+        resp = await client.get("/api/tweets", headers=headers)
+
+        assert resp.status_code == HTTPStatus.OK
+        assert [t["id"] for t in resp.json()["tweets"]] == [tweet.id]
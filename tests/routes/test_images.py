@@ -1,16 +1,28 @@
+import asyncio
+import hashlib
 import os
 import pytest
 
+from datetime import datetime, timedelta
 from _pytest._py.path import LocalPath
 from http import HTTPStatus
 from pathlib import Path
 from typing import Dict
 from httpx import AsyncClient
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import select, update
 
-from src.config import ALLOWED_EXTENSIONS
-from src.models.images import Image
+from PIL import Image as PILImage, ImageOps
+
+from src.config import ALLOWED_EXTENSIONS, IMAGE_VARIANTS, MEDIA_ORPHAN_TTL, \
+    STATIC_FOLDER
+from src.models.models import Image, Tweet
+from src.routes import routes
+from src.services.services import ImageService
+from src.utils.file_deletion import file_deletion
+from src.utils.image import delete_images, image_files
+from src.utils import image as image_utils
+from src.utils.media_gc import collect_media_garbage
 from tests.database import async_session_maker
 
 
@@ -90,6 +102,12 @@ class TestImages:
             if os.path.isfile(_PATH):
                 os.remove(_PATH)
 
+            for variant in (image.variants or {}).values():
+                _VARIANT_PATH = os.path.join(_LOCK_PATH, "nginx", "static", variant)
+
+                if os.path.isfile(_VARIANT_PATH):
+                    os.remove(_VARIANT_PATH)
+
     async def test_load_image(
         self, client: AsyncClient, image, good_media_response: Dict
     ) -> None:
@@ -115,3 +133,312 @@ class TestImages:
         assert resp
         assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
         assert resp.json() == bad_media_response
+
+    async def test_load_duplicate_image(self, client: AsyncClient) -> None:
+        """
+        Тестирование хранения одинаковых изображений в одном файле по хэшу содержимого
+        """
+        image_name = os.path.join(_TEST_ROOT_DIR, "files_for_tests", "test_image.jpg")
+
+        with open(image_name, "rb") as image:
+            content_hash = hashlib.sha256(image.read()).hexdigest()
+
+        media_ids = []
+
+        for _ in range(2):
+            with open(image_name, "rb") as image:
+                resp = await self.send_request(client=client, file=image)
+                media_ids.append(resp.json()["media_id"])
+
+        async with async_session_maker() as session:
+            query = select(Image).where(Image.content_hash == content_hash)
+            images = (await session.execute(query)).scalars().all()
+
+            assert set(media_ids) <= {img.id for img in images}
+
+            assert {img.content_hash for img in images} == {content_hash}
+            assert {img.path_media for img in images} == {
+                os.path.join("images", content_hash[:2], content_hash[2:4],
+                             f"{content_hash}.jpg")
+            }
+
+        # Уменьшенные копии и blurhash создаются в фоне после загрузки
+        assert {img.variants is not None for img in images} == {True}
+
+        with PILImage.open(image_name) as original:
+            size = ImageOps.exif_transpose(original).size
+
+        assert {
+            (img.mime_type, img.size, img.width, img.height) for img in images
+        } == {("image/jpeg", os.path.getsize(image_name), *size)}
+        assert len({img.blurhash for img in images}) == 1
+        assert images[0].blurhash
+
+        for name, size in IMAGE_VARIANTS.items():
+            with PILImage.open(
+                    os.path.join(STATIC_FOLDER, images[-1].variants[name])
+            ) as variant:
+                assert variant.format == "WEBP"
+                assert max(variant.size) <= size
+
+        # Файл используется записями изображений - не удаляется
+        async with ImageService.referenced_paths(
+                paths=[images[0].path_media]
+        ) as referenced:
+            assert referenced == {images[0].path_media}
+
+        delete_images(images=images[:1], keep=ImageService.referenced_paths)
+        await file_deletion.join()
+
+        assert os.path.exists(os.path.join(STATIC_FOLDER, images[0].path_media))
+
+        delete_images(images=images[:1])
+        await file_deletion.join()
+
+        for path in image_files(image=images[0]):
+            assert not os.path.exists(os.path.join(STATIC_FOLDER, path))
+
+    async def test_delete_waits_for_new_reference(
+        self, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        """
+        Тестирование гонки удаления файла и загрузки изображения с тем же содержимым:
+        проверка ссылок ждет фиксации новой записи, файл не удаляется
+        """
+        image = await self.upload_unique_image(client=client, tmp_path=tmp_path)
+
+        async with async_session_maker() as session:
+            await session.delete(await session.get(Image, image.id))
+            await session.commit()
+
+        async with async_session_maker() as session:
+            # Загрузка того же содержимого: файл уже есть, запись еще не зафиксирована
+            await ImageService.lock_paths(paths=[image.path_media], session=session)
+            session.add(Image(path_media=image.path_media, user_id=1))
+            await session.flush()
+
+            # Последняя старая запись удалена - файл ставится в очередь на удаление
+            delete_images(images=[image], keep=ImageService.referenced_paths)
+
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.shield(file_deletion.join()), timeout=0.5)
+
+            await session.commit()
+
+        await file_deletion.join()
+
+        assert os.path.exists(os.path.join(STATIC_FOLDER, image.path_media))
+
+        delete_images(images=[image])
+        await file_deletion.join()
+
+    async def upload_unique_image(self, client: AsyncClient, tmp_path: Path) -> Image:
+        """
+        Загрузка изображения с уникальным содержимым (не разделяет файл с другими записями)
+        """
+        image_name = os.path.join(tmp_path, "unique.png")
+        PILImage.new("RGB", (64, 64), tuple(os.urandom(3))).save(image_name)
+
+        with open(image_name, "rb") as image:
+            resp = await self.send_request(client=client, file=image)
+
+        async with async_session_maker() as session:
+            return await session.get(Image, resp.json()["media_id"])
+
+    async def test_delete_tweet_images(
+        self, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        """
+        Тестирование фонового удаления файлов изображений при удалении твита
+        """
+        image = await self.upload_unique_image(client=client, tmp_path=tmp_path)
+
+        # Твит с явным id, чтобы не сдвигать id твитов в других тестах
+        tweet_id = 10000
+
+        async with async_session_maker() as session:
+            session.add(Tweet(id=tweet_id, tweet_data="Твит с изображением", user_id=1))
+            await session.flush()
+            await session.execute(
+                update(Image).where(Image.id == image.id).values(tweet_id=tweet_id)
+            )
+            await session.commit()
+            image = await session.get(Image, image.id)
+
+        assert image.tweet_id == tweet_id
+        assert os.path.exists(os.path.join(STATIC_FOLDER, image.path_media))
+
+        resp = await client.delete(
+            f"/api/tweets/{tweet_id}", headers={"api-key": "test-user1"}
+        )
+        await file_deletion.join()
+
+        assert resp.status_code == HTTPStatus.OK
+
+        for path in image_files(image=image):
+            assert not os.path.exists(os.path.join(STATIC_FOLDER, path))
+
+    async def test_load_image_by_content(
+        self, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        """
+        Тестирование определения формата по содержимому, а не по расширению файла
+        """
+        image_name = os.path.join(tmp_path, "image.jpg")
+        PILImage.new("RGB", (40, 30), tuple(os.urandom(3))).save(image_name, "PNG")
+
+        with open(image_name, "rb") as image:
+            resp = await self.send_request(client=client, file=image)
+
+        async with async_session_maker() as session:
+            image = await session.get(Image, resp.json()["media_id"])
+
+        assert resp.status_code == HTTPStatus.CREATED
+        assert image.path_media.endswith(".png")
+        assert (image.mime_type, image.width, image.height) == ("image/png", 40, 30)
+
+        delete_images(images=[image])
+        await file_deletion.join()
+
+    async def test_load_images_batch(
+        self, client: AsyncClient, tmp_path: Path
+    ) -> None:
+        """
+        Тестирование пакетной загрузки изображений одним запросом
+        """
+        files = []
+
+        for i, image_format in enumerate(("PNG", "GIF", "JPEG")):
+            image_name = os.path.join(tmp_path, f"image_{i}.{image_format.lower()}")
+            PILImage.new("RGB", (20 + i, 10), tuple(os.urandom(3))).save(
+                image_name, image_format
+            )
+            files.append(("files", open(image_name, "rb")))
+
+        resp = await client.post(
+            "/api/medias/batch", files=files, headers={"api-key": "test-user1"}
+        )
+
+        assert resp.status_code == HTTPStatus.CREATED
+        media_ids = resp.json()["media_ids"]
+        assert resp.json()["result"] is True
+        assert len(media_ids) == 3
+
+        async with async_session_maker() as session:
+            images = [await session.get(Image, media_id) for media_id in media_ids]
+
+        # id возвращаются в порядке файлов в запросе
+        assert [(img.mime_type, img.width) for img in images] == [
+            ("image/png", 20), ("image/gif", 21), ("image/jpeg", 22)
+        ]
+
+        delete_images(images=images)
+        await file_deletion.join()
+
+    async def test_load_images_batch_invalid_file(
+        self, client: AsyncClient, tmp_path: Path, incorrect_file,
+        bad_media_response: Dict,
+    ) -> None:
+        """
+        Тестирование пакетной загрузки с файлом неразрешенного формата:
+        записи не создаются, сохраненные файлы удаляются
+        """
+        image_name = os.path.join(tmp_path, "image.png")
+        PILImage.new("RGB", (8, 8), tuple(os.urandom(3))).save(image_name)
+
+        with open(image_name, "rb") as image:
+            content_hash = hashlib.sha256(image.read()).hexdigest()
+
+        incorrect_file.seek(0)
+        resp = await client.post(
+            "/api/medias/batch",
+            files=[("files", open(image_name, "rb")), ("files", incorrect_file)],
+            headers={"api-key": "test-user1"},
+        )
+        await file_deletion.join()
+
+        assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert resp.json() == bad_media_response
+
+        async with async_session_maker() as session:
+            query = select(Image).where(Image.content_hash == content_hash)
+            assert (await session.execute(query)).scalars().all() == []
+
+        assert not os.path.exists(os.path.join(
+            STATIC_FOLDER, "images", content_hash[:2], content_hash[2:4],
+            f"{content_hash}.png",
+        ))
+
+    async def test_load_images_batch_too_many(
+        self, client: AsyncClient, image, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """
+        Тестирование ограничения количества файлов в пакетной загрузке
+        """
+        monkeypatch.setattr(routes, "MEDIA_BATCH_MAX_FILES", 1)
+        image.seek(0)
+
+        resp = await client.post(
+            "/api/medias/batch",
+            files=[("files", image), ("files", image)],
+            headers={"api-key": "test-user1"},
+        )
+
+        assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert resp.json()["error_message"] == (
+            "The number of files should not exceed 1. Current value: 2"
+        )
+
+    async def test_collect_garbage(self, client: AsyncClient, tmp_path: Path) -> None:
+        """
+        Тестирование очистки изображений, не прикрепленных к твитам дольше MEDIA_ORPHAN_TTL
+        """
+        image = await self.upload_unique_image(client=client, tmp_path=tmp_path)
+        fresh = await self.upload_unique_image(client=client, tmp_path=tmp_path)
+
+        async with async_session_maker() as session:
+            await session.execute(
+                update(Image).where(Image.id == image.id).values(
+                    created_at=datetime.utcnow()
+                    - timedelta(seconds=MEDIA_ORPHAN_TTL + 60)
+                )
+            )
+            await session.commit()
+
+        assert await collect_media_garbage() == 1
+        await file_deletion.join()
+
+        async with async_session_maker() as session:
+            assert await session.get(Image, image.id) is None
+            assert await session.get(Image, fresh.id) is not None
+
+        for path in image_files(image=image):
+            assert not os.path.exists(os.path.join(STATIC_FOLDER, path))
+
+        assert os.path.exists(os.path.join(STATIC_FOLDER, fresh.path_media))
+
+        delete_images(images=[fresh])
+        await file_deletion.join()
+
+    async def test_load_too_large_image(
+        self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """
+        Тестирование прерывания загрузки изображения больше MEDIA_MAX_SIZE
+        """
+        monkeypatch.setattr(image_utils, "MEDIA_MAX_SIZE", 1024)
+        monkeypatch.setattr(image_utils, "MEDIA_CHUNK_SIZE", 256)
+        image_name = os.path.join(_TEST_ROOT_DIR, "files_for_tests", "test_image.jpg")
+
+        with open(image_name, "rb") as image:
+            resp = await self.send_request(client=client, file=image)
+
+        assert resp.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        assert resp.json()["error_message"] == "The image is too large. Maximum size: 1024 bytes"
+
+        parts = [
+            name for _, _, files in os.walk(os.path.join("nginx", "static"))
+            for name in files if name.endswith(".part")
+        ]
+
+        assert parts == []
@@ -1,9 +1,15 @@
+import asyncio
+
 from typing import Tuple, Dict
 
 import pytest
 from http import HTTPStatus
 from httpx import AsyncClient
 
+from sqlalchemy import select
+
+from src.services.services import LikeService
+from src.utils.like_buffer import like_buffer
 from tests.database import async_session_maker
 from src.models.users import User
 from src.models.tweets import Tweet
@@ -40,6 +46,109 @@ class TestLikes:
         assert resp.status_code == HTTPStatus.CREATED
         assert resp.json() == good_response
 
+        async with async_session_maker() as session:
+            tweet = await session.get(Tweet, 2)
+
+            assert tweet.like_count == 1
+
+    async def test_get_likes(self, client: AsyncClient, headers: Dict) -> None:
+        """
+        Тестирование постраничного вывода лайков твита
+        """
+        resp = await client.get("/api/tweets/2/likes", headers=headers)
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == {
+            "result": True,
+            "likes": [{"user_id": 1, "name": "test-user1"}],
+            "next_cursor": None,
+        }
+
+    async def test_tweets_state(self, client: AsyncClient, headers: Dict) -> None:
+        """
+        Тестирование вывода состояния лайков текущего пользователя по списку твитов
+        """
+        resp = await client.post(
+            "/api/tweets/state", json={"tweet_ids": [2, 3, 1000]}, headers=headers
+        )
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == {
+            "result": True,
+            "tweets": [
+                {"id": 2, "liked_by_me": True},
+                {"id": 3, "liked_by_me": False},
+                {"id": 1000, "liked_by_me": False},
+            ],
+        }
+
+    async def test_tweets_state_buffered(
+        self, client: AsyncClient, headers: Dict, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """
+        Тестирование учета событий буфера лайков, еще не записанных в БД
+        """
+        monkeypatch.setattr(
+            like_buffer, "_pending", [("dislike", 1, 2), ("like", 1, 3), ("like", 2, 1)]
+        )
+
+        resp = await client.post(
+            "/api/tweets/state", json={"tweet_ids": [1, 2, 3]}, headers=headers
+        )
+
+        assert [t["liked_by_me"] for t in resp.json()["tweets"]] == [False, False, True]
+
+    async def test_create_like_concurrent(
+        self, client: AsyncClient, headers: Dict
+    ) -> None:
+        """
+        Тестирование одновременных повторных лайков: создается только одна запись
+        """
+        responses = await asyncio.gather(
+            *(client.post("/api/tweets/3/likes", headers=headers) for _ in range(3))
+        )
+
+        assert sorted(resp.status_code for resp in responses) == [
+            HTTPStatus.CREATED, HTTPStatus.LOCKED, HTTPStatus.LOCKED
+        ]
+
+        async with async_session_maker() as session:
+            assert (await session.get(Tweet, 3)).like_count == 1
+
+        resp = await client.delete("/api/tweets/3/likes", headers=headers)
+
+        assert resp.status_code == HTTPStatus.OK
+
+    async def test_apply_buffered_events(self) -> None:
+        """
+        Тестирование записи пачки событий из буфера лайков: применяется последнее событие
+        по каждой паре, лайки несуществующих твитов пропускаются
+        """
+        events = [
+            ("like", 2, 3), ("like", 3, 3), ("dislike", 3, 3), ("like", 3, 3),
+            ("like", 1, 3), ("dislike", 1, 3), ("like", 1, 1000),
+        ]
+
+        async with async_session_maker() as session:
+            await LikeService.apply_events(events=events, session=session)
+            await session.commit()
+
+            tweet = await session.get(Tweet, 3)
+            likes = await session.execute(select(Like.user_id).where(Like.tweets_id == 3))
+
+            assert tweet.like_count == 2
+            assert sorted(likes.scalars().all()) == [2, 3]
+
+            await LikeService.apply_events(
+                events=[("dislike", 2, 3), ("dislike", 3, 3)], session=session
+            )
+            await session.commit()
+            await session.refresh(tweet)
+
+            assert tweet.like_count == 0
+
     async def test_create_like_not_found(
         self,
         client: AsyncClient,
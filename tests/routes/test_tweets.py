@@ -1,9 +1,19 @@
 import json
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
-from typing import Dict
+from typing import Dict, List, Tuple
 
 from httpx import AsyncClient
 import pytest
+from sqlalchemy import func, select
+
+from src.models.models import Image, Like, Timeline, Tweet, User, user_to_user
+from src.services import services
+from src.services.services import TimelineService, TweetsService
+from src.utils.cursor import encode_cursor
+from src.utils.principal import Principal
+from src.utils.storage import storage
+from tests.database import async_session_maker
 
 
 @pytest.mark.tweet
@@ -166,3 +176,460 @@ class TestTweets:
         assert resp
         assert resp.status_code == HTTPStatus.LOCKED
         assert resp.json() == response_tweet_locked
+
+    async def test_get_tweets_fan_out(
+        self, client: AsyncClient, headers_with_content_type: Dict
+    ) -> None:
+        """
+        Тестирование раскладки новых твитов по лентам подписчиков автора
+        """
+        tweet_ids = []
+
+        for i in range(2):
+            resp = await self.send_request(
+                client=client,
+                headers=headers_with_content_type,
+                new_tweet_data={"tweet_data": f"Твит подписчикам {i}", "tweet_media_ids": []},
+            )
+            tweet_ids.append(resp.json()["tweet_id"])
+
+        # test-user2 подписан на автора (test-user1)
+        resp = await client.get("/api/tweets", headers={"api-key": "test-user2"})
+
+        assert resp.status_code == HTTPStatus.OK
+        assert [t["id"] for t in resp.json()["tweets"]][:2] == tweet_ids[::-1]
+
+        for tweet_id in tweet_ids:
+            await client.delete(f"/api/tweets/{tweet_id}", headers=headers_with_content_type)
+
+    @pytest.fixture(scope="class")
+    async def feed_tweets(self, users: Tuple[User]) -> Tuple[Tweet]:
+        """
+        Дополнительные твиты в ленте пользователя для проверки пагинации
+        """
+        async with async_session_maker() as session:
+            feed = [
+                Tweet(tweet_data=f"Твит в ленте {i}", user_id=users[1].id)
+                for i in range(2)
+            ]
+            session.add_all(feed)
+            await session.commit()
+
+            await TimelineService.rebuild(session=session)
+            await session.commit()
+
+            return tuple(feed)
+
+    async def test_get_tweets_pagination(
+        self, client: AsyncClient, headers: Dict, users: Tuple[User],
+        tweets: Tuple[Tweet], feed_tweets: Tuple[Tweet],
+    ) -> None:
+        """
+        Тестирование постраничного вывода ленты по курсору
+        """
+        # Лайк пользователя на последнем твите ленты (423 - твит уже лайкнут в тестах лайков)
+        resp = await client.post(f"/api/tweets/{tweets[1].id}/likes", headers=headers)
+        assert resp.status_code in (HTTPStatus.CREATED, HTTPStatus.LOCKED)
+
+        resp = await client.get("/api/tweets", params={"limit": 2}, headers=headers)
+
+        assert resp.status_code == HTTPStatus.OK
+        first_page = resp.json()
+        assert [t["id"] for t in first_page["tweets"]] == [
+            feed_tweets[1].id,
+            feed_tweets[0].id,
+        ]
+        assert first_page["next_cursor"]
+
+        resp = await client.get(
+            "/api/tweets",
+            params={"limit": 2, "cursor": first_page["next_cursor"]},
+            headers=headers,
+        )
+
+        assert resp.status_code == HTTPStatus.OK
+        second_page = resp.json()
+        assert [t["id"] for t in second_page["tweets"]] == [tweets[1].id]
+        assert second_page["tweets"][0]["like_count"] == 1
+        assert second_page["tweets"][0]["likes"] == [
+            {"user_id": users[0].id, "name": users[0].username}
+        ]
+        assert second_page["next_cursor"] is None
+
+    async def test_get_tweets_invalid_cursor(
+        self, client: AsyncClient, headers: Dict
+    ) -> None:
+        """
+        Тестирование вывода ошибки при передаче невалидного курсора
+        """
+        resp = await client.get(
+            "/api/tweets", params={"cursor": "invalid"}, headers=headers
+        )
+
+        assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert resp.json()["error_message"] == "Invalid pagination cursor"
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            encode_cursor(datetime(2030, 1, 1, tzinfo=timezone.utc), 1),
+            encode_cursor(datetime(2030, 1, 1), 2 ** 31),
+        ],
+    )
+    async def test_get_tweets_cursor_out_of_range(
+        self, client: AsyncClient, headers: Dict, cursor: str
+    ) -> None:
+        """
+        Тестирование вывода ошибки при передаче корректно закодированного курсора со значениями,
+        которые нельзя передать в запрос (дата с часовым поясом, id вне диапазона integer)
+        """
+        resp = await client.get(
+            "/api/tweets", params={"cursor": cursor}, headers=headers
+        )
+
+        assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert resp.json()["error_message"] == "Invalid pagination cursor"
+
+    @pytest.mark.parametrize("api_key", ["test-user1", "test-user2"])
+    async def test_get_tweets_sql_engine(
+        self, client: AsyncClient, feed_tweets: Tuple[Tweet], api_key: str
+    ) -> None:
+        """
+        Тестирование совпадения ленты, собранной в PostgreSQL, с ORM-вариантом
+        """
+        for params in ({"limit": 2}, {"limit": 20}):
+            orm_resp = await client.get(
+                "/api/tweets", params=params, headers={"api-key": api_key}
+            )
+            sql_resp = await client.get(
+                "/api/tweets",
+                params={**params, "engine": "sql"},
+                headers={"api-key": api_key},
+            )
+
+            assert sql_resp.status_code == HTTPStatus.OK
+            assert sql_resp.headers["content-type"] == "application/json"
+            assert sql_resp.json() == orm_resp.json()
+
+    async def test_get_tweets_storage_url_prefix(
+        self, client: AsyncClient, feed_tweets: Tuple[Tweet],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """
+        Тестирование ссылок на изображения из внешнего хранилища (префикс ссылки) в обоих вариантах
+        сборки ленты
+        """
+        monkeypatch.setattr(storage, "url_prefix", "https://cdn.test/")
+
+        # Лента test-user2 содержит твит с изображениями
+        orm_resp = await client.get("/api/tweets", headers={"api-key": "test-user2"})
+        sql_resp = await client.get(
+            "/api/tweets", params={"engine": "sql"}, headers={"api-key": "test-user2"}
+        )
+        media = [m for t in orm_resp.json()["tweets"] for m in t["media"]]
+
+        assert sql_resp.json() == orm_resp.json()
+        assert media
+        assert {m["url"].startswith("https://cdn.test/images/") for m in media} == {True}
+        assert {
+            url.startswith("https://cdn.test/images/")
+            for m in media for url in m["variants"].values()
+        } <= {True}
+
+    async def test_get_tweets_top(
+        self, client: AsyncClient, headers: Dict, feed_tweets: Tuple[Tweet]
+    ) -> None:
+        """
+        Тестирование вывода ленты по рейтингу: твит с лайком выше более новых твитов
+        """
+        resp = await client.get("/api/tweets", params={"mode": "top"}, headers=headers)
+
+        assert resp.status_code == HTTPStatus.OK
+        assert [t["id"] for t in resp.json()["tweets"]] == [
+            2,
+            feed_tweets[1].id,
+            feed_tweets[0].id,
+        ]
+
+        resp = await client.get(
+            "/api/tweets", params={"mode": "top", "limit": 1}, headers=headers
+        )
+        next_page = await client.get(
+            "/api/tweets",
+            params={"mode": "top", "limit": 2, "cursor": resp.json()["next_cursor"]},
+            headers=headers,
+        )
+
+        assert [t["id"] for t in next_page.json()["tweets"]] == [
+            feed_tweets[1].id,
+            feed_tweets[0].id,
+        ]
+
+        sql_resp = await client.get(
+            "/api/tweets", params={"mode": "top", "engine": "sql"}, headers=headers
+        )
+        orm_resp = await client.get(
+            "/api/tweets", params={"mode": "top"}, headers=headers
+        )
+
+        assert sql_resp.json() == orm_resp.json()
+
+    async def test_create_tweet_media_ownership(
+        self, client: AsyncClient, headers_with_content_type: Dict
+    ) -> None:
+        """
+        Тестирование привязки изображений: чужие и уже прикрепленные изображения пропускаются
+        """
+        async with async_session_maker() as session:
+            own = Image(path_media="images/own.jpg", user_id=1)
+            foreign = Image(path_media="images/foreign.jpg", user_id=2)
+            session.add_all([own, foreign])
+            await session.commit()
+
+            attached = (await session.execute(
+                select(Image).where(Image.tweet_id.is_not(None)).limit(1)
+            )).scalar_one()
+
+        resp = await self.send_request(
+            client=client,
+            headers=headers_with_content_type,
+            new_tweet_data={
+                "tweet_data": "Твит с изображениями",
+                "tweet_media_ids": [own.id, foreign.id, attached.id],
+            },
+        )
+        tweet_id = resp.json()["tweet_id"]
+
+        assert resp.status_code == HTTPStatus.CREATED
+
+        async with async_session_maker() as session:
+            tweet_ids = {
+                img.id: img.tweet_id
+                for img in (await session.execute(
+                    select(Image).where(Image.id.in_([own.id, foreign.id, attached.id]))
+                )).scalars()
+            }
+
+        assert tweet_ids == {
+            own.id: tweet_id, foreign.id: None, attached.id: attached.tweet_id
+        }
+
+    async def test_create_tweet_celebrity(
+        self, client: AsyncClient, headers_with_content_type: Dict,
+        new_tweet: Dict, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """
+        Тестирование создания твита "знаменитости": твит не раскладывается по лентам
+        """
+        monkeypatch.setattr(services, "CELEBRITY_FOLLOWERS_THRESHOLD", 0)
+        new_tweet["tweet_data"] = "Твит знаменитости"
+
+        resp = await self.send_request(
+            client=client, headers=headers_with_content_type, new_tweet_data=new_tweet
+        )
+        tweet_id = resp.json()["tweet_id"]
+
+        assert resp.status_code == HTTPStatus.CREATED
+
+        async with async_session_maker() as session:
+            query = select(func.count()).where(Timeline.tweet_id == tweet_id)
+            assert (await session.execute(query)).scalar() == 0
+
+    @pytest.fixture(scope="class")
+    async def pulled_feed(self) -> Tuple[User, List[Tweet]]:
+        """
+        Лента читателя из двух источников: твиты обычного автора разложены по ленте,
+        твиты "знаменитости" подмешиваются при чтении. Твиты авторов чередуются по дате
+        """
+        async with async_session_maker() as session:
+            # Явные id, чтобы не сдвигать id пользователей и твитов в других тестах
+            reader = User(id=10001, username="feed-reader", api_key="feed-reader")
+            author = User(id=10002, username="feed-author", api_key="feed-author")
+            celebrity = User(
+                id=10003, username="feed-celebrity", api_key="feed-celebrity",
+                followers_count=1,
+            )
+            session.add_all([reader, author, celebrity])
+            await session.flush()
+            await session.execute(
+                user_to_user.insert(),
+                [{"followers_id": reader.id, "following_id": author.id},
+                 {"followers_id": reader.id, "following_id": celebrity.id}],
+            )
+
+            start = datetime.utcnow() - timedelta(hours=1)
+            feed = [
+                Tweet(
+                    id=20001 + i,
+                    tweet_data=f"Твит {i}",
+                    user_id=celebrity.id if i % 2 else author.id,
+                    created_at=start + timedelta(minutes=i),
+                    fanned_out=not i % 2,
+                )
+                for i in range(6)
+            ]
+            session.add_all(feed)
+            await session.flush()
+            session.add_all([
+                Timeline(user_id=reader.id, tweet_id=tweet.id,
+                         author_id=tweet.user_id, created_at=tweet.created_at)
+                for tweet in feed if tweet.fanned_out
+            ])
+            await session.commit()
+
+            return reader, feed
+
+    async def read_feed_pages(
+        self, client: AsyncClient, limit: int, mode: str = "latest"
+    ) -> List[List[int]]:
+        """
+        Чтение ленты читателя по страницам до конца (по курсору)
+        """
+        pages, cursor = [], None
+
+        while True:
+            params = {"limit": limit, "mode": mode, **({"cursor": cursor} if cursor else {})}
+            resp = await client.get(
+                "/api/tweets", params=params, headers={"api-key": "feed-reader"}
+            )
+            pages.append([t["id"] for t in resp.json()["tweets"]])
+            cursor = resp.json()["next_cursor"]
+
+            if cursor is None:
+                return pages
+
+    @pytest.mark.parametrize("limit", [1, 2, 4])
+    async def test_get_tweets_pulled_merge(
+        self, client: AsyncClient, pulled_feed: Tuple[User, List[Tweet]], limit: int
+    ) -> None:
+        """
+        Тестирование слияния ленты с подмешиваемыми твитами: твиты из двух источников
+        чередуются по дате, курсор продолжает оба источника без пропусков и повторов
+        """
+        _, feed = pulled_feed
+        expected = [tweet.id for tweet in reversed(feed)]
+
+        pages = await self.read_feed_pages(client=client, limit=limit)
+
+        assert pages == [
+            expected[i:i + limit] for i in range(0, len(expected), limit)
+        ]
+
+    async def test_get_tweets_pulled_after_threshold_drop(
+        self, client: AsyncClient, pulled_feed: Tuple[User, List[Tweet]],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """
+        Тестирование твитов, опубликованных автором выше порога: после снижения числа
+        подписчиков ниже порога твиты остаются в ленте, новые твиты раскладываются по лентам
+        """
+        _, feed = pulled_feed
+        monkeypatch.setattr(services, "CELEBRITY_FOLLOWERS_THRESHOLD", 10)
+
+        resp = await client.post(
+            "/api/tweets",
+            json={"tweet_data": "Твит после снижения числа подписчиков",
+                  "tweet_media_ids": []},
+            headers={"api-key": "feed-celebrity"},
+        )
+        tweet_id = resp.json()["tweet_id"]
+
+        async with async_session_maker() as session:
+            query = select(Timeline.user_id).where(Timeline.tweet_id == tweet_id)
+            assert (await session.execute(query)).scalars().all() == [10001]
+
+        pages = await self.read_feed_pages(client=client, limit=20)
+
+        assert pages == [[tweet_id, *(tweet.id for tweet in reversed(feed))]]
+
+        async with async_session_maker() as session:
+            await TweetsService.delete_tweet(
+                user=Principal(id=10003, username="feed-celebrity"),
+                tweet_id=tweet_id, session=session,
+            )
+
+    async def test_get_tweets_top_affinity_pagination(
+        self, client: AsyncClient, pulled_feed: Tuple[User, List[Tweet]]
+    ) -> None:
+        """
+        Тестирование ленты "top" с учетом близости к автору: лайк поднимает все твиты автора
+        выше более новых твитов других авторов, курсор следует итоговому порядку
+        """
+        _, feed = pulled_feed
+
+        resp = await client.post(
+            f"/api/tweets/{feed[0].id}/likes", headers={"api-key": "feed-reader"}
+        )
+        assert resp.status_code == HTTPStatus.CREATED
+
+        # Твит с лайком, затем остальные твиты автора, затем твиты без надбавки
+        expected = [feed[0].id, feed[4].id, feed[2].id, feed[5].id, feed[3].id, feed[1].id]
+
+        assert await self.read_feed_pages(client=client, limit=20, mode="top") == [expected]
+
+        for limit in (1, 2, 4):
+            pages = await self.read_feed_pages(client=client, limit=limit, mode="top")
+
+            assert pages == [
+                expected[i:i + limit] for i in range(0, len(expected), limit)
+            ]
+
+    @pytest.fixture(scope="class")
+    async def likers_feed(self) -> Tuple[User, Tweet, List[User]]:
+        """
+        Твит в ленте читателя с лайками пяти пользователей (больше LIKERS_PREVIEW_SIZE),
+        двое из которых - подписки читателя (первый и третий по времени лайка)
+        """
+        async with async_session_maker() as session:
+            # Явные id, чтобы не сдвигать id пользователей, твитов и лайков в других тестах
+            reader = User(id=10031, username="likers-reader", api_key="likers-reader")
+            author = User(id=10032, username="likers-author", api_key="likers-author")
+            likers = [
+                User(id=10033 + i, username=f"liker-{i}", api_key=f"liker-{i}")
+                for i in range(5)
+            ]
+            session.add_all([reader, author, *likers])
+            await session.flush()
+            await session.execute(
+                user_to_user.insert(),
+                [{"followers_id": reader.id, "following_id": following_id}
+                 for following_id in (author.id, likers[0].id, likers[2].id)],
+            )
+
+            tweet = Tweet(id=20031, tweet_data="Твит с лайками", user_id=author.id,
+                          like_count=len(likers))
+            session.add(tweet)
+            await session.flush()
+            session.add_all([
+                Timeline(user_id=reader.id, tweet_id=tweet.id, author_id=author.id,
+                         created_at=tweet.created_at),
+                *(Like(id=30001 + i, user_id=liker.id, tweets_id=tweet.id)
+                  for i, liker in enumerate(likers)),
+            ])
+            await session.commit()
+
+            return reader, tweet, likers
+
+    @pytest.mark.parametrize("engine", ["orm", "sql"])
+    async def test_get_tweets_likers_preview(
+        self, client: AsyncClient, likers_feed: Tuple[User, Tweet, List[User]],
+        engine: str, monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """
+        Тестирование превью лайков в ленте: не более LIKERS_PREVIEW_SIZE лайков, сначала
+        подписки читателя (последние лайки первыми), затем последние лайки остальных
+        """
+        reader, tweet, likers = likers_feed
+        monkeypatch.setattr(services, "LIKERS_PREVIEW_SIZE", 3)
+
+        resp = await client.get(
+            "/api/tweets", params={"engine": engine},
+            headers={"api-key": reader.api_key},
+        )
+        [liked] = [t for t in resp.json()["tweets"] if t["id"] == tweet.id]
+
+        assert liked["like_count"] == len(likers)
+        assert liked["likes"] == [
+            {"user_id": liker.id, "name": liker.username}
+            for liker in (likers[2], likers[0], likers[4])
+        ]
@@ -16,13 +16,27 @@ class TestUsers:
         user_data = {
             "id": 1,
             "name": "test-user1",
-            "following": [{"id": 2, "name": "test-user2"}],
-            "followers": [{"id": 2, "name": "test-user2"}],
+            "followers_count": 1,
+            "following_count": 1,
         }
         good_response["user"] = user_data
 
         return good_response
 
+    @pytest.fixture(scope="class")
+    async def response_data_expanded(self, response_data: Dict) -> Dict:
+        """
+        Ожидаемый ответ с данными по пользователю и списками подписок и подписчиков
+        """
+        return {
+            **response_data,
+            "user": {
+                **response_data["user"],
+                "following": [{"id": 2, "name": "test-user2"}],
+                "followers": [{"id": 2, "name": "test-user2"}],
+            },
+        }
+
     @pytest.fixture(scope="class")
     async def response_error(self, bad_response: Dict) -> Dict:
         """
@@ -60,6 +74,118 @@ class TestUsers:
         assert resp.status_code == HTTPStatus.OK
         assert resp.json() == response_data
 
+    async def test_user_data_expanded(
+        self, client: AsyncClient, response_data_expanded: Dict, headers: Dict
+    ) -> None:
+        """
+        Тестирование вывода списков подписок и подписчиков по параметру expand
+        """
+        resp = await client.get(
+            "/api/users/1", params={"expand": ["following", "followers"]},
+            headers=headers
+        )
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == response_data_expanded
+
+    @pytest.mark.parametrize("relation", ["followers", "following"])
+    async def test_user_follow_list(
+        self, client: AsyncClient, headers: Dict, relation: str
+    ) -> None:
+        """
+        Тестирование постраничного вывода подписчиков и подписок пользователя
+        """
+        resp = await client.get(f"/api/users/1/{relation}", headers=headers)
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == {
+            "result": True,
+            "users": [{"id": 2, "name": "test-user2"}],
+            "next_cursor": None,
+        }
+
+    async def test_user_follow_list_pagination(
+        self, client: AsyncClient, headers: Dict
+    ) -> None:
+        """
+        Тестирование перехода на следующую страницу подписчиков
+        """
+        await client.post("/api/users/1/follow", headers={"api-key": "test-user3"})
+
+        resp = await client.get(
+            "/api/users/1/followers", params={"limit": 1}, headers=headers
+        )
+        cursor = resp.json()["next_cursor"]
+
+        assert [u["id"] for u in resp.json()["users"]] == [2]
+        assert cursor
+
+        resp = await client.get(
+            "/api/users/1/followers", params={"limit": 1, "cursor": cursor},
+            headers=headers
+        )
+
+        assert [u["id"] for u in resp.json()["users"]] == [3]
+        assert resp.json()["next_cursor"] is None
+
+        await client.delete("/api/users/1/follow", headers={"api-key": "test-user3"})
+
+    async def test_user_follow_list_not_found(
+        self, client: AsyncClient, response_error: Dict, headers: Dict
+    ) -> None:
+        """
+        Тестирование вывода ошибки при запросе подписчиков несуществующего пользователя
+        """
+        resp = await client.get("/api/users/1000/followers", headers=headers)
+
+        assert resp
+        assert resp.status_code == HTTPStatus.NOT_FOUND
+        assert resp.json() == response_error
+
+    async def test_user_suggestions(self, client: AsyncClient, headers: Dict) -> None:
+        """
+        Тестирование рекомендаций "на кого подписаться"
+        """
+        resp = await client.get("/api/users/me/suggestions", headers=headers)
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == {"result": True, "users": []}
+
+        await client.post("/api/users/3/follow", headers={"api-key": "test-user2"})
+        resp = await client.get("/api/users/me/suggestions", headers=headers)
+
+        assert resp.json() == {
+            "result": True,
+            "users": [{"id": 3, "name": "test-user3", "mutual_count": 1}],
+        }
+
+        await client.delete("/api/users/3/follow", headers={"api-key": "test-user2"})
+        resp = await client.get("/api/users/me/suggestions", headers=headers)
+
+        assert resp.json() == {"result": True, "users": []}
+
+    async def test_users_state(self, client: AsyncClient, headers: Dict) -> None:
+        """
+        Тестирование вывода состояния подписок текущего пользователя по списку пользователей
+        """
+        resp = await client.post(
+            "/api/users/state", json={"user_ids": [2, 3, 1000]}, headers=headers
+        )
+
+        assert resp
+        assert resp.status_code == HTTPStatus.OK
+        assert resp.json() == {
+            "result": True,
+            "users": [
+                {"id": 2, "following": True, "followed_by": True},
+                {"id": 3, "following": False, "followed_by": False},
+                {"id": 1000, "following": False, "followed_by": False},
+            ],
+        }
+
     async def test_user_data_for_id_not_found(
         self, client: AsyncClient, response_error: Dict, headers: Dict
     ) -> None:
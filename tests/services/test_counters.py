@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+
+from typing import AsyncGenerator, Dict
+
+from sqlalchemy import delete, insert, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.models import Like, Tweet, User, user_to_user
+from src.services.services import CounterService
+from tests.database import async_session_maker
+
+
+async def row_versions(session: AsyncSession) -> Dict:
+    """
+    Версии строк (xmin) тестовых пользователей и твитов: меняются при обновлении строки
+    """
+    xmin = literal_column("xmin::text")
+    users = await session.execute(
+        select(User.id, xmin).where(User.id.in_([10021, 10022]))
+    )
+    tweets = await session.execute(
+        select(Tweet.id, xmin).where(Tweet.id.in_([20021, 20022]))
+    )
+
+    return {
+        "users": dict(users.tuples().all()),
+        "tweets": dict(tweets.tuples().all()),
+    }
+
+
+@pytest.mark.counter
+class TestCounters:
+    @pytest.fixture
+    async def counters(self) -> AsyncGenerator[None, None]:
+        """
+        Пользователи и твиты с расхождением счетчиков и без него.
+        Сверка затрагивает все строки таблиц, поэтому тесты откатывают ее результат,
+        а тестовые данные удаляются после теста
+        """
+        async with async_session_maker() as session:
+            # Явные id, чтобы не сдвигать id пользователей и твитов в других тестах
+            session.add_all([
+                User(id=10021, username="counter-drifted", api_key="counter-drifted",
+                     followers_count=5, following_count=0),
+                User(id=10022, username="counter-correct", api_key="counter-correct",
+                     followers_count=0, following_count=1),
+            ])
+            await session.flush()
+
+            session.add_all([
+                Tweet(id=20021, tweet_data="Твит с расхождением", user_id=10021,
+                      like_count=3),
+                Tweet(id=20022, tweet_data="Твит без расхождения", user_id=10021,
+                      like_count=0),
+            ])
+            await session.flush()
+
+            session.add(Like(user_id=10022, tweets_id=20021))
+            await session.execute(
+                insert(user_to_user), {"followers_id": 10022, "following_id": 10021}
+            )
+            await session.commit()
+
+            yield
+
+            await session.execute(delete(user_to_user).where(
+                user_to_user.c.following_id == 10021
+            ))
+            await session.execute(delete(Like).where(Like.tweets_id.in_([20021, 20022])))
+            await session.execute(delete(Tweet).where(Tweet.id.in_([20021, 20022])))
+            await session.execute(delete(User).where(User.id.in_([10021, 10022])))
+            await session.commit()
+
+    async def test_reconcile(self, counters: None) -> None:
+        """
+        Тестирование сверки счетчиков: расхождения исправляются, строки с верными
+        счетчиками не обновляются
+        """
+        async with async_session_maker() as session:
+            before = await row_versions(session)
+
+            await CounterService.reconcile(session=session)
+
+            after = await row_versions(session)
+
+            drifted = await session.get(User, 10021)
+            correct = await session.get(User, 10022)
+            tweet = await session.get(Tweet, 20021)
+
+            assert (drifted.followers_count, drifted.following_count) == (1, 0)
+            assert (correct.followers_count, correct.following_count) == (0, 1)
+            assert tweet.like_count == 1
+
+            assert after["users"][10021] != before["users"][10021]
+            assert after["users"][10022] == before["users"][10022]
+            assert after["tweets"][20021] != before["tweets"][20021]
+            assert after["tweets"][20022] == before["tweets"][20022]
+
+            await session.rollback()
+
+    async def test_reconcile_concurrent_like(self, counters: None) -> None:
+        """
+        Тестирование сверки во время лайка: лайк, зафиксированный после начала сверки,
+        не перезаписывается устаревшим значением счетчика
+        """
+        async with async_session_maker() as liker, async_session_maker() as session:
+            # Лайк и изменение счетчика - как в LikeService.like, но без фиксации
+            await liker.execute(insert(Like).values(user_id=10021, tweets_id=20021))
+            await liker.execute(
+                update(Tweet).where(Tweet.id == 20021)
+                .values(like_count=Tweet.like_count + 1)
+            )
+
+            reconcile = asyncio.create_task(CounterService.reconcile(session=session))
+            await asyncio.sleep(0.2)
+
+            await liker.commit()
+            await reconcile
+
+            tweet = await session.get(Tweet, 20021)
+
+            # 1 лайк до сверки, 1 - во время: исходный счетчик (3) + 1 исправляется на 2
+            assert tweet.like_count == 2
+
+            await session.rollback()
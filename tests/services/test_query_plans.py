@@ -0,0 +1,314 @@
+import json
+import pytest
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.services.services import ImageService, LikeService, TimelineService, \
+    UserService
+from src.utils.cursor import encode_cursor
+from tests.database import async_session_maker
+
+# Данные для планировщика: 500 пользователей (первые 10 - "знаменитости" с твитами,
+# не разложенными по лентам), по 10 подписок и 100 твитов на пользователя, ленты первых
+# 50 пользователей, по 20 лайков на пользователя (10 из них - первым 10 твитам), лайки
+# каждого второго твита от второго пользователя и изображения у каждого 5-го твита
+SEED_STATEMENTS = (
+    """
+    INSERT INTO users (id, username, api_key, followers_count, following_count)
+    SELECT 100000 + n, 'plan-user-' || n, 'plan-key-' || n, 10, 10
+    FROM generate_series(1, 500) AS n
+    """,
+    """
+    INSERT INTO user_to_user (followers_id, following_id)
+    SELECT 100000 + u, 100000 + (u + k * 37 - 1) % 500 + 1
+    FROM generate_series(1, 500) AS u, generate_series(1, 10) AS k
+    """,
+    """
+    INSERT INTO tweets (id, tweet_data, created_at, user_id, like_count, score,
+                        fanned_out)
+    SELECT 1000000 + n, 'plan tweet ' || n,
+           timestamp '2026-01-01' + n * interval '1 minute',
+           100000 + (n - 1) % 500 + 1, n % 20, n / 100.0 + n % 7,
+           (n - 1) % 500 >= 10
+    FROM generate_series(1, 50000) AS n
+    """,
+    """
+    INSERT INTO timelines (user_id, tweet_id, author_id, created_at)
+    SELECT user_to_user.followers_id, tweets.id, tweets.user_id, tweets.created_at
+    FROM user_to_user JOIN tweets ON tweets.user_id = user_to_user.following_id
+    WHERE user_to_user.followers_id BETWEEN 100001 AND 100050 AND tweets.fanned_out
+    """,
+    """
+    INSERT INTO likes (id, user_id, tweets_id)
+    SELECT 1000000 + (u - 1) * 20 + j, 100000 + u,
+           CASE WHEN j <= 10 THEN 1000000 + j
+                ELSE 1000010 + (u * 31 + j * 499) % 49990 + 1 END
+    FROM generate_series(1, 500) AS u, generate_series(1, 20) AS j
+    """,
+    """
+    INSERT INTO likes (id, user_id, tweets_id)
+    SELECT 2000000 + n, 100002, 1000000 + n
+    FROM generate_series(12, 50000, 2) AS n
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO images (id, tweet_id, user_id, path_media, created_at)
+    SELECT 1000000 + n, 1000000 + n, 100000 + (n - 1) % 500 + 1, 'plan/' || n,
+           timestamp '2026-01-01'
+    FROM generate_series(5, 50000, 5) AS n
+    """,
+)
+
+SEEDED_TABLES = ("users", "user_to_user", "tweets", "timelines", "likes", "images")
+
+
+def collect_nodes(plan: Dict) -> List[Dict]:
+    """
+    Список всех узлов плана запроса
+    """
+    nodes = [plan]
+
+    for child in plan.get("Plans", []):
+        nodes.extend(collect_nodes(child))
+
+    return nodes
+
+
+@asynccontextmanager
+async def capture_statements(
+        session: AsyncSession
+) -> AsyncIterator[List[Tuple[str, Any]]]:
+    """
+    Запросы (SQL и параметры), выполненные сервисом в сессии
+    """
+    statements = []
+    connection = (await session.connection()).sync_connection
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
+async def explain(session: AsyncSession,
+                  statements: List[Tuple[str, Any]]) -> List[List[Dict]]:
+    """
+    Планы выполненных запросов с теми же параметрами (настройки планировщика не меняются)
+    """
+    connection = await session.connection()
+    plans = []
+
+    for statement, parameters in statements:
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        )
+        plan = result.scalar_one()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        plans.append(collect_nodes(plan[0]["Plan"]))
+
+    return plans
+
+
+def assert_index_used(nodes: List[Dict], table: str, index: str) -> None:
+    """
+    Проверка, что таблица читается по индексу, а не последовательным сканированием
+    """
+    assert not [
+        n for n in nodes
+        if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == table
+    ], f"Seq Scan on {table}"
+    assert index in [n.get("Index Name") for n in nodes], f"{index} is not used"
+
+
+@pytest.mark.query_plan
+class TestQueryPlans:
+    @pytest.fixture(scope="class")
+    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Сессия с тестовыми данными и актуальной статистикой (ANALYZE).
+        Данные не фиксируются: транзакция откатывается после тестов класса
+        """
+        async with async_session_maker() as session:
+            for statement in SEED_STATEMENTS:
+                await session.execute(text(statement))
+
+            for table in SEEDED_TABLES:
+                await session.execute(text(f"ANALYZE {table}"))
+
+            yield session
+
+            await session.rollback()
+
+    async def test_user_for_api_key(self, session: AsyncSession) -> None:
+        """
+        Аутентификация: поиск пользователя по api-key
+        """
+        async with capture_statements(session) as statements:
+            principal = await UserService.get_principal_for_key(
+                token="plan-key-250", session=session
+            )
+
+        assert principal.id == 100250
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(nodes, "users", "ix_users_api_key")
+
+    async def test_timeline_page(self, session: AsyncSession) -> None:
+        """
+        Чтение страницы ленты: материализованная лента и твиты "знаменитостей"
+        """
+        cursor = encode_cursor(datetime(2026, 1, 5), 1005760)
+
+        async with capture_statements(session) as statements:
+            tweet_ids, _ = await TimelineService.read(
+                user_id=100001, session=session, limit=20, cursor=cursor
+            )
+
+        assert len(tweet_ids) == 20
+
+        timeline_nodes, pulled_nodes = await explain(session, statements)
+        assert_index_used(
+            timeline_nodes, "timelines", "ix_timelines_user_id_created_at_tweet_id"
+        )
+        assert "Sort" not in [n["Node Type"] for n in timeline_nodes]
+        assert_index_used(
+            pulled_nodes, "tweets", "ix_tweets_pulled_user_id_created_at_id"
+        )
+
+    async def test_author_tweets_page(self, session: AsyncSession) -> None:
+        """
+        Последние твиты автора (заполнение ленты после подписки)
+        """
+        query = TimelineService.author_tweets_query(
+            author_id=100250, limit=20, key=(datetime(2026, 2, 1), 1044640)
+        )
+
+        async with capture_statements(session) as statements:
+            rows = (await session.execute(query)).all()
+
+        assert len(rows) == 20
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(nodes, "tweets", "ix_tweets_user_id_created_at_id")
+        assert "Sort" not in [n["Node Type"] for n in nodes]
+
+    async def test_top_feed_page(self, session: AsyncSession) -> None:
+        """
+        Чтение страницы ленты в режиме "top"
+        """
+        async with capture_statements(session) as statements:
+            tweet_ids, cursor = await TimelineService.read_top(
+                user_id=100001, session=session, limit=20
+            )
+            await TimelineService.read_top(
+                user_id=100001, session=session, limit=20, cursor=cursor
+            )
+
+        assert len(tweet_ids) == 20
+
+        for nodes in await explain(session, statements):
+            assert_index_used(nodes, "tweets", "ix_tweets_user_id_score_id")
+
+    async def test_top_feed_page_long_like_history(self, session: AsyncSession) -> None:
+        """
+        Чтение ленты "top" пользователем с длинной историей лайков: близость к авторам
+        считается по твитам подписок, история лайков целиком не читается
+        """
+        async with capture_statements(session) as statements:
+            await TimelineService.read_top(user_id=100002, session=session, limit=20)
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(nodes, "tweets", "ix_tweets_user_id_score_id")
+        assert_index_used(nodes, "likes", "ix_likes_user_id_tweets_id")
+        assert [
+            n for n in nodes
+            if n.get("Index Name") == "ix_likes_user_id_tweets_id"
+        ] == [
+            n for n in nodes
+            if n.get("Index Name") == "ix_likes_user_id_tweets_id"
+            and "tweets_id" in n.get("Index Cond", "")
+        ]
+
+    async def test_tweet_likes_page(self, session: AsyncSession) -> None:
+        """
+        Постраничный вывод лайков твита
+        """
+        async with capture_statements(session) as statements:
+            likes, _ = await LikeService.get_likes(
+                tweet_id=1000001, session=session, limit=20
+            )
+
+        assert len(likes) == 20
+
+        _, likes_nodes = await explain(session, statements)
+        assert_index_used(likes_nodes, "likes", "ix_likes_tweets_id_id")
+        assert "Sort" not in [n["Node Type"] for n in likes_nodes]
+
+    async def test_like_for_user(self, session: AsyncSession) -> None:
+        """
+        Проверка лайков пользователя для страницы ленты
+        """
+        tweet_ids = [1000001, 1050000]
+
+        async with capture_statements(session) as statements:
+            liked = await LikeService.get_liked_by_user(
+                tweet_ids=tweet_ids, user_id=100250, session=session
+            )
+
+        assert liked == {1000001}
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(nodes, "likes", "ix_likes_user_id_tweets_id")
+
+    async def test_tweet_images(self, session: AsyncSession) -> None:
+        """
+        Поиск изображений твита
+        """
+        async with capture_statements(session) as statements:
+            images = await ImageService.get_images(tweet_id=1000500,
+                                                   session=session)
+
+        assert len(images) == 1
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(nodes, "images", "ix_images_tweet_id")
+
+    async def test_user_followers(self, session: AsyncSession) -> None:
+        """
+        Постраничный вывод подписчиков пользователя
+        """
+        async with capture_statements(session) as statements:
+            users, _ = await UserService.get_follow_page(
+                user_id=100250, relation="followers", session=session, limit=5
+            )
+
+        assert len(users) == 5
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(
+            nodes, "user_to_user", "ix_user_to_user_following_id_followers_id"
+        )
+
+    async def test_timeline_remove_tweet(self, session: AsyncSession) -> None:
+        """
+        Удаление твита из лент
+        """
+        async with capture_statements(session) as statements:
+            await TimelineService.remove_tweet(tweet_id=1000500, session=session)
+
+        [nodes] = await explain(session, statements)
+        assert_index_used(nodes, "timelines", "ix_timelines_tweet_id")
@@ -0,0 +1,52 @@
+import pytest
+
+from src.utils.cache import TTLCache
+
+
+@pytest.mark.cache
+class TestTTLCache:
+    async def test_get_set(self) -> None:
+        """
+        Тестирование сохранения значения и подсчета попаданий / промахов
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+
+        assert cache.get("key") is None
+        cache.set("key", "value")
+
+        assert cache.get("key") == "value"
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    async def test_lru_eviction(self) -> None:
+        """
+        Тестирование вытеснения самой давно использованной записи
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    async def test_ttl_expiration(self) -> None:
+        """
+        Тестирование устаревания записи
+        """
+        cache = TTLCache(maxsize=2, ttl=-1)
+        cache.set("key", "value")
+
+        assert cache.get("key") is None
+        assert cache.stats()["size"] == 0
+
+    async def test_invalidate(self) -> None:
+        """
+        Тестирование удаления записи
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("key", "value")
+        cache.invalidate("key")
+
+        assert cache.get("key") is None
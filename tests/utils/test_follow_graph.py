@@ -0,0 +1,93 @@
+import pytest
+
+from src.utils.follow_graph import FollowGraph
+
+
+@pytest.mark.follow_graph
+class TestFollowGraph:
+    @pytest.fixture
+    def graph(self) -> FollowGraph:
+        """
+        Индекс графа: 1 -> 2, 3; 2 -> 4, 5; 3 -> 4, 1
+        """
+        graph = FollowGraph(compact_threshold=100)
+        graph.build([(1, 2), (1, 3), (2, 4), (2, 5), (3, 1), (3, 4)])
+
+        return graph
+
+    async def test_following(self, graph: FollowGraph) -> None:
+        """
+        Тестирование чтения подписок из массивов индекса
+        """
+        assert list(graph.following(1)) == [2, 3]
+        assert list(graph.following(3)) == [1, 4]
+        assert list(graph.following(4)) == []
+        assert list(graph.following(1000)) == []
+        assert graph.stats() == {"edges": 6, "delta": 0, "bytes": 4 * (5 + 6)}
+
+    async def test_suggest(self, graph: FollowGraph) -> None:
+        """
+        Тестирование рекомендаций: подписки подписок по количеству общих связей
+        """
+        assert graph.suggest(user_id=1, limit=10) == [(4, 2), (5, 1)]
+        assert graph.suggest(user_id=1, limit=1) == [(4, 2)]
+        assert graph.suggest(user_id=4, limit=10) == []
+
+    async def test_follow_unfollow(self, graph: FollowGraph) -> None:
+        """
+        Тестирование изменений индекса после построения
+        """
+        graph.follow(1, 4)
+        graph.unfollow(1, 2)
+        graph.unfollow(1, 4)
+        graph.follow(1, 2)
+        graph.follow(4, 5)
+
+        assert sorted(graph.following(1)) == [2, 3]
+        assert list(graph.following(4)) == [5]
+        assert graph.suggest(user_id=1, limit=10) == [(4, 2), (5, 1)]
+
+    async def test_compact(self) -> None:
+        """
+        Тестирование слияния изменений с массивами при превышении порога
+        """
+        graph = FollowGraph(compact_threshold=2)
+        graph.build([(1, 2)])
+        graph.follow(1, 3)
+        graph.unfollow(1, 2)
+        graph.follow(6, 1)
+
+        assert graph.stats()["delta"] == 0
+        assert list(graph.following(1)) == [3]
+        assert list(graph.following(6)) == [1]
+        assert graph.stats()["edges"] == 2
+
+    async def test_rebuild_replays_changes(self, graph: FollowGraph) -> None:
+        """
+        Тестирование перестроения: изменения, записанные во время чтения снимка,
+        повторяются поверх новых массивов (в том числе уже попавшие в снимок)
+        """
+        graph.begin_rebuild()
+        # Попали в снимок
+        graph.follow(1, 4)
+        graph.unfollow(3, 1)
+        offsets, targets = graph.build_arrays(
+            [(1, 2), (1, 3), (1, 4), (2, 4), (2, 5), (3, 4)]
+        )
+        # Зафиксированы после начала чтения снимка
+        graph.follow(4, 1)
+        graph.unfollow(2, 5)
+
+        graph.install(offsets, targets)
+
+        assert sorted(graph.following(1)) == [2, 3, 4]
+        assert list(graph.following(2)) == [4]
+        assert list(graph.following(3)) == [4]
+        assert list(graph.following(4)) == [1]
+
+        # Изменения до начала перестроения не повторяются - снимок их уже содержит
+        graph.follow(5, 1)
+        graph.begin_rebuild()
+        graph.install(*graph.build_arrays([(1, 2)]))
+
+        assert list(graph.following(5)) == []
@@ -0,0 +1,60 @@
+import io
+import random
+import pytest
+
+from PIL import Image as PILImage
+
+from src.utils import blurhash
+from src.utils.image_header import detect_format, parse_dimensions
+
+
+def image_bytes(image_format: str, size=(120, 80), **params) -> bytes:
+    """
+    Изображение заданного формата и размера
+    """
+    buf = io.BytesIO()
+    PILImage.new("RGB", size, (10, 20, 30)).save(buf, image_format, **params)
+
+    return buf.getvalue()
+
+
+@pytest.mark.image
+class TestImageHeader:
+    @pytest.mark.parametrize("image_format", ["png", "jpeg", "gif"])
+    def test_detect_format_and_dimensions(self, image_format: str) -> None:
+        """
+        Тестирование определения формата и размеров по заголовку файла
+        """
+        data = image_bytes(image_format.upper())
+
+        assert detect_format(data[:16]) == image_format
+        assert parse_dimensions(image_format, data) == (120, 80)
+
+    def test_jpeg_dimensions_after_exif(self) -> None:
+        """
+        Тестирование поиска размеров JPEG после сегмента EXIF
+        """
+        exif = PILImage.Exif()
+        exif[0x010E] = "x" * 10000  # ImageDescription
+        data = image_bytes("JPEG", exif=exif.tobytes())
+
+        assert parse_dimensions("jpeg", data) == (120, 80)
+        # Размеры за пределами переданного заголовка
+        assert parse_dimensions("jpeg", data[:1024]) is None
+
+    def test_detect_unknown_format(self) -> None:
+        """
+        Тестирование неразрешенного формата (расширение файла не учитывается)
+        """
+        assert detect_format(b"just text file") is None
+        assert detect_format(b"") is None
+        assert detect_format(image_bytes("BMP")) is None
+
+    def test_blurhash(self) -> None:
+        """
+        Тестирование кодирования blurhash (значение совпадает с эталонной реализацией)
+        """
+        rnd = random.Random(1)
+        pixels = [tuple(rnd.randrange(256) for _ in range(3)) for _ in range(48)]
+
+        assert blurhash.encode(pixels, 8, 6, 3, 4) == "TUIhvi_3a7^nxKeZE-%LI^PwX#Av"
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+from typing import List
+
+from src.utils.like_buffer import LikeBuffer, LikeEvent
+
+
+@pytest.mark.like_buffer
+class TestLikeBuffer:
+    @pytest.fixture
+    def applied(self) -> List[List[LikeEvent]]:
+        """
+        Пачки событий, переданные на запись в БД
+        """
+        return []
+
+    @pytest.fixture
+    async def buffer(self, tmp_path, applied: List[List[LikeEvent]]) -> LikeBuffer:
+        """
+        Буфер лайков с журналом во временной директории (фоновая запись не запускается)
+        """
+        async def apply(events: List[LikeEvent]) -> None:
+            applied.append(events)
+
+        buffer = LikeBuffer(
+            path=str(tmp_path / "likes.jsonl"), flush_size=10, flush_interval=60
+        )
+        buffer._apply = apply
+
+        return buffer
+
+    async def test_add_and_flush(
+        self, buffer: LikeBuffer, applied: List[List[LikeEvent]]
+    ) -> None:
+        """
+        Тестирование записи событий в журнал и пачкой в БД
+        """
+        await asyncio.gather(
+            buffer.add("like", user_id=1, tweet_id=1),
+            buffer.add("like", user_id=2, tweet_id=1),
+            buffer.add("dislike", user_id=1, tweet_id=2),
+        )
+
+        assert buffer.stats()["depth"] == 3
+        assert len(open(buffer.path).readlines()) == 3
+
+        assert await buffer.flush() == 3
+        assert applied == [
+            [("like", 1, 1), ("like", 2, 1), ("dislike", 1, 2)]
+        ]
+        assert buffer.stats() == {"depth": 0, "flushed": 3, "failed_flushes": 0}
+        assert open(buffer.path).read() == ""
+
+    async def test_recovery(self, buffer: LikeBuffer) -> None:
+        """
+        Тестирование восстановления неотправленных событий из журнала после перезапуска
+        """
+        await buffer.add("like", user_id=1, tweet_id=1)
+        with open(buffer.path, "a") as journal:
+            journal.write('["like", 2,')
+
+        restarted = LikeBuffer(path=buffer.path, flush_size=10, flush_interval=60)
+
+        assert restarted._read_journal() == [("like", 1, 1)]
+
+    async def test_failed_flush(self, buffer: LikeBuffer) -> None:
+        """
+        Тестирование сохранения событий в буфере и журнале при ошибке записи в БД
+        """
+        async def apply(events: List[LikeEvent]) -> None:
+            raise ConnectionError("database is unavailable")
+
+        buffer._apply = apply
+        await buffer.add("like", user_id=1, tweet_id=1)
+
+        assert await buffer.flush() == 0
+        assert buffer.pending() == [("like", 1, 1)]
+        assert buffer.stats()["failed_flushes"] == 1
+        assert len(open(buffer.path).readlines()) == 1
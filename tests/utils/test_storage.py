@@ -0,0 +1,101 @@
+import io
+import os
+import pytest
+
+from src.utils.storage import LocalStorage, MediaStorage
+
+
+async def check_storage(storage: MediaStorage, tmp_path) -> None:
+    """
+    Общая проверка хранилища: запись потока и файла, наличие, копия для обработки, удаление
+    """
+    await storage.put_stream(key="images/ab/cd/stream.jpg", stream=io.BytesIO(b"stream"))
+
+    tmp_file = tmp_path / "upload.part"
+    tmp_file.write_bytes(b"file")
+    await storage.put_file(key="images/ab/cd/file.jpg", path=str(tmp_file))
+
+    assert not tmp_file.exists()
+    assert await storage.exists("images/ab/cd/stream.jpg")
+    assert await storage.exists("images/ab/cd/file.jpg")
+    assert not await storage.exists("images/ab/cd/missing.jpg")
+
+    async with storage.local_copy("images/ab/cd/file.jpg") as path:
+        with open(path, "rb") as file:
+            assert file.read() == b"file"
+
+    # Отсутствующий файл считается удаленным
+    assert await storage.delete_batch(
+        keys=["images/ab/cd/stream.jpg", "images/ab/cd/file.jpg", "images/ab/cd/missing.jpg"]
+    ) == []
+    assert not await storage.exists("images/ab/cd/stream.jpg")
+    assert not await storage.exists("images/ab/cd/file.jpg")
+
+
+@pytest.mark.storage
+class TestLocalStorage:
+    async def test_storage(self, tmp_path) -> None:
+        """
+        Тестирование хранилища в локальной директории
+        """
+        storage = LocalStorage(root=str(tmp_path / "static"))
+
+        await check_storage(storage=storage, tmp_path=tmp_path)
+
+        # Пустые директории удаляются вместе с последним файлом
+        assert not os.path.exists(tmp_path / "static" / "images" / "ab" / "cd")
+        assert storage.url_for("images/ab/cd/file.jpg") == "images/ab/cd/file.jpg"
+
+
+@pytest.mark.storage
+class TestS3Storage:
+    @pytest.fixture
+    def s3_storage(self, monkeypatch: pytest.MonkeyPatch):
+        """
+        S3-хранилище на замене S3 из moto (пропуск, если boto3 / moto не установлены)
+        """
+        boto3 = pytest.importorskip("boto3")
+        moto = pytest.importorskip("moto")
+        from src.utils.storage_s3 import S3Storage
+
+        for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            monkeypatch.setenv(name, "testing")
+
+        mock = moto.mock_aws() if hasattr(moto, "mock_aws") else moto.mock_s3()
+
+        with mock:
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="media")
+
+            yield S3Storage(
+                bucket="media", public_url="https://cdn.test", client=client,
+                chunk_size=5 * 1024 * 1024,
+            )
+
+    async def test_storage(self, s3_storage, tmp_path, monkeypatch) -> None:
+        """
+        Тестирование S3-хранилища
+        """
+        from src.utils import storage_s3
+
+        monkeypatch.setattr(storage_s3, "MEDIA_TMP_FOLDER", str(tmp_path / "tmp"))
+
+        await check_storage(storage=s3_storage, tmp_path=tmp_path)
+
+        assert s3_storage.url_for("images/ab/cd/file.jpg") == (
+            "https://cdn.test/images/ab/cd/file.jpg"
+        )
+
+    async def test_multipart_upload(self, s3_storage) -> None:
+        """
+        Тестирование загрузки файла больше размера части (multipart)
+        """
+        content = os.urandom(6 * 1024 * 1024)
+
+        await s3_storage.put_stream(key="images/big.jpg", stream=io.BytesIO(content))
+
+        obj = s3_storage.client.get_object(Bucket="media", Key="images/big.jpg")
+
+        assert obj["Body"].read() == content
+        assert obj["ETag"].strip('"').endswith("-2")
+        assert obj["ContentType"] == "image/jpeg"